@@ -77,6 +77,9 @@ class TablaFactura(ctk.CTkFrame):
 
         # internal store: map pid -> (name, price, qty)
         self._items = {}
+        # running totals kept in sync by _set_line/_remove_line (recomputed by _refresh)
+        self._subtotal = 0.0
+        self._units = 0
 
     def _on_right_click(self, event):
         iid = self.tree.identify_row(event.y)
@@ -95,16 +98,44 @@ class TablaFactura(ctk.CTkFrame):
         qty = int(quantity)
         if pid in self._items:
             cur_name, cur_price, cur_qty = self._items[pid]
-            cur_qty += qty
-            self._items[pid] = (cur_name, cur_price, cur_qty)
+            self._set_line(pid, cur_name, cur_price, cur_qty + qty)
         else:
-            self._items[pid] = (name, float(price), qty)
-        self._refresh()
+            self._set_line(pid, name, float(price), qty)
 
-    def _refresh(self):
-        for r in self.tree.get_children():
-            self.tree.delete(r)
-        # determine VAT settings
+    def _set_line(self, pid: int, name: str, price: float, qty: int):
+        # O(1): adjust running totals by the line delta and touch only this row
+        old = self._items.get(pid)
+        if old is not None:
+            self._subtotal -= old[1] * old[2]
+            self._units -= old[2]
+        self._items[pid] = (name, price, qty)
+        self._subtotal += price * qty
+        self._units += qty
+        values = self._row_values(name, price, qty, *self._vat_settings())
+        if old is not None and self.tree.exists(str(pid)):
+            self.tree.item(str(pid), values=values)
+        else:
+            self.tree.insert('', 'end', iid=str(pid), values=values)
+        self._update_scrollbar()
+
+    def _remove_line(self, pid: int):
+        old = self._items.pop(pid, None)
+        if old is not None:
+            self._subtotal -= old[1] * old[2]
+            self._units -= old[2]
+        if not self._items:
+            # avoid float drift accumulating across invoices
+            self._subtotal = 0.0
+            self._units = 0
+        try:
+            self.tree.delete(str(pid))
+        except Exception:
+            pass
+        self._update_scrollbar()
+        return old
+
+    def _vat_settings(self):
+        """Return (vat_enabled, vat_pct) from the in-memory settings cache."""
         try:
             import database
             vat_enabled = True if str(database.get_setting('vat_enabled', '0')) == '1' else False
@@ -112,12 +143,17 @@ class TablaFactura(ctk.CTkFrame):
         except Exception:
             vat_enabled = False
             vat_pct = 0.0
-        for pid, (name, price, qty) in self._items.items():
-            subtotal = price * qty
-            iva_amount = (subtotal * vat_pct / 100.0) if vat_enabled else 0.0
-            iva_text = f"{iva_amount:.2f} Bs" if vat_enabled else "-"
-            # show prices in Bs in the invoice table
-            self.tree.insert('', 'end', iid=str(pid), values=(name, f"{price:.2f} Bs", iva_text, qty, f"{subtotal:.2f} Bs", 'X'))
+        return vat_enabled, vat_pct
+
+    @staticmethod
+    def _row_values(name, price, qty, vat_enabled, vat_pct):
+        subtotal = price * qty
+        iva_amount = (subtotal * vat_pct / 100.0) if vat_enabled else 0.0
+        iva_text = f"{iva_amount:.2f} Bs" if vat_enabled else "-"
+        # show prices in Bs in the invoice table
+        return (name, f"{price:.2f} Bs", iva_text, qty, f"{subtotal:.2f} Bs", 'X')
+
+    def _update_scrollbar(self):
         # Mostrar/ocultar scrollbar según si hay contenido que desborde
         try:
             first, last = self.tree.yview()
@@ -128,6 +164,29 @@ class TablaFactura(ctk.CTkFrame):
         except Exception:
             pass
 
+    def _refresh(self):
+        """Full rebuild: rows and running totals (used after VAT changes or direct edits of _items)."""
+        self.tree.delete(*self.tree.get_children())
+        vat_enabled, vat_pct = self._vat_settings()
+        subtotal = 0.0
+        units = 0
+        for pid, (name, price, qty) in self._items.items():
+            subtotal += price * qty
+            units += qty
+            self.tree.insert('', 'end', iid=str(pid), values=self._row_values(name, price, qty, vat_enabled, vat_pct))
+        self._subtotal = subtotal
+        self._units = units
+        self._update_scrollbar()
+
+    def totals(self):
+        """Running cart totals without rescanning the lines: subtotal, vat, total (Bs), units, lines."""
+        vat_enabled, vat_pct = self._vat_settings()
+        subtotal = self._subtotal if self._items else 0.0
+        # VAT is linear in the line subtotals, so it follows from the running subtotal
+        vat = (subtotal * vat_pct / 100.0) if vat_enabled else 0.0
+        return {'subtotal': subtotal, 'vat': vat, 'total': subtotal + vat,
+                'units': self._units, 'lines': len(self._items)}
+
     def _delete_selected(self):
         sel = self.tree.selection()
         if not sel:
@@ -140,11 +199,10 @@ class TablaFactura(ctk.CTkFrame):
                 name, price, qty = self._items[pid]
                 try:
                     import database
-                    database.increase_product_quantity(int(pid), int(qty))
+                    database.release_items([(pid, qty)])
                 except Exception:
                     pass
-                del self._items[pid]
-            self._refresh()
+            self._remove_line(pid)
             # notify parent to reload inventory if a callback was provided
             try:
                 if hasattr(self, '_on_remove_callback') and callable(self._on_remove_callback):
@@ -169,14 +227,10 @@ class TablaFactura(ctk.CTkFrame):
             pass
 
     def clear(self):
-        # restore stock for all items before clearing
+        # restore stock for all items before clearing (one transaction for the whole cart)
         try:
             import database
-            for pid, (_name, _price, qty) in list(self._items.items()):
-                try:
-                    database.increase_product_quantity(int(pid), int(qty))
-                except Exception:
-                    pass
+            database.release_items([(pid, qty) for pid, (_name, _price, qty) in self._items.items()])
         except Exception:
             pass
         self._items.clear()
@@ -193,15 +247,9 @@ class TablaFactura(ctk.CTkFrame):
     def get_items(self):
         # return list of dicts suitable for factura processing
         out = []
+        # VAT settings are read once for the whole cart
+        vat_enabled, vat_pct = self._vat_settings()
         for pid, (name, price, qty) in self._items.items():
-            # compute VAT amount per item
-            try:
-                import database
-                vat_enabled = True if str(database.get_setting('vat_enabled', '0')) == '1' else False
-                vat_pct = float(database.get_setting('vat_percent', '0') or 0.0)
-            except Exception:
-                vat_enabled = False
-                vat_pct = 0.0
             subtotal = price * qty
             iva = (subtotal * vat_pct / 100.0) if vat_enabled else 0.0
             out.append({'id': pid, 'name': name, 'price': price, 'quantity': qty, 'subtotal': subtotal, 'vat': iva})
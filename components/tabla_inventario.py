@@ -3,8 +3,6 @@ import tkinter as tk
 from tkinter import ttk
 from . import __init__  # ensure package
 import database
-import unicodedata
-import re
 
 
 class TablaInventario(ctk.CTkFrame):
@@ -12,8 +10,11 @@ class TablaInventario(ctk.CTkFrame):
 
     Usa un ttk.Treeview dentro de un CTkScrollableFrame para mostrar los productos.
     Provee métodos públicos para recargar, agregar y eliminar.
+    Muestra como máximo `PAGE_SIZE` filas por vez; el botón "Mostrar más" amplía el límite.
     """
 
+    PAGE_SIZE = 200
+
     def __init__(self, master, colors=None, fonts=None, **kwargs):
         # allow frame background from colors
         fg = None
@@ -85,15 +86,33 @@ class TablaInventario(ctk.CTkFrame):
         # Mostrar scrollbar solo si hay contenido que desborde (se actualiza en reload)
         self.after_idle(lambda: _on_yscroll(*(self.tree.yview())))
 
+        # "Mostrar más": visible solo cuando el resultado tiene más filas que el límite
+        self.more_btn = ctk.CTkButton(self.scroll_frame, text='Mostrar más', height=26, command=self.show_more)
+
         # Popup menu
         self.menu = tk.Menu(self, tearoff=0)
         self.menu.add_command(label="Eliminar", command=self._delete_selected)
 
         self.tree.bind("<Button-3>", self._on_right_click)
 
+        # Estado de filas visibles: pid -> valores, y orden actual
+        self._rows = {}
+        self._order = []
+        self._query = ''
+        self._limit = self.PAGE_SIZE
+        self._pending_changes = []
+        self._flush_job = None
+
         # Inicializar datos
         self.reload()
 
+        # Actualizar solo las filas afectadas cuando cambian productos en la BD
+        try:
+            self._products_token = database.subscribe_products(self._on_products_changed)
+        except Exception:
+            self._products_token = None
+        self.bind('<Destroy>', self._on_destroy, add='+')
+
     def _on_right_click(self, event):
         iid = self.tree.identify_row(event.y)
         if iid:
@@ -103,41 +122,24 @@ class TablaInventario(ctk.CTkFrame):
             finally:
                 self.menu.grab_release()
 
-    def reload(self, query: str = None):
-        for r in self.tree.get_children():
-            self.tree.delete(r)
-        q = (query or '').strip() if query is not None else None
-
-        def normalize_text(s: str) -> str:
-            if s is None:
-                return ''
-            s = str(s)
-            # remove diacritics
-            s = unicodedata.normalize('NFD', s)
-            s = ''.join(ch for ch in s if not unicodedata.combining(ch))
-            # remove non-alphanumeric
-            s = re.sub(r'[^\w\s]', '', s)
-            return s.lower()
-
-        nq = normalize_text(q) if q else None
-        for row in database.get_products():
-            # id, code, name, price_bs, price_usd, quantity
-            pid, code, name, price_bs, price_usd, qty = row
-            # normalize/format product code: if numeric, pad to 4 digits (0001)
-            try:
-                if code and str(code).isdigit():
-                    display_code = str(code).zfill(4)
-                elif code:
-                    display_code = str(code)
-                else:
-                    display_code = str(pid).zfill(4)
-            except Exception:
-                display_code = str(code or pid)
-            if nq:
-                if nq not in normalize_text(display_code) and nq not in normalize_text(name):
-                    continue
-            # price_usd column stores price in selected foreign currency (USD or EUR)
-            self.tree.insert("", "end", iid=str(pid), values=(display_code, name, f"{price_bs:.2f}", f"{price_usd:.2f}", qty))
+    @staticmethod
+    def _row_values(row):
+        """Valores de la fila del Treeview para una fila de products (id, code, name, price_bs, price_usd, quantity)."""
+        pid, code, name, price_bs, price_usd, qty = row
+        # normalize/format product code: if numeric, pad to 4 digits (0001)
+        try:
+            if code and str(code).isdigit():
+                display_code = str(code).zfill(4)
+            elif code:
+                display_code = str(code)
+            else:
+                display_code = str(pid).zfill(4)
+        except Exception:
+            display_code = str(code or pid)
+        # price_usd column stores price in selected foreign currency (USD or EUR)
+        return (display_code, name, f"{price_bs:.2f}", f"{price_usd:.2f}", qty)
+
+    def _update_scrollbar(self):
         # Mostrar/ocultar scrollbar según si hay contenido que desborde
         try:
             first, last = self.tree.yview()
@@ -148,6 +150,118 @@ class TablaInventario(ctk.CTkFrame):
         except Exception:
             pass
 
+    def fetch_rows(self, query: str = None):
+        """Consulta los productos para `query` sin tocar widgets (apta para un hilo de trabajo).
+
+        Devuelve (query, [(pid, valores)], has_more, limit).
+        """
+        q = (query or '').strip()
+        limit = self._limit if q == self._query else self.PAGE_SIZE
+        # el filtrado (sin acentos, por prefijo de palabra) lo hace el índice FTS de la BD
+        rows = database.search_products(q or None, limit + 1)
+        has_more = len(rows) > limit
+        return q, [(row[0], self._row_values(row)) for row in rows[:limit]], has_more, limit
+
+    def show_rows(self, result):
+        """Muestra el resultado de fetch_rows (hilo de Tk).
+
+        Si el conjunto/orden de productos no cambió solo se actualizan las filas cuyos
+        valores difieren; el Treeview se reconstruye únicamente cuando cambia el resultado.
+        """
+        query, fetched, has_more, limit = result
+        rows = dict(fetched)
+        order = [pid for pid, _values in fetched]
+        if order == self._order:
+            for pid, values in rows.items():
+                if self._rows.get(pid) != values:
+                    self.tree.item(str(pid), values=values)
+        else:
+            self.tree.delete(*self.tree.get_children())
+            for pid in order:
+                self.tree.insert("", "end", iid=str(pid), values=rows[pid])
+        self._rows = rows
+        self._order = order
+        self._query = query
+        self._limit = limit
+        try:
+            if has_more:
+                self.more_btn.configure(text=f'Mostrar más (+{self.PAGE_SIZE})')
+                self.more_btn.pack(fill='x', padx=6, pady=(4, 2))
+            else:
+                self.more_btn.pack_forget()
+        except Exception:
+            pass
+        self._update_scrollbar()
+
+    def reload(self, query: str = None):
+        """Recarga las filas para `query` de forma síncrona (None = conservar la búsqueda actual)."""
+        self.show_rows(self.fetch_rows(self._query if query is None else query))
+
+    def show_more(self):
+        self._limit += self.PAGE_SIZE
+        self.reload()
+
+    def _on_products_changed(self, kind, ids):
+        """Listener de database: acumula los cambios y los aplica en el siguiente idle del loop de Tk."""
+        self._pending_changes.append((kind, ids))
+        if self._flush_job is None:
+            try:
+                self._flush_job = self.after_idle(self._apply_product_changes)
+            except Exception:
+                self._flush_job = None
+
+    def _apply_product_changes(self):
+        self._flush_job = None
+        changes, self._pending_changes = self._pending_changes, []
+        if not changes:
+            return
+        try:
+            if any(ids is None for _kind, ids in changes):
+                self.reload()
+                return
+            changed = set()
+            for kind, ids in changes:
+                if kind == 'insert' or (kind == 'delete' and any(pid in self._rows for pid in ids)):
+                    # alta, o baja de una fila visible: se vuelve a consultar la página actual
+                    # (respeta el límite y el botón "Mostrar más")
+                    self.reload()
+                    return
+                changed.update(ids)
+            fresh = database.get_products_by_ids(changed)
+            for pid in changed:
+                row = fresh.get(pid)
+                old = self._rows.get(pid)
+                if row is None:
+                    continue
+                values = self._row_values(row)
+                if old is None:
+                    if self._query:
+                        # editado fuera de la página con búsqueda activa: puede entrar en el resultado
+                        self.reload()
+                        return
+                    continue
+                if values[:2] != old[:2] and self._query:
+                    # cambió código/nombre: puede salir o entrar en el resultado de la búsqueda
+                    self.reload()
+                    return
+                if values != old:
+                    self.tree.item(str(pid), values=values)
+                    self._rows[pid] = values
+            self._update_scrollbar()
+        except Exception:
+            try:
+                self.reload()
+            except Exception:
+                pass
+
+    def _on_destroy(self, event):
+        if event.widget is self and self._products_token is not None:
+            try:
+                database.unsubscribe_products(self._products_token)
+            except Exception:
+                pass
+            self._products_token = None
+
     def update_currency_heading(self):
         """Update the foreign-currency column heading symbol according to settings."""
         try:
@@ -161,8 +275,8 @@ class TablaInventario(ctk.CTkFrame):
                 pass
 
     def add_product(self, code: str, name: str, price_bs: float, price_usd: float, quantity: int):
+        # la fila se agrega vía el aviso de cambios de productos
         database.add_product_full(code=code, name=name, price_bs=price_bs, price_usd=price_usd, quantity=quantity)
-        self.reload()
 
     def _delete_selected(self):
         sel = self.tree.selection()
@@ -170,4 +284,3 @@ class TablaInventario(ctk.CTkFrame):
             return
         pid = int(sel[0])
         database.delete_product(pid)
-        self.reload()
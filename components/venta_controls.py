@@ -5,6 +5,8 @@ import json
 import datetime
 from typing import Optional
 
+from utils.task_runner import TaskRunner
+
 
 class VentaControls(ctk.CTkFrame):
     """Controls related to opening/closing a venta session.
@@ -23,6 +25,9 @@ class VentaControls(ctk.CTkFrame):
         self._color_green = kwargs.get('open_color', '#2ecc71')
         self._color_red = kwargs.get('close_color', '#e74c3c')
         self._color_gray = kwargs.get('disabled_color', '#7f8c8d')
+        # cierre runs off the Tk thread (see do_cierre)
+        self._runner = TaskRunner(self)
+        self._cierre_task = None
 
         self.abrir_btn = ctk.CTkButton(self, text='Abrir Venta', width=120, height=28, command=self.open_venta,
                                        fg_color=self._color_green)
@@ -156,153 +161,143 @@ class VentaControls(ctk.CTkFrame):
             pass
 
     def do_cierre(self):
-        """Compute cierre totals for today, save a closure record, and show the cierre dialog."""
+        """Compute cierre totals for today, save a closure record, and show the cierre dialog.
+
+        Invoice reads, the server call, closures.json and the PDF run on a worker
+        thread (utils/task_runner.py); the UI is updated when the task finishes.
+        """
         try:
             app = self.app or (self.header_ref.winfo_toplevel() if self.header_ref is not None else None)
             if app is None:
                 return
-            # collect invoices for today (same logic used in cierre_caja)
+            if self._cierre_task is not None and not self._cierre_task.done:
+                return
             facturas_dir = getattr(app, '_facturas_dir', os.path.join(getattr(app, '_data_dir', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')), 'facturas'))
             today = datetime.date.today().strftime('%Y-%m-%d')
-            facturas_dia = []
-            day_dir = os.path.join(facturas_dir, today)
-            if os.path.isdir(day_dir):
-                for fname in os.listdir(day_dir):
-                    if not (fname.lower().endswith('.json') or 'invoice' in fname.lower()):
-                        continue
-                    fpath = os.path.join(day_dir, fname)
-                    try:
-                        with open(fpath, 'r', encoding='utf-8') as fp:
-                            inv = json.load(fp)
-                    except Exception:
-                        continue
-                    if (inv.get('state') or '').upper() == 'ANULADA':
-                        continue
-                    facturas_dia.append(inv)
-            # attempt to include server invoices if available
             try:
-                if getattr(app, 'server_url', None) and getattr(app, 'auth_token', None):
-                    r = app.request_get(f"{app.server_url}/invoices?from_date={today}&to_date={today}", timeout=5)
-                    if r and getattr(r, 'status_code', None) == 200:
-                        for inv in (r.json() or []):
-                            if (inv.get('state') or '').upper() == 'ANULADA':
-                                continue
-                            if not any(f.get('id') == inv.get('id') for f in facturas_dia):
-                                facturas_dia.append(inv)
+                tc = float(getattr(app, 'exchange_rate', 1.0) or 1.0)
+            except Exception:
+                tc = 1.0
+            try:
+                self.cierre_btn.configure(state='disabled')
             except Exception:
                 pass
+            try:
+                app.show_status('Realizando cierre…')
+            except Exception:
+                pass
+            self._cierre_task = self._runner.run(
+                self._collect_cierre, app, facturas_dir, today, tc, getattr(app, 'user', ''),
+                on_done=lambda res: self._finish_cierre(app, today, res),
+                on_error=lambda e: self._cierre_failed(app, e))
+        except Exception:
+            pass
 
-            # compute full analytics (conteo por método, totales, módulo divisas, gran total)
-            analytics = None
+    def _collect_cierre(self, task, app, facturas_dir, today, tc, user):
+        """Worker thread: compute today's analytics, save the record and PDF."""
+        # day analytics: one daily_sales row (or invoices + server, see cierre_caja)
+        try:
             try:
-                from historial.cierre_caja import compute_cierre_analytics, save_cierre_pdf
-                tc = float(getattr(app, 'exchange_rate', 1.0) or 1.0)
-                analytics = compute_cierre_analytics(facturas_dia, tc)
+                from historial.cierre_caja import cierre_analytics_dia
             except Exception:
-                try:
-                    from venta.historial.cierre_caja import compute_cierre_analytics, save_cierre_pdf
-                    tc = float(getattr(app, 'exchange_rate', 1.0) or 1.0)
-                    analytics = compute_cierre_analytics(facturas_dia, tc)
-                except Exception:
-                    analytics = {'total_efectivo': 0.0, 'total_pv': 0.0, 'total_pm': 0.0, 'total_usd_bs': 0.0,
-                                'total_gral_bs': 0.0, 'total_gral_usd': 0.0, 'num_facturas': 0,
-                                'count_efectivo': 0, 'count_pv': 0, 'count_pm': 0, 'count_dolar': 0,
-                                'divisa_count': 0, 'divisa_total_usd': 0.0, 'divisa_total_bs_equiv': 0.0}
-                    try:
-                        for inv in facturas_dia:
-                            pays = inv.get('payments') or {}
-                            analytics['total_efectivo'] += float(pays.get('efectivo_bs') or 0)
-                            analytics['total_pv'] += float(pays.get('punto_bs') or 0)
-                            analytics['total_pm'] += float(pays.get('pago_movil_bs') or 0)
-                            analytics['total_usd_bs'] += float(pays.get('usd') or 0) * tc
-                            analytics['total_gral_usd'] += float(inv.get('total_usd') or 0)
-                            if float(pays.get('efectivo_bs') or 0) > 0:
-                                analytics['count_efectivo'] += 1
-                            if float(pays.get('punto_bs') or 0) > 0:
-                                analytics['count_pv'] += 1
-                            if float(pays.get('pago_movil_bs') or 0) > 0:
-                                analytics['count_pm'] += 1
-                            if float(pays.get('usd') or 0) > 0:
-                                analytics['count_dolar'] += 1
-                        analytics['total_gral_bs'] = analytics['total_efectivo'] + analytics['total_pv'] + analytics['total_pm'] + analytics['total_usd_bs']
-                        analytics['num_facturas'] = len(facturas_dia)
-                    except Exception:
-                        pass
+                from venta.historial.cierre_caja import cierre_analytics_dia
+            analytics = cierre_analytics_dia(app, facturas_dir, today, tc)
+        except Exception:
+            analytics = {'total_efectivo': 0.0, 'total_pv': 0.0, 'total_pm': 0.0, 'total_usd_bs': 0.0,
+                         'total_gral_bs': 0.0, 'total_gral_usd': 0.0, 'num_facturas': 0,
+                         'count_efectivo': 0, 'count_pv': 0, 'count_pm': 0, 'count_dolar': 0,
+                         'divisa_count': 0, 'divisa_total_usd': 0.0, 'divisa_total_bs_equiv': 0.0}
 
-            # persist closure record (with full analytics)
+        # persist closure record (with full analytics)
+        saved = True
+        try:
+            d = getattr(app, '_data_dir', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data'))
+            os.makedirs(d, exist_ok=True)
+            path = os.path.join(d, 'closures.json')
             try:
-                d = getattr(app, '_data_dir', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data'))
-                os.makedirs(d, exist_ok=True)
-                path = os.path.join(d, 'closures.json')
-                try:
-                    if os.path.exists(path):
-                        with open(path, 'r', encoding='utf-8') as f:
-                            arr = json.load(f) or []
-                    else:
-                        arr = []
-                except Exception:
+                if os.path.exists(path):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        arr = json.load(f) or []
+                else:
                     arr = []
-                rec = {
-                    'date': today,
-                    'timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
-                    'analytics': analytics,
-                    'user': getattr(app, 'user', '')
-                }
-                arr.append(rec)
-                with open(path, 'w', encoding='utf-8') as f:
-                    json.dump(arr, f, ensure_ascii=False, indent=2)
             except Exception:
-                try:
-                    app.show_status('No se pudo guardar el cierre')
-                except Exception:
-                    pass
+                arr = []
+            rec = {
+                'date': today,
+                'timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'analytics': analytics,
+                'user': user
+            }
+            arr.append(rec)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(arr, f, ensure_ascii=False, indent=2)
+        except Exception:
+            saved = False
 
-            # save PDF to Cierres_Caja/YYYY/MM_Mes/Cierre_DD-MM-YYYY_HHmm.pdf
+        # save PDF to Cierres_Caja/YYYY/MM_Mes/Cierre_DD-MM-YYYY_HHmm.pdf
+        pdf_path = ''
+        try:
             try:
                 from historial.cierre_caja import save_cierre_pdf
             except Exception:
                 from venta.historial.cierre_caja import save_cierre_pdf
-            try:
-                pdf_path = save_cierre_pdf(app, analytics or {}, today, getattr(app, 'user', ''))
-                if pdf_path and hasattr(app, 'show_status'):
-                    app.show_status(f'Cierre guardado en {pdf_path}')
-            except Exception:
-                pass
+            pdf_path = save_cierre_pdf(app, analytics or {}, today, user)
+        except Exception:
+            pass
+        return analytics, saved, pdf_path
 
-            # mark venta closed
-            try:
-                app.venta_open = False
-            except Exception:
-                pass
-            try:
-                if hasattr(self.header_ref, 'update_venta_state'):
-                    self.header_ref.update_venta_state()
-            except Exception:
-                pass
+    def _cierre_failed(self, app, error):
+        try:
+            self.cierre_btn.configure(state='normal')
+        except Exception:
+            pass
+        try:
+            app.show_status(f'No se pudo realizar el cierre: {error}')
+        except Exception:
+            pass
 
-            # visual feedback: set cierre button to gray and abrir to green
-            try:
-                self.cierre_btn.configure(state='disabled', fg_color=self._color_gray)
-                self.abrir_btn.configure(state='normal', fg_color=self._color_green, text='Abrir Venta')
-            except Exception:
-                pass
+    def _finish_cierre(self, app, today, result):
+        """Tk thread: report the result, mark venta closed and open the cierre dialog."""
+        analytics, saved, pdf_path = result
+        try:
+            if not saved:
+                app.show_status('No se pudo guardar el cierre')
+            elif pdf_path:
+                app.show_status(f'Cierre guardado en {pdf_path}')
+        except Exception:
+            pass
 
-            # show notification
-            try:
-                self._show_notification('Cierre realizado')
-            except Exception:
-                pass
+        # mark venta closed
+        try:
+            app.venta_open = False
+        except Exception:
+            pass
+        try:
+            if hasattr(self.header_ref, 'update_venta_state'):
+                self.header_ref.update_venta_state()
+        except Exception:
+            pass
 
-            # open cierre dialog with current analytics
-            try:
-                from historial.cierre_caja import show_cierre_caja
-                show_cierre_caja(app, date_str=today, analytics=analytics)
-            except Exception:
-                try:
-                    from venta.historial.cierre_caja import show_cierre_caja
-                    show_cierre_caja(app, date_str=today, analytics=analytics)
-                except Exception:
-                    pass
+        # visual feedback: set cierre button to gray and abrir to green
+        try:
+            self.cierre_btn.configure(state='disabled', fg_color=self._color_gray)
+            self.abrir_btn.configure(state='normal', fg_color=self._color_green, text='Abrir Venta')
+        except Exception:
+            pass
 
+        # show notification
+        try:
+            self._show_notification('Cierre realizado')
         except Exception:
             pass
+
+        # open cierre dialog with current analytics
+        try:
+            from historial.cierre_caja import show_cierre_caja
+            show_cierre_caja(app, date_str=today, analytics=analytics)
+        except Exception:
+            try:
+                from venta.historial.cierre_caja import show_cierre_caja
+                show_cierre_caja(app, date_str=today, analytics=analytics)
+            except Exception:
+                pass
@@ -1,22 +1,129 @@
+import re
 import sqlite3
+import threading
+import unicodedata
+from contextlib import contextmanager
 from pathlib import Path
 import hashlib
+import json
+import os
 
 BASE_DIR = Path(__file__).parent
 DB_DIR = BASE_DIR / "data"
 DB_DIR.mkdir(exist_ok=True)
 DB_PATH = DB_DIR / "app.db"
 
+# Parámetros aplicados una sola vez al abrir cada conexión
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16384  # caché de páginas por conexión (16 MiB)
+
+# Una conexión de larga duración por hilo (sqlite3 no permite compartirla entre hilos)
+_local = threading.local()
+
+
+def _open_conn(path: str):
+    # isolation_level=None: autocommit; las transacciones se abren explícitamente con transaction()
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA cache_size=-{int(CACHE_SIZE_KIB)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
 
 def _get_conn():
-    return sqlite3.connect(DB_PATH)
+    """Devuelve la conexión persistente del hilo actual, abriéndola la primera vez.
 
+    Si DB_PATH cambia (p. ej. en pruebas o benchmarks) se cierra la anterior y se abre una nueva.
+    """
+    path = str(DB_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != path:
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        conn = _open_conn(path)
+        _local.conn = conn
+        _local.path = path
+        _local.depth = 0
+        _local.pending = []
+    return conn
 
-def init_db():
-    """Crea las tablas necesarias y un usuario administrador por defecto si no existe."""
+
+def close_conn():
+    """Cierra la conexión del hilo actual (se reabre sola en la próxima llamada)."""
+    conn = getattr(_local, 'conn', None)
+    _local.conn = None
+    _local.path = None
+    _local.depth = 0
+    _local.pending = []
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+@contextmanager
+def transaction(immediate: bool = False):
+    """Ejecuta un bloque dentro de una transacción sobre la conexión del hilo.
+
+    Uso:
+        with transaction() as conn:
+            conn.execute(...)
+
+    Confirma al salir y revierte si hay una excepción. Las llamadas anidadas usan
+    SAVEPOINT, de modo que varias funciones pueden compartir una misma transacción.
+    `immediate=True` toma el bloqueo de escritura al inicio (BEGIN IMMEDIATE).
+    Los avisos de cambios de productos se entregan solo tras el COMMIT externo.
+    """
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute(
+    depth = getattr(_local, 'depth', 0)
+    pending_mark = len(_local.pending)
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    else:
+        conn.execute(f"SAVEPOINT sp_{depth}")
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth = depth
+        del _local.pending[pending_mark:]
+        if depth == 0:
+            conn.execute("ROLLBACK")
+        else:
+            conn.execute(f"ROLLBACK TO sp_{depth}")
+            conn.execute(f"RELEASE sp_{depth}")
+        raise
+    _local.depth = depth
+    if depth == 0:
+        try:
+            conn.execute("COMMIT")
+        except BaseException:
+            del _local.pending[:]
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        _flush_product_changes()
+    else:
+        conn.execute(f"RELEASE sp_{depth}")
+
+
+# ---------------------------------------------------------------------------
+# Migraciones de esquema
+#
+# La versión del esquema se guarda en PRAGMA user_version. Cada entrada de
+# _MIGRATIONS lleva la BD de la versión i a la i+1 y se ejecuta una sola vez,
+# dentro de su propia transacción; en una BD al día init_db no toca el esquema.
+# ---------------------------------------------------------------------------
+
+def _migrate_v1(conn):
+    """Esquema base: tablas users/products/clients/settings y columnas añadidas en versiones antiguas."""
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -31,7 +138,7 @@ def init_db():
         """
     )
     # Tabla de productos para inventario
-    cur.execute(
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS products (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -44,7 +151,7 @@ def init_db():
         """
     )
     # Tabla de clientes
-    cur.execute(
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS clients (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -55,63 +162,432 @@ def init_db():
         )
         """
     )
-    conn.commit()
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """
+    )
+    # BD antiguas (anteriores a user_version): agregar columnas que falten
+    for table, col, ddl in (
+        ('users', 'role', "ALTER TABLE users ADD COLUMN role TEXT NOT NULL DEFAULT 'employee'"),
+        ('users', 'nombre', "ALTER TABLE users ADD COLUMN nombre TEXT DEFAULT ''"),
+        ('users', 'apellido', "ALTER TABLE users ADD COLUMN apellido TEXT DEFAULT ''"),
+        ('users', 'cedula', "ALTER TABLE users ADD COLUMN cedula TEXT DEFAULT ''"),
+        ('users', 'telefono', "ALTER TABLE users ADD COLUMN telefono TEXT DEFAULT ''"),
+        ('products', 'code', "ALTER TABLE products ADD COLUMN code TEXT DEFAULT ''"),
+        ('products', 'price_bs', "ALTER TABLE products ADD COLUMN price_bs REAL NOT NULL DEFAULT 0"),
+        ('products', 'price_usd', "ALTER TABLE products ADD COLUMN price_usd REAL NOT NULL DEFAULT 0"),
+    ):
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        if col not in cols:
+            conn.execute(ddl)
+    # Asegurar que el usuario 'admin' tenga rol admin (en caso de migración)
+    conn.execute("UPDATE users SET role = 'admin' WHERE username = 'admin'")
+
+
+def _has_unique_index_on(conn, table: str, column: str) -> bool:
+    """True si `table` ya tiene un índice UNIQUE cuya única columna es `column`."""
+    for row in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        name, unique = row[1], row[2]
+        if not unique:
+            continue
+        cols = [r[2] for r in conn.execute(f"PRAGMA index_info('{name}')").fetchall()]
+        if cols == [column]:
+            return True
+    return False
+
+
+def _migrate_v2(conn):
+    """Índices secundarios para búsquedas por código/nombre de producto y por cliente."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_code ON products(code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products(name COLLATE NOCASE)")
+    # cedula es UNIQUE en el CREATE TABLE, por lo que SQLite ya mantiene un índice;
+    # solo se crea uno propio si la tabla viene de un esquema sin esa restricción.
+    if not _has_unique_index_on(conn, 'clients', 'cedula'):
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_clients_cedula ON clients(cedula)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clients_apellido_nombre ON clients(apellido, nombre)")
+
 
-    # Migración: si la columna 'role' no existe (BD antigua), agregarla
-    # Add missing columns if they don't exist
+def _fts_code_terms(ref: str) -> str:
+    """Expresión SQL con los términos de código indexados para la fila `ref` (new/old/products).
+
+    Incluye el código tal cual y el código visible en la tabla de inventario
+    (numérico rellenado a 4 dígitos, o el id rellenado si no hay código).
+    """
+    return (
+        f"COALESCE({ref}.code, '') || ' ' || CASE "
+        f"WHEN COALESCE({ref}.code, '') = '' THEN substr('0000' || {ref}.id, -max(4, length({ref}.id))) "
+        f"WHEN {ref}.code NOT GLOB '*[^0-9]*' THEN substr('0000' || {ref}.code, -max(4, length({ref}.code))) "
+        f"ELSE '' END"
+    )
+
+
+def _migrate_v3(conn):
+    """Índice FTS5 sobre productos (código y nombre, sin acentos), sincronizado por triggers."""
     try:
-        cur.execute("PRAGMA table_info(users)")
-        cols = [r[1] for r in cur.fetchall()]
-        for col, ddl in (
-            ('role', "ALTER TABLE users ADD COLUMN role TEXT NOT NULL DEFAULT 'employee'"),
-            ('nombre', "ALTER TABLE users ADD COLUMN nombre TEXT DEFAULT ''"),
-            ('apellido', "ALTER TABLE users ADD COLUMN apellido TEXT DEFAULT ''"),
-            ('cedula', "ALTER TABLE users ADD COLUMN cedula TEXT DEFAULT ''"),
-            ('telefono', "ALTER TABLE users ADD COLUMN telefono TEXT DEFAULT ''"),
-            # products migrations
-            ('code', "ALTER TABLE products ADD COLUMN code TEXT DEFAULT ''"),
-            ('price_bs', "ALTER TABLE products ADD COLUMN price_bs REAL NOT NULL DEFAULT 0"),
-            ('price_usd', "ALTER TABLE products ADD COLUMN price_usd REAL NOT NULL DEFAULT 0"),
-        ):
-            if col not in cols:
-                try:
-                    cur.execute(ddl)
-                    conn.commit()
-                except Exception:
-                    pass
-    except Exception:
-        pass
-    # Asegurar que el usuario 'admin' tenga rol admin (en caso de migración)
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+            "code, name, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except sqlite3.OperationalError:
+        # SQLite compilado sin FTS5: search_products usa LIKE como alternativa
+        return
+    conn.execute("DELETE FROM products_fts")
+    conn.execute(
+        f"INSERT INTO products_fts (rowid, code, name) SELECT id, {_fts_code_terms('products')}, name FROM products"
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, code, name) VALUES (new.id, {_fts_code_terms('new')}, new.name);
+        END
+        """
+    )
+    # solo código/nombre: los cambios de stock y precio no tocan el índice
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF id, code, name ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+            INSERT INTO products_fts (rowid, code, name) VALUES (new.id, {_fts_code_terms('new')}, new.name);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+        END
+        """
+    )
+
+
+def _migrate_v4(conn):
+    """Facturas finalizadas en tablas (antes solo archivos JSON por día en data/facturas)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'FINALIZADA',
+            client_cedula TEXT DEFAULT '',
+            client_name TEXT DEFAULT '',
+            user TEXT DEFAULT '',
+            subtotal_usd REAL NOT NULL DEFAULT 0,
+            iva_usd REAL NOT NULL DEFAULT 0,
+            total_usd REAL NOT NULL DEFAULT 0,
+            subtotal_bs REAL NOT NULL DEFAULT 0,
+            iva_bs REAL NOT NULL DEFAULT 0,
+            total_bs REAL NOT NULL DEFAULT 0,
+            iva_pct REAL,
+            iva_enabled INTEGER,
+            paper_size TEXT DEFAULT '',
+            file TEXT DEFAULT '',
+            extra TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS invoice_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+            line_no INTEGER NOT NULL,
+            product_id INTEGER,
+            name TEXT NOT NULL DEFAULT '',
+            qty INTEGER NOT NULL DEFAULT 0,
+            price REAL NOT NULL DEFAULT 0,
+            subtotal REAL NOT NULL DEFAULT 0,
+            vat REAL NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS invoice_payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+            method TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0,
+            reference TEXT DEFAULT ''
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_fecha ON invoices(fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_state_fecha ON invoices(state, fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_numero ON invoices(numero)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_client ON invoices(client_cedula, fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items(invoice_id, line_no)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_invoice_payments_invoice ON invoice_payments(invoice_id)")
+
+
+def _migrate_v5(conn):
+    """Resumen de ventas por día (cierre de caja sin recorrer las facturas)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            fecha TEXT PRIMARY KEY,
+            num_facturas INTEGER NOT NULL DEFAULT 0,
+            count_efectivo INTEGER NOT NULL DEFAULT 0,
+            count_pv INTEGER NOT NULL DEFAULT 0,
+            count_pm INTEGER NOT NULL DEFAULT 0,
+            count_dolar INTEGER NOT NULL DEFAULT 0,
+            total_efectivo REAL NOT NULL DEFAULT 0,
+            total_pv REAL NOT NULL DEFAULT 0,
+            total_pm REAL NOT NULL DEFAULT 0,
+            total_usd REAL NOT NULL DEFAULT 0,
+            total_gral_usd REAL NOT NULL DEFAULT 0,
+            divisa_count INTEGER NOT NULL DEFAULT 0,
+            divisa_total_usd REAL NOT NULL DEFAULT 0,
+            divisa_total_bs_equiv REAL NOT NULL DEFAULT 0
+        )
+        """
+    )
+    _rebuild_daily_sales(conn)
+
+
+def _migrate_v6(conn):
+    """Libro de movimientos de stock (solo se agregan filas; reemplaza stock_history.json)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            product_id INTEGER,
+            codigo TEXT NOT NULL DEFAULT '',
+            producto TEXT NOT NULL DEFAULT '',
+            qty_before REAL,
+            qty_after REAL,
+            delta REAL NOT NULL DEFAULT 0,
+            reason TEXT NOT NULL DEFAULT '',
+            user TEXT NOT NULL DEFAULT ''
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_created ON stock_movements(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_product ON stock_movements(product_id, created_at)")
+
+
+def _migrate_v7(conn):
+    """Índice para filtrar el historial de stock por código (los registros heredados no tienen product_id)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_codigo ON stock_movements(codigo, created_at)")
+
+
+def _migrate_v8(conn):
+    """Cola persistente de impresión (utils/print_spooler.py): sobrevive a cierres y caídas."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS print_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            printer TEXT NOT NULL DEFAULT '',
+            invoice_numero TEXT NOT NULL DEFAULT '',
+            payload BLOB NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendiente',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT NOT NULL DEFAULT ''
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_print_jobs_status ON print_jobs(status, next_attempt_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_print_jobs_invoice ON print_jobs(invoice_numero, id)")
+
+
+def _migrate_v9(conn):
+    """Tickets impresos (utils/receipt_cache.py): bytes exactos comprimidos, por sha256, con LRU."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS receipts (
+            sha TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            printer TEXT NOT NULL DEFAULT '',
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_receipts_last_used ON receipts(last_used_at)")
+    _add_invoice_receipt_sha(conn)
+
+
+def _add_invoice_receipt_sha(conn):
+    """Columna invoices.receipt_sha (sha del ticket impreso en la tabla receipts); idempotente."""
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(invoices)").fetchall()]
+    if 'receipt_sha' not in cols:
+        conn.execute("ALTER TABLE invoices ADD COLUMN receipt_sha TEXT DEFAULT ''")
+
+
+def _migrate_v10(conn):
+    """Secuencia diaria de números de factura (YYYYMMDD-N), antes data/invoice_counter.json.
+
+    Arranca desde el mayor número ya guardado por día en invoices y, para el día del
+    contador JSON, desde su 'next'.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS invoice_sequence (
+            day TEXT PRIMARY KEY,
+            last INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO invoice_sequence (day, last)
+        SELECT substr(numero, 1, 8), MAX(CAST(substr(numero, 10) AS INTEGER))
+        FROM invoices WHERE numero GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]-[0-9]*'
+        GROUP BY substr(numero, 1, 8)
+        ON CONFLICT(day) DO UPDATE SET last = MAX(last, excluded.last)
+        """
+    )
     try:
-        cur.execute("UPDATE users SET role = 'admin' WHERE username = 'admin'")
-        conn.commit()
-    except Exception:
-        pass
+        with open(Path(DB_PATH).parent / 'invoice_counter.json', 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        day, last = str(data.get('date') or ''), int(data.get('next', 1)) - 1
+    except (OSError, ValueError, TypeError, AttributeError):
+        return
+    if len(day) == 8 and day.isdigit() and last > 0:
+        conn.execute(
+            "INSERT INTO invoice_sequence (day, last) VALUES (?, ?) "
+            "ON CONFLICT(day) DO UPDATE SET last = MAX(last, excluded.last)",
+            (day, last),
+        )
+
+
+def _migrate_v11(conn):
+    """Facturas en pausa y sus líneas por id de producto (antes se reescribía data/paused.json entero)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS paused_invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero TEXT NOT NULL DEFAULT '',
+            created_at TEXT NOT NULL,
+            user TEXT DEFAULT '',
+            client TEXT,
+            subtotal_bs REAL NOT NULL DEFAULT 0,
+            iva_bs REAL NOT NULL DEFAULT 0,
+            total_bs REAL NOT NULL DEFAULT 0,
+            total_usd REAL NOT NULL DEFAULT 0,
+            extra TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS paused_items (
+            paused_id INTEGER NOT NULL REFERENCES paused_invoices(id),
+            line_no INTEGER NOT NULL,
+            product_id INTEGER,
+            name TEXT NOT NULL DEFAULT '',
+            qty INTEGER NOT NULL DEFAULT 0,
+            price REAL NOT NULL DEFAULT 0,
+            subtotal REAL NOT NULL DEFAULT 0,
+            vat REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (paused_id, line_no)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_paused_items_product ON paused_items(product_id)")
+
+
+def _migrate_v12(conn):
+    """Total de la caché de tickets llevado al día y sha del ticket en print_jobs.
+
+    receipts_total evita sumar la tabla receipts en cada venta; con print_jobs.receipt_sha
+    el trabajo ya impreso suelta su copia de los bytes (quedan en receipts).
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS receipts_total (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            stored_size INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO receipts_total (id, stored_size) "
+        "SELECT 1, COALESCE(SUM(stored_size), 0) FROM receipts"
+    )
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(print_jobs)").fetchall()]
+    if 'receipt_sha' not in cols:
+        conn.execute("ALTER TABLE print_jobs ADD COLUMN receipt_sha TEXT NOT NULL DEFAULT ''")
+
+
+_MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+    _migrate_v7,
+    _migrate_v8,
+    _migrate_v9,
+    _migrate_v10,
+    _migrate_v11,
+    _migrate_v12,
+]
+
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+
+def get_schema_version() -> int:
+    return int(_get_conn().execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate() -> int:
+    """Aplica las migraciones pendientes y devuelve la versión resultante del esquema."""
+    version = get_schema_version()
+    if version >= SCHEMA_VERSION:
+        return version
+    # BEGIN IMMEDIATE: si dos procesos arrancan a la vez, el segundo espera y relee la versión
+    with transaction(immediate=True) as conn:
+        version = get_schema_version()
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            _MIGRATIONS[target - 1](conn)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+    return get_schema_version()
+
+
+def init_db():
+    """Crea/actualiza el esquema y un usuario administrador por defecto si no existe."""
+    migrate()
 
     # Asegurar usuario por defecto: admin / admin
     if not get_user("admin"):
         create_user("admin", "admin", role='admin')
 
-    conn.close()
+    reload_settings()
 
+    # Importar una sola vez las facturas guardadas como JSON antes de existir la tabla invoices
+    if get_setting('invoices_json_imported') != '1':
+        try:
+            import_invoices_from_json(Path(DB_PATH).parent / 'facturas')
+            set_setting('invoices_json_imported', '1')
+        except Exception:
+            pass
 
-    # Ensure settings table exists
-    try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-            """
-        )
-        conn.commit()
-        conn.close()
-    except Exception:
+    # Igual con el historial de stock que antes se reescribía entero en stock_history.json
+    if get_setting('stock_history_json_imported') != '1':
         try:
-            conn.close()
+            import_stock_history_json(Path(DB_PATH).parent / 'stock_history.json')
+            set_setting('stock_history_json_imported', '1')
+        except Exception:
+            pass
+
+    # Y con las facturas en pausa de paused.json
+    if get_setting('paused_json_imported') != '1':
+        try:
+            import_paused_json(Path(DB_PATH).parent / 'paused.json')
+            set_setting('paused_json_imported', '1')
         except Exception:
             pass
 
@@ -121,28 +597,20 @@ def _hash_password(password: str) -> str:
 
 
 def create_user(username: str, password: str, role: str = 'employee', nombre: str = '', apellido: str = '', cedula: str = '', telefono: str = '') -> bool:
-    conn = _get_conn()
-    cur = conn.cursor()
     try:
-        cur.execute(
-            "INSERT INTO users (username, password_hash, role, nombre, apellido, cedula, telefono) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (username, _hash_password(password), role, nombre, apellido, cedula, telefono),
-        )
-        conn.commit()
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (username, password_hash, role, nombre, apellido, cedula, telefono) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (username, _hash_password(password), role, nombre, apellido, cedula, telefono),
+            )
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 
 def get_user(username: str):
-    conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, username, password_hash, role, nombre, apellido, cedula, telefono FROM users WHERE username = ?", (username,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    cur = _get_conn().execute("SELECT id, username, password_hash, role, nombre, apellido, cedula, telefono FROM users WHERE username = ?", (username,))
+    return cur.fetchone()
 
 
 def verify_user(username: str, password: str) -> bool:
@@ -154,64 +622,117 @@ def verify_user(username: str, password: str) -> bool:
 
 
 def get_all_users():
-    conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, username, role, nombre, apellido, cedula, telefono FROM users ORDER BY id DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    cur = _get_conn().execute("SELECT id, username, role, nombre, apellido, cedula, telefono FROM users ORDER BY id DESC")
+    return cur.fetchall()
 
 
 def update_user(user_id: int, username: str | None = None, password: str | None = None, role: str | None = None, nombre: str | None = None, apellido: str | None = None, cedula: str | None = None, telefono: str | None = None) -> bool:
-    conn = _get_conn()
-    cur = conn.cursor()
+    fields = []
+    params = []
+    if username is not None:
+        fields.append('username = ?')
+        params.append(username)
+    if password is not None:
+        fields.append('password_hash = ?')
+        params.append(_hash_password(password))
+    if role is not None:
+        fields.append('role = ?')
+        params.append(role)
+    if nombre is not None:
+        fields.append('nombre = ?')
+        params.append(nombre)
+    if apellido is not None:
+        fields.append('apellido = ?')
+        params.append(apellido)
+    if cedula is not None:
+        fields.append('cedula = ?')
+        params.append(cedula)
+    if telefono is not None:
+        fields.append('telefono = ?')
+        params.append(telefono)
+    if not fields:
+        return False
+    params.append(int(user_id))
+    sql = f"UPDATE users SET {', '.join(fields)} WHERE id = ?"
     try:
-        fields = []
-        params = []
-        if username is not None:
-            fields.append('username = ?')
-            params.append(username)
-        if password is not None:
-            fields.append('password_hash = ?')
-            params.append(_hash_password(password))
-        if role is not None:
-            fields.append('role = ?')
-            params.append(role)
-        if nombre is not None:
-            fields.append('nombre = ?')
-            params.append(nombre)
-        if apellido is not None:
-            fields.append('apellido = ?')
-            params.append(apellido)
-        if cedula is not None:
-            fields.append('cedula = ?')
-            params.append(cedula)
-        if telefono is not None:
-            fields.append('telefono = ?')
-            params.append(telefono)
-        if not fields:
-            return False
-        params.append(int(user_id))
-        sql = f"UPDATE users SET {', '.join(fields)} WHERE id = ?"
-        cur.execute(sql, params)
-        conn.commit()
-        changed = cur.rowcount > 0
-        return changed
+        with transaction() as conn:
+            cur = conn.execute(sql, params)
+        return cur.rowcount > 0
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 
 def delete_user(user_id: int) -> bool:
-    conn = _get_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM users WHERE id = ?", (int(user_id),))
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
+    with transaction() as conn:
+        cur = conn.execute("DELETE FROM users WHERE id = ?", (int(user_id),))
+    return cur.rowcount > 0
+
+
+# Avisos de cambios en productos
+# Las vistas (p. ej. TablaInventario) se suscriben para actualizar solo las filas afectadas.
+# callback(kind, ids): kind es 'insert', 'update' o 'delete'; ids es una tupla de ids
+# de producto, o None si el cambio afecta a todo el catálogo.
+_products_lock = threading.Lock()
+_products_listeners = []
+
+
+def subscribe_products(callback):
+    """Registra `callback(kind, ids)`; devuelve un token para unsubscribe_products()."""
+    entry = (callback,)
+    with _products_lock:
+        _products_listeners.append(entry)
+    return entry
+
+
+def unsubscribe_products(token) -> None:
+    with _products_lock:
+        try:
+            _products_listeners.remove(token)
+        except ValueError:
+            pass
+
+
+def _product_changed(kind: str, ids=None) -> None:
+    """Encola un aviso; se envía cuando la transacción en curso se confirma."""
+    ids = tuple(int(i) for i in ids) if ids is not None else None
+    _local.pending.append((kind, ids))
+    if getattr(_local, 'depth', 0) == 0:
+        _flush_product_changes()
+
+
+def after_commit(callback) -> None:
+    """Ejecuta callback() cuando se confirme la transacción en curso del hilo (o ya, si no hay una).
+
+    Si la transacción se revierte el callback se descarta. Va en la misma cola que los
+    avisos de productos, así que respeta su orden.
+    """
+    _get_conn()
+    _local.pending.append((None, callback))
+    if getattr(_local, 'depth', 0) == 0:
+        _flush_product_changes()
+
+
+def _flush_product_changes() -> None:
+    pending = getattr(_local, 'pending', None)
+    if not pending:
+        return
+    events = list(pending)
+    del pending[:]
+    with _products_lock:
+        listeners = list(_products_listeners)
+    for kind, ids in events:
+        if kind is None:
+            # after_commit(): ids es el callback
+            try:
+                ids()
+            except Exception:
+                pass
+            continue
+        for (callback,) in listeners:
+            try:
+                callback(kind, ids)
+            except Exception:
+                pass
 
 
 # Funciones para productos (inventario)
@@ -221,202 +742,1419 @@ def add_product(name: str, price: float, quantity: int) -> int:
 
 
 def get_products():
+    cur = _get_conn().execute("SELECT id, code, name, price_bs, price_usd, quantity FROM products ORDER BY id DESC")
+    return cur.fetchall()
+
+
+def _search_terms(query: str) -> list:
+    """Separa la búsqueda en términos sin acentos, igual que el tokenizador unicode61."""
+    s = unicodedata.normalize('NFD', str(query or ''))
+    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+    return re.findall(r'[^\W_]+', s.lower())
+
+
+def _has_products_fts(conn) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'").fetchone()
+    return row is not None
+
+
+def get_products_by_ids(ids):
+    """Devuelve {id: fila} (misma forma que get_products()) para los ids indicados que existan."""
+    ids = [int(i) for i in ids]
+    out = {}
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, code, name, price_bs, price_usd, quantity FROM products ORDER BY id DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    # por lotes para no superar el límite de parámetros de SQLite
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        marks = ','.join('?' * len(chunk))
+        for row in conn.execute(
+            f"SELECT id, code, name, price_bs, price_usd, quantity FROM products WHERE id IN ({marks})", chunk
+        ):
+            out[row[0]] = row
+    return out
 
 
-def add_product_full(code: str, name: str, price_bs: float, price_usd: float, quantity: int) -> int:
+def search_products(query: str = None, limit: int = None):
+    """Busca productos por código o nombre (prefijo por palabra, sin distinguir acentos ni mayúsculas).
+
+    Devuelve filas con la misma forma que get_products(), ordenadas por id descendente.
+    Con una búsqueda vacía devuelve todos los productos (hasta `limit`).
+    """
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO products (code, name, price_bs, price_usd, quantity) VALUES (?, ?, ?, ?, ?)",
-        (code, name, float(price_bs), float(price_usd), int(quantity)),
+    terms = _search_terms(query)
+    lim = int(limit) if limit is not None else -1
+    if not terms:
+        cur = conn.execute(
+            "SELECT id, code, name, price_bs, price_usd, quantity FROM products ORDER BY id DESC LIMIT ?", (lim,)
+        )
+        return cur.fetchall()
+    if _has_products_fts(conn):
+        match = ' '.join(f'"{t}"*' for t in terms)
+        cur = conn.execute(
+            "SELECT p.id, p.code, p.name, p.price_bs, p.price_usd, p.quantity "
+            "FROM products_fts f JOIN products p ON p.id = f.rowid "
+            "WHERE products_fts MATCH ? ORDER BY f.rowid DESC LIMIT ?",
+            (match, lim),
+        )
+        return cur.fetchall()
+    # sin FTS5: subcadena por término (sensible a acentos)
+    where = ' AND '.join("(name LIKE ? OR code LIKE ?)" for _ in terms)
+    params = []
+    for t in terms:
+        params.extend((f'%{t}%', f'%{t}%'))
+    cur = conn.execute(
+        f"SELECT id, code, name, price_bs, price_usd, quantity FROM products WHERE {where} ORDER BY id DESC LIMIT ?",
+        (*params, lim),
     )
-    conn.commit()
-    pid = cur.lastrowid
-    conn.close()
-    return pid
+    return cur.fetchall()
+
+
+def add_product_full(code: str, name: str, price_bs: float, price_usd: float, quantity: int) -> int:
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO products (code, name, price_bs, price_usd, quantity) VALUES (?, ?, ?, ?, ?)",
+            (code, name, float(price_bs), float(price_usd), int(quantity)),
+        )
+        _product_changed('insert', (cur.lastrowid,))
+    return cur.lastrowid
 
 
 def delete_product(product_id: int) -> bool:
-    conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM products WHERE id = ?", (product_id,))
-    conn.commit()
-    changed = cur.rowcount > 0
-    conn.close()
-    return changed
+    with transaction() as conn:
+        cur = conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+        if cur.rowcount > 0:
+            _product_changed('delete', (product_id,))
+    return cur.rowcount > 0
 
 
 def update_product(product_id: int, code: str = None, name: str = None, price_bs: float = None, price_usd: float = None, quantity: int = None) -> bool:
-    conn = _get_conn()
-    cur = conn.cursor()
-    try:
-        fields = []
-        params = []
-        if code is not None:
-            fields.append('code = ?')
-            params.append(code)
-        if name is not None:
-            fields.append('name = ?')
-            params.append(name)
-        if price_bs is not None:
-            fields.append('price_bs = ?')
-            params.append(float(price_bs))
-        if price_usd is not None:
-            fields.append('price_usd = ?')
-            params.append(float(price_usd))
-        if quantity is not None:
-            fields.append('quantity = ?')
-            params.append(int(quantity))
-        if not fields:
-            return False
-        params.append(int(product_id))
-        sql = f"UPDATE products SET {', '.join(fields)} WHERE id = ?"
-        cur.execute(sql, params)
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
+    fields = []
+    params = []
+    if code is not None:
+        fields.append('code = ?')
+        params.append(code)
+    if name is not None:
+        fields.append('name = ?')
+        params.append(name)
+    if price_bs is not None:
+        fields.append('price_bs = ?')
+        params.append(float(price_bs))
+    if price_usd is not None:
+        fields.append('price_usd = ?')
+        params.append(float(price_usd))
+    if quantity is not None:
+        fields.append('quantity = ?')
+        params.append(int(quantity))
+    if not fields:
+        return False
+    params.append(int(product_id))
+    sql = f"UPDATE products SET {', '.join(fields)} WHERE id = ?"
+    with transaction() as conn:
+        cur = conn.execute(sql, params)
+        if cur.rowcount > 0:
+            _product_changed('update', (product_id,))
+    return cur.rowcount > 0
 
 
 def decrease_product_quantity(product_id: int, amount: int) -> bool:
     """Decrease product quantity by amount if enough stock exists. Returns True if decreased."""
-    conn = _get_conn()
-    cur = conn.cursor()
-    try:
-        # Only decrease if current quantity >= amount
-        cur.execute("UPDATE products SET quantity = quantity - ? WHERE id = ? AND quantity >= ?", (int(amount), int(product_id), int(amount)))
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
+    # Only decrease if current quantity >= amount
+    with transaction() as conn:
+        cur = conn.execute("UPDATE products SET quantity = quantity - ? WHERE id = ? AND quantity >= ?", (int(amount), int(product_id), int(amount)))
+        if cur.rowcount > 0:
+            _product_changed('update', (product_id,))
+    return cur.rowcount > 0
 
 
 def increase_product_quantity(product_id: int, amount: int) -> bool:
     """Increase product quantity by amount. Returns True if updated."""
-    conn = _get_conn()
-    cur = conn.cursor()
+    with transaction() as conn:
+        cur = conn.execute("UPDATE products SET quantity = quantity + ? WHERE id = ?", (int(amount), int(product_id)))
+        if cur.rowcount > 0:
+            _product_changed('update', (product_id,))
+    return cur.rowcount > 0
+
+
+def _merge_items(items) -> dict:
+    """Agrupa [(pid, qty), ...] por producto; ignora ids no positivos (líneas sin producto en BD) y qty <= 0."""
+    merged = {}
+    for pid, qty in items:
+        pid = int(pid)
+        qty = int(qty)
+        if pid <= 0 or qty <= 0:
+            continue
+        merged[pid] = merged.get(pid, 0) + qty
+    return merged
+
+
+class _ReserveShortage(Exception):
+    """Interna: aborta la transacción de reserve_items cuando falta stock."""
+
+
+def reserve_items(items) -> list:
+    """Descuenta stock de varias líneas [(pid, qty), ...] en una sola transacción (BEGIN IMMEDIATE).
+
+    Todo o nada: si alguna línea no tiene stock suficiente no se descuenta ninguna.
+    Devuelve la lista de faltantes [(pid, pedido, disponible)]; vacía si se reservó todo.
+    Un producto inexistente figura con disponible = 0.
+    """
+    merged = _merge_items(items)
+    if not merged:
+        return []
     try:
-        cur.execute("UPDATE products SET quantity = quantity + ? WHERE id = ?", (int(amount), int(product_id)))
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
+        with transaction(immediate=True) as conn:
+            shortages = []
+            for pid, qty in merged.items():
+                cur = conn.execute(
+                    "UPDATE products SET quantity = quantity - ? WHERE id = ? AND quantity >= ?", (qty, pid, qty)
+                )
+                if cur.rowcount == 0:
+                    row = conn.execute("SELECT quantity FROM products WHERE id = ?", (pid,)).fetchone()
+                    shortages.append((pid, qty, int(row[0]) if row else 0))
+            if shortages:
+                # transaction() revierte lo ya descontado
+                raise _ReserveShortage(shortages)
+            _product_changed('update', merged.keys())
+    except _ReserveShortage as e:
+        return e.args[0]
+    return []
+
+
+def release_items(items) -> int:
+    """Devuelve al stock varias líneas [(pid, qty), ...] en una sola transacción.
+
+    Devuelve la cantidad de productos actualizados (los ids inexistentes se ignoran).
+    """
+    merged = _merge_items(items)
+    if not merged:
+        return 0
+    updated = []
+    with transaction(immediate=True) as conn:
+        for pid, qty in merged.items():
+            cur = conn.execute("UPDATE products SET quantity = quantity + ? WHERE id = ?", (qty, pid))
+            if cur.rowcount > 0:
+                updated.append(pid)
+        if updated:
+            _product_changed('update', updated)
+    return len(updated)
 
 
 # Settings helpers
+# Caché en memoria de toda la tabla settings, compartida por el proceso. Se carga una vez
+# (por ruta de BD) y set_setting la actualiza al escribir; los listeners reciben los cambios.
+_settings_lock = threading.RLock()
+_settings_cache = None
+_settings_cache_path = None
+_settings_listeners = []
+# sube con cada cambio de ajustes (o recarga): lo usan las cachés derivadas, p. ej. el renderer de tickets
+_settings_version = 0
+
+
+def _load_settings() -> dict:
+    global _settings_cache, _settings_cache_path, _settings_version
+    path = str(DB_PATH)
+    cache = _settings_cache
+    if cache is not None and _settings_cache_path == path:
+        return cache
+    with _settings_lock:
+        if _settings_cache is None or _settings_cache_path != path:
+            try:
+                rows = _get_conn().execute("SELECT key, value FROM settings").fetchall()
+            except sqlite3.Error:
+                # la tabla aún no existe (antes de init_db): no cachear para reintentar luego
+                return {}
+            _settings_cache = dict(rows)
+            _settings_cache_path = path
+            _settings_version += 1
+        return _settings_cache
+
+
+def reload_settings():
+    """Descarta la caché de ajustes; la próxima lectura vuelve a cargar la tabla completa."""
+    global _settings_cache, _settings_version
+    with _settings_lock:
+        _settings_cache = None
+        _settings_version += 1
+
+
+def settings_version() -> int:
+    """Número que cambia cada vez que cambia algún ajuste (para invalidar cachés derivadas)."""
+    _load_settings()
+    return _settings_version
+
+
 def get_setting(key: str, default=None):
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        row = cur.fetchone()
-        conn.close()
-        if row:
-            return row[0]
+        return _load_settings().get(key, default)
     except Exception:
-        try:
-            conn.close()
-        except Exception:
-            pass
-    return default
+        return default
 
 
 def set_setting(key: str, value: str) -> bool:
+    global _settings_version
+    value = str(value)
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, str(value)))
-        conn.commit()
-        conn.close()
-        return True
+        with _settings_lock:
+            cache = _load_settings()
+            old = cache.get(key)
+            with transaction() as conn:
+                conn.execute("INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, value))
+            cache[key] = value
+            if old != value:
+                _settings_version += 1
     except Exception:
+        return False
+    if old != value:
+        _notify_setting(key, value)
+    return True
+
+
+def subscribe_settings(callback, keys=None):
+    """Registra `callback(key, value)` para cambios en `keys` (o en cualquier ajuste si es None).
+
+    Devuelve un token para unsubscribe_settings(). El callback se ejecuta en el hilo que
+    llamó a set_setting.
+    """
+    entry = (frozenset(keys) if keys else None, callback)
+    with _settings_lock:
+        _settings_listeners.append(entry)
+    return entry
+
+
+def unsubscribe_settings(token) -> None:
+    with _settings_lock:
         try:
-            conn.close()
+            _settings_listeners.remove(token)
+        except ValueError:
+            pass
+
+
+def _notify_setting(key: str, value: str) -> None:
+    with _settings_lock:
+        listeners = list(_settings_listeners)
+    for keys, callback in listeners:
+        if keys is not None and key not in keys:
+            continue
+        try:
+            callback(key, value)
         except Exception:
             pass
-        return False
 
 
 def update_prices_by_rate(rate: float) -> bool:
     """Update price_bs for all products using price_usd * rate. Returns True on success."""
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("UPDATE products SET price_bs = price_usd * ?", (float(rate),))
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute("UPDATE products SET price_bs = price_usd * ?", (float(rate),))
+            _product_changed('update', None)
         return True
     except Exception:
-        try:
-            conn.close()
-        except Exception:
-            pass
         return False
 
 
 # Funciones para clientes
 def add_client(nombre: str, apellido: str, cedula: str, telefono: str = "") -> int:
-    conn = _get_conn()
-    cur = conn.cursor()
     try:
-        cur.execute(
-            "INSERT INTO clients (nombre, apellido, cedula, telefono) VALUES (?, ?, ?, ?)",
-            (nombre, apellido, cedula, telefono),
-        )
-        conn.commit()
+        with transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO clients (nombre, apellido, cedula, telefono) VALUES (?, ?, ?, ?)",
+                (nombre, apellido, cedula, telefono),
+            )
         return cur.lastrowid
     except sqlite3.IntegrityError:
         return -1
-    finally:
-        conn.close()
 
 
 def get_clients():
-    conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, nombre, apellido, cedula, telefono FROM clients ORDER BY id DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    cur = _get_conn().execute("SELECT id, nombre, apellido, cedula, telefono FROM clients ORDER BY id DESC")
+    return cur.fetchall()
 
 
 def delete_client(client_id: int) -> bool:
-    conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM clients WHERE id = ?", (client_id,))
-    conn.commit()
-    changed = cur.rowcount > 0
-    conn.close()
-    return changed
+    with transaction() as conn:
+        cur = conn.execute("DELETE FROM clients WHERE id = ?", (client_id,))
+    return cur.rowcount > 0
 
 
 def update_client(client_id: int, nombre: str, apellido: str, cedula: str, telefono: str) -> bool:
-    conn = _get_conn()
-    cur = conn.cursor()
     try:
-        cur.execute(
-            "UPDATE clients SET nombre = ?, apellido = ?, cedula = ?, telefono = ? WHERE id = ?",
-            (nombre, apellido, cedula, telefono, client_id),
-        )
-        conn.commit()
-        changed = cur.rowcount > 0
-        return changed
+        with transaction() as conn:
+            cur = conn.execute(
+                "UPDATE clients SET nombre = ?, apellido = ?, cedula = ?, telefono = ? WHERE id = ?",
+                (nombre, apellido, cedula, telefono, client_id),
+            )
+        return cur.rowcount > 0
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 
 def get_client(client_id: int):
+    cur = _get_conn().execute("SELECT id, nombre, apellido, cedula, telefono FROM clients WHERE id = ?", (client_id,))
+    return cur.fetchone()
+
+
+# ---------------------------------------------------------------------------
+# Facturas
+#
+# Las facturas se leen y escriben como el mismo dict que ventanas/impresion.py
+# guarda en JSON (id, numero_factura, productos, payments, totales...), para que
+# cierre, exportación e historial funcionen igual con cualquiera de las dos fuentes.
+# ---------------------------------------------------------------------------
+
+_PAYMENT_METHODS = ('punto_bs', 'efectivo_bs', 'usd', 'pago_movil_bs')
+
+# claves del dict que tienen columna propia; el resto se guarda en invoices.extra
+_INVOICE_KEYS = {
+    'id', 'numero_factura', 'productos', 'productos_display', 'payments', 'timestamp', 'datetime', 'state',
+    'client', 'user', 'subtotal_usd', 'iva_amount_usd', 'total_usd', 'subtotal_bs', 'iva_amount_bs', 'total_bs',
+    'global_iva_pct', 'iva_enabled', 'paper_size', 'file', 'db_id', 'receipt_sha',
+}
+
+
+def _as_float(v) -> float:
+    try:
+        return float(v or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _invoice_datetime(inv: dict, fallback_date: str = None) -> tuple:
+    """(fecha 'YYYY-MM-DD', created_at 'YYYY-MM-DD HH:MM:SS') a partir de datetime/timestamp."""
+    dt = str(inv.get('datetime') or '').strip()
+    if len(dt) >= 10 and dt[4] == '-' and dt[7] == '-':
+        created = dt[:19] if len(dt) >= 19 else dt[:10] + ' 00:00:00'
+        return created[:10], created.replace('T', ' ')
+    ts = str(inv.get('timestamp') or '').strip()
+    if len(ts) >= 8 and ts[:8].isdigit():
+        day = f"{ts[:4]}-{ts[4:6]}-{ts[6:8]}"
+        hms = ts[9:15] if len(ts) >= 15 and ts[9:15].isdigit() else '000000'
+        return day, f"{day} {hms[:2]}:{hms[2:4]}:{hms[4:6]}"
+    day = (fallback_date or '')[:10] or '1970-01-01'
+    return day, f"{day} 00:00:00"
+
+
+def _client_fields(client) -> tuple:
+    if isinstance(client, dict):
+        cedula = str(client.get('ci') or client.get('cedula') or '')
+        name = ' '.join(str(client.get(k) or '').strip() for k in ('nombre', 'apellido')).strip()
+        name = name or str(client.get('name') or '')
+        return cedula, name
+    if client:
+        return '', str(client)
+    return '', ''
+
+
+def save_invoice(inv: dict, fallback_date: str = None) -> int:
+    """Guarda una factura (dict con la forma de impresion.py) con sus líneas y pagos. Devuelve su id en BD."""
+    fecha, created_at = _invoice_datetime(inv, fallback_date)
+    cedula, client_name = _client_fields(inv.get('client'))
+    extra = {k: v for k, v in inv.items() if k not in _INVOICE_KEYS}
+    iva_enabled = inv.get('iva_enabled')
+    with transaction() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO invoices (numero, fecha, created_at, state, client_cedula, client_name, user,
+                subtotal_usd, iva_usd, total_usd, subtotal_bs, iva_bs, total_bs,
+                iva_pct, iva_enabled, paper_size, file, extra, receipt_sha)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                str(inv.get('numero_factura') or inv.get('id') or ''), fecha, created_at,
+                str(inv.get('state') or 'FINALIZADA').upper(), cedula, client_name, str(inv.get('user') or ''),
+                _as_float(inv.get('subtotal_usd')), _as_float(inv.get('iva_amount_usd')), _as_float(inv.get('total_usd')),
+                _as_float(inv.get('subtotal_bs')), _as_float(inv.get('iva_amount_bs')), _as_float(inv.get('total_bs')),
+                inv.get('global_iva_pct'), None if iva_enabled is None else int(bool(iva_enabled)),
+                str(inv.get('paper_size') or ''), str(inv.get('file') or ''),
+                json.dumps(extra, ensure_ascii=False) if extra else None, str(inv.get('receipt_sha') or ''),
+            ),
+        )
+        invoice_id = cur.lastrowid
+        lines = []
+        for n, p in enumerate(inv.get('productos') or [], 1):
+            if not isinstance(p, dict):
+                continue
+            qty = int(_as_float(p.get('quantity') if p.get('quantity') is not None else (p.get('qty') or p.get('cantidad'))))
+            price = _as_float(p.get('price') if p.get('price') is not None else p.get('precio'))
+            subtotal = _as_float(p.get('subtotal')) if p.get('subtotal') is not None else price * qty
+            pid = p.get('id') if p.get('id') is not None else p.get('product_id')
+            try:
+                pid = int(pid) if pid is not None else None
+            except (TypeError, ValueError):
+                pid = None
+            lines.append((invoice_id, n, pid, str(p.get('name') or p.get('nombre') or ''), qty, price, subtotal,
+                          _as_float(p.get('vat'))))
+        if lines:
+            conn.executemany(
+                "INSERT INTO invoice_items (invoice_id, line_no, product_id, name, qty, price, subtotal, vat) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                lines,
+            )
+        pays = inv.get('payments') or {}
+        if isinstance(pays, dict) and pays:
+            ref = str(pays.get('pago_movil_ref') or '')
+            conn.executemany(
+                "INSERT INTO invoice_payments (invoice_id, method, amount, reference) VALUES (?, ?, ?, ?)",
+                [(invoice_id, m, _as_float(pays.get(m)), ref if m == 'pago_movil_bs' else '') for m in _PAYMENT_METHODS],
+            )
+        if str(inv.get('state') or 'FINALIZADA').upper() != 'ANULADA':
+            _add_to_daily_sales(conn, fecha, _sales_fields([inv]))
+    return invoice_id
+
+
+def _invoice_filters(date_from=None, date_to=None, state=None, exclude_state=None, numero=None, client=None,
+                     prefix: str = ''):
+    """Cláusula WHERE y parámetros; `prefix` califica las columnas (p. ej. 'i.' en un JOIN)."""
+    where = []
+    params = []
+    if date_from:
+        where.append(f"{prefix}fecha >= ?")
+        params.append(str(date_from)[:10])
+    if date_to:
+        where.append(f"{prefix}fecha <= ?")
+        params.append(str(date_to)[:10])
+    if state:
+        where.append(f"{prefix}state = ?")
+        params.append(str(state).upper())
+    if exclude_state:
+        where.append(f"{prefix}state <> ?")
+        params.append(str(exclude_state).upper())
+    if numero:
+        where.append(f"{prefix}numero = ?")
+        params.append(str(numero))
+    if client:
+        where.append(f"{prefix}client_cedula = ?")
+        params.append(str(client))
+    return (' WHERE ' + ' AND '.join(where)) if where else '', params
+
+
+_INVOICE_COLUMNS = (
+    "id, numero, fecha, created_at, state, client_cedula, client_name, user, subtotal_usd, iva_usd, total_usd, "
+    "subtotal_bs, iva_bs, total_bs, iva_pct, iva_enabled, paper_size, file, extra, receipt_sha"
+)
+
+
+def _invoice_from_row(row) -> dict:
+    (db_id, numero, _fecha, created_at, state, cedula, client_name, user, subtotal_usd, iva_usd, total_usd,
+     subtotal_bs, iva_bs, total_bs, iva_pct, iva_enabled, paper_size, file, extra, receipt_sha) = row
+    inv = {}
+    if extra:
+        try:
+            inv.update(json.loads(extra))
+        except ValueError:
+            pass
+    inv.update({
+        'db_id': db_id,
+        'id': numero,
+        'numero_factura': numero,
+        'productos': [],
+        'subtotal_usd': subtotal_usd,
+        'iva_amount_usd': iva_usd,
+        'total_usd': total_usd,
+        'subtotal_bs': subtotal_bs,
+        'iva_amount_bs': iva_bs,
+        'total_bs': total_bs,
+        'file': file or '',
+        'timestamp': created_at.replace('-', '').replace(':', '').replace(' ', '_'),
+        'datetime': created_at,
+        'state': state,
+        'global_iva_pct': iva_pct,
+        'iva_enabled': None if iva_enabled is None else bool(iva_enabled),
+        'paper_size': paper_size or '',
+        'receipt_sha': receipt_sha or '',
+        'payments': {},
+    })
+    if cedula or client_name:
+        inv['client'] = {'ci': cedula, 'nombre': client_name}
+    if user:
+        inv['user'] = user
+    return inv
+
+
+def get_invoices(date_from=None, date_to=None, state=None, exclude_state=None, numero=None, client=None,
+                 include_items: bool = True, descending: bool = False, limit: int = None) -> list:
+    """Facturas filtradas por rango de fechas ('YYYY-MM-DD', inclusive), estado, número y/o cédula del cliente.
+
+    Devuelve dicts con la misma forma que los JSON de data/facturas (incluye 'payments'
+    y, si include_items, 'productos'). Tres consultas en total, sin importar cuántas facturas.
+    """
+    where, params = _invoice_filters(date_from, date_to, state, exclude_state, numero, client)
+    order = 'DESC' if descending else 'ASC'
+    lim = int(limit) if limit is not None else -1
+    conn = _get_conn()
+    rows = conn.execute(
+        f"SELECT {_INVOICE_COLUMNS} FROM invoices{where} ORDER BY fecha {order}, created_at {order}, id {order} LIMIT ?",
+        (*params, lim),
+    ).fetchall()
+    invoices = [_invoice_from_row(r) for r in rows]
+    if not invoices:
+        return invoices
+    by_id = {inv['db_id']: inv for inv in invoices}
+    # líneas y pagos de las mismas facturas, en una consulta cada uno
+    if limit is None:
+        sub = f"SELECT id FROM invoices{where}"
+    else:
+        sub = f"SELECT id FROM invoices{where} ORDER BY fecha {order}, created_at {order}, id {order} LIMIT {lim}"
+    for invoice_id, method, amount, reference in conn.execute(
+        f"SELECT invoice_id, method, amount, reference FROM invoice_payments WHERE invoice_id IN ({sub})",
+        params,
+    ):
+        inv = by_id.get(invoice_id)
+        if inv is None:
+            continue
+        inv['payments'][method] = amount
+        if method == 'pago_movil_bs':
+            inv['payments']['pago_movil_ref'] = reference or ''
+    if include_items:
+        for invoice_id, product_id, name, qty, price, subtotal, vat in conn.execute(
+            "SELECT invoice_id, product_id, name, qty, price, subtotal, vat FROM invoice_items "
+            f"WHERE invoice_id IN ({sub}) ORDER BY invoice_id, line_no",
+            params,
+        ):
+            inv = by_id.get(invoice_id)
+            if inv is not None:
+                inv['productos'].append({'id': product_id, 'name': name, 'qty': qty, 'price': price,
+                                         'subtotal': subtotal, 'vat': vat})
+    return invoices
+
+
+INVOICE_LINE_COLUMNS = (
+    'numero', 'fecha', 'estado', 'cliente_ci', 'cliente', 'linea', 'producto_id', 'producto', 'cantidad',
+    'precio_unitario', 'subtotal', 'iva', 'total_factura_bs', 'total_factura_usd',
+    'efectivo_bs', 'punto_bs', 'pago_movil_bs', 'usd', 'ref_pago_movil',
+)
+
+
+def count_invoice_lines(date_from=None, date_to=None) -> int:
+    """Cantidad de filas que devolverá iter_invoice_lines (para mostrar progreso)."""
+    where, params = _invoice_filters(date_from, date_to, prefix='i.')
+    return int(_get_conn().execute(
+        f"SELECT COUNT(*) FROM invoices i LEFT JOIN invoice_items it ON it.invoice_id = i.id{where}", params
+    ).fetchone()[0])
+
+
+def iter_invoice_lines(date_from=None, date_to=None, batch: int = 1000):
+    """Genera una tupla por línea de factura (columnas INVOICE_LINE_COLUMNS) del rango.
+
+    Orden determinista (fecha, hora, id de factura, número de línea). Se lee del cursor
+    en bloques de `batch` filas, así la memoria no crece con el historial. Las facturas
+    sin líneas salen una vez con los campos de producto vacíos.
+    """
+    where, params = _invoice_filters(date_from, date_to)
+    joined_where = _invoice_filters(date_from, date_to, prefix='i.')[0]
+    # pagos pivotados una vez por factura (no una subconsulta por línea), solo las del rango
+    cur = _get_conn().execute(
+        f"""
+        SELECT i.numero, i.created_at, i.state, i.client_cedula, i.client_name,
+               it.line_no, it.product_id, it.name, it.qty, it.price, it.subtotal, it.vat,
+               i.total_bs, i.total_usd, p.efectivo_bs, p.punto_bs, p.pago_movil_bs, p.usd, p.ref
+        FROM invoices i
+        LEFT JOIN (
+            SELECT invoice_id,
+                   SUM(CASE WHEN method = 'efectivo_bs' THEN amount END) AS efectivo_bs,
+                   SUM(CASE WHEN method = 'punto_bs' THEN amount END) AS punto_bs,
+                   SUM(CASE WHEN method = 'pago_movil_bs' THEN amount END) AS pago_movil_bs,
+                   SUM(CASE WHEN method = 'usd' THEN amount END) AS usd,
+                   MAX(CASE WHEN method = 'pago_movil_bs' THEN reference END) AS ref
+            FROM invoice_payments
+            WHERE invoice_id IN (SELECT id FROM invoices{where})
+            GROUP BY invoice_id
+        ) p ON p.invoice_id = i.id
+        LEFT JOIN invoice_items it ON it.invoice_id = i.id{joined_where}
+        ORDER BY i.fecha, i.created_at, i.id, it.line_no
+        """,
+        params + params,
+    )
+    try:
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+
+def get_invoice(numero: str):
+    """Última factura guardada con ese número, o None."""
+    found = get_invoices(numero=numero, descending=True, limit=1)
+    return found[0] if found else None
+
+
+def void_invoice(numero: str, motivo: str = '') -> bool:
+    """Marca la factura como ANULADA (guarda el motivo en extra). Devuelve True si existía."""
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT id, extra, state, fecha FROM invoices WHERE numero = ? ORDER BY id DESC LIMIT 1", (str(numero),)
+        ).fetchone()
+        if row is None:
+            return False
+        if row[2] != 'ANULADA':
+            # restar la factura del resumen del día (con los mismos datos con que se sumó)
+            old = _invoices_by_db_id(conn, [row[0]])
+            _add_to_daily_sales(conn, row[3], _sales_fields(old), sign=-1)
+        try:
+            extra = json.loads(row[1]) if row[1] else {}
+        except ValueError:
+            extra = {}
+        if motivo:
+            extra['anulada_motivo'] = motivo
+        conn.execute(
+            "UPDATE invoices SET state = 'ANULADA', extra = ? WHERE id = ?",
+            (json.dumps(extra, ensure_ascii=False) if extra else None, row[0]),
+        )
+    return True
+
+
+def _invoices_by_db_id(conn, ids) -> list:
+    """Facturas (forma de get_invoices, sin líneas) por id de BD."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return []
+    marks = ','.join('?' * len(ids))
+    invoices = [_invoice_from_row(r) for r in conn.execute(
+        f"SELECT {_INVOICE_COLUMNS} FROM invoices WHERE id IN ({marks})", ids)]
+    by_id = {inv['db_id']: inv for inv in invoices}
+    for invoice_id, method, amount, reference in conn.execute(
+        f"SELECT invoice_id, method, amount, reference FROM invoice_payments WHERE invoice_id IN ({marks})", ids
+    ):
+        inv = by_id[invoice_id]
+        inv['payments'][method] = amount
+        if method == 'pago_movil_bs':
+            inv['payments']['pago_movil_ref'] = reference or ''
+    return invoices
+
+
+# -- Resumen diario de ventas (daily_sales) --
+# Mismos campos que utils.cierre_analytics.compute_cierre_analytics, pero sin depender de
+# la tasa: el pago en dólares se guarda en $ (total_usd) y se convierte al leer.
+
+_DAILY_SALES_FIELDS = (
+    'num_facturas', 'count_efectivo', 'count_pv', 'count_pm', 'count_dolar',
+    'total_efectivo', 'total_pv', 'total_pm', 'total_usd', 'total_gral_usd',
+    'divisa_count', 'divisa_total_usd', 'divisa_total_bs_equiv',
+)
+
+
+def _sales_fields(invoices) -> dict:
+    """Aporte de las facturas al resumen diario (analítica de cierre con tasa 1)."""
+    from utils.cierre_analytics import compute_cierre_analytics
+    a = compute_cierre_analytics(list(invoices), 1.0)
+    # con tasa 1, total_usd_bs es la suma de los pagos en dólares
+    a['total_usd'] = a['total_usd_bs']
+    return {k: a[k] for k in _DAILY_SALES_FIELDS}
+
+
+def _add_to_daily_sales(conn, fecha: str, fields: dict, sign: int = 1) -> None:
+    cols = ', '.join(_DAILY_SALES_FIELDS)
+    conn.execute(
+        f"INSERT INTO daily_sales (fecha, {cols}) VALUES (?, {', '.join('?' * len(_DAILY_SALES_FIELDS))}) "
+        f"ON CONFLICT(fecha) DO UPDATE SET {', '.join(f'{c} = {c} + excluded.{c}' for c in _DAILY_SALES_FIELDS)}",
+        (fecha, *(sign * fields[c] for c in _DAILY_SALES_FIELDS)),
+    )
+
+
+def _computed_daily_sales(date_from=None, date_to=None) -> dict:
+    """{fecha: campos} recalculado desde la tabla invoices (sin anuladas).
+
+    Lee solo las columnas que usa el resumen, no las de get_invoices(): la migración v5 lo
+    llama sobre un esquema sin las columnas que se agregaron después.
+    """
+    where, params = _invoice_filters(date_from, date_to, exclude_state='ANULADA')
+    conn = _get_conn()
+    invoices = {}
+    for db_id, created_at, total_usd, total_bs, extra in conn.execute(
+        f"SELECT id, created_at, total_usd, total_bs, extra FROM invoices{where}", params
+    ):
+        inv = {}
+        if extra:
+            try:
+                inv.update(json.loads(extra))
+            except ValueError:
+                pass
+        inv.update({'datetime': created_at, 'total_usd': total_usd, 'total_bs': total_bs, 'payments': {}})
+        invoices[db_id] = inv
+    for invoice_id, method, amount in conn.execute(
+        f"SELECT invoice_id, method, amount FROM invoice_payments WHERE invoice_id IN (SELECT id FROM invoices{where})",
+        params,
+    ):
+        inv = invoices.get(invoice_id)
+        if inv is not None:
+            inv['payments'][method] = amount
+    by_day = {}
+    for inv in invoices.values():
+        by_day.setdefault(inv['datetime'][:10], []).append(inv)
+    return {fecha: _sales_fields(invs) for fecha, invs in by_day.items()}
+
+
+def _stored_daily_sales(conn, date_from=None, date_to=None) -> dict:
+    where, params = _invoice_filters(date_from, date_to)
+    cols = ', '.join(_DAILY_SALES_FIELDS)
+    return {row[0]: dict(zip(_DAILY_SALES_FIELDS, row[1:]))
+            for row in conn.execute(f"SELECT fecha, {cols} FROM daily_sales{where}", params)}
+
+
+def _rebuild_daily_sales(conn, date_from=None, date_to=None) -> None:
+    where, params = _invoice_filters(date_from, date_to)
+    conn.execute(f"DELETE FROM daily_sales{where}", params)
+    for fecha, fields in _computed_daily_sales(date_from, date_to).items():
+        _add_to_daily_sales(conn, fecha, fields)
+
+
+def _daily_sales_analytics(row, exchange_rate) -> dict:
+    a = dict(zip(_DAILY_SALES_FIELDS, row)) if row else {k: 0 for k in _DAILY_SALES_FIELDS}
+    tc = _as_float(exchange_rate)
+    a['total_usd_bs'] = a.pop('total_usd') * tc
+    a['total_gral_bs'] = a['total_efectivo'] + a['total_pv'] + a['total_pm'] + a['total_usd_bs']
+    a['exchange_rate'] = exchange_rate
+    return a
+
+
+def get_daily_sales(fecha: str, exchange_rate: float = 1.0) -> dict:
+    """Analítica de cierre del día (misma forma que compute_cierre_analytics) leyendo una fila."""
+    fecha = str(fecha)[:10]
+    cols = ', '.join(_DAILY_SALES_FIELDS)
+    row = _get_conn().execute(f"SELECT {cols} FROM daily_sales WHERE fecha = ?", (fecha,)).fetchone()
+    return _daily_sales_analytics(row, exchange_rate)
+
+
+def get_daily_sales_range(date_from=None, date_to=None, exchange_rate: float = 1.0) -> list:
+    """Analítica de cada día con ventas en el rango (inclusive), con su 'fecha', en orden. Una consulta."""
+    where, params = _invoice_filters(date_from, date_to)
+    cols = ', '.join(_DAILY_SALES_FIELDS)
+    out = []
+    for row in _get_conn().execute(f"SELECT fecha, {cols} FROM daily_sales{where} ORDER BY fecha", params):
+        a = _daily_sales_analytics(row[1:], exchange_rate)
+        if not a['num_facturas']:
+            continue
+        a['fecha'] = row[0]
+        out.append(a)
+    return out
+
+
+def verify_daily_sales(date_from=None, date_to=None, fix: bool = False, tolerance: float = 0.005) -> list:
+    """Compara daily_sales con lo recalculado desde las facturas.
+
+    Devuelve [(fecha, campo, guardado, calculado)] con las diferencias mayores que
+    `tolerance`. Con fix=True reescribe los días con diferencias.
+    """
+    conn = _get_conn()
+    computed = _computed_daily_sales(date_from, date_to)
+    stored = _stored_daily_sales(conn, date_from, date_to)
+    zero = {k: 0 for k in _DAILY_SALES_FIELDS}
+    drift = []
+    for fecha in sorted(set(computed) | set(stored)):
+        want = computed.get(fecha, zero)
+        have = stored.get(fecha, zero)
+        for k in _DAILY_SALES_FIELDS:
+            if abs((have[k] or 0) - (want[k] or 0)) > tolerance:
+                drift.append((fecha, k, have[k], want[k]))
+    if fix and drift:
+        with transaction(immediate=True) as conn:
+            for fecha in sorted({d[0] for d in drift}):
+                conn.execute("DELETE FROM daily_sales WHERE fecha = ?", (fecha,))
+                if fecha in computed:
+                    _add_to_daily_sales(conn, fecha, computed[fecha])
+    return drift
+
+
+def import_invoices_from_json(facturas_dir) -> int:
+    """Importa las facturas JSON de facturas_dir/YYYY-MM-DD/*.json. Devuelve cuántas se importaron.
+
+    Se omiten las que ya existen (mismo número y fecha/hora), así que puede repetirse sin duplicar.
+    """
+    facturas_dir = str(facturas_dir)
+    if not os.path.isdir(facturas_dir):
+        return 0
+    count = 0
+    conn = _get_conn()
+    with transaction():
+        for entry in sorted(os.listdir(facturas_dir)):
+            day_path = os.path.join(facturas_dir, entry)
+            if not os.path.isdir(day_path):
+                continue
+            for fname in sorted(os.listdir(day_path)):
+                if not fname.lower().endswith('.json') or fname.startswith('_'):
+                    continue
+                try:
+                    with open(os.path.join(day_path, fname), 'r', encoding='utf-8') as f:
+                        inv = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if not isinstance(inv, dict):
+                    continue
+                numero = str(inv.get('numero_factura') or inv.get('id') or '')
+                _fecha, created_at = _invoice_datetime(inv, entry)
+                if conn.execute(
+                    "SELECT 1 FROM invoices WHERE numero = ? AND created_at = ?", (numero, created_at)
+                ).fetchone():
+                    continue
+                save_invoice(inv, fallback_date=entry)
+                count += 1
+    return count
+
+
+# Movimientos de stock
+STOCK_MOVEMENT_COLUMNS = ('id', 'created_at', 'product_id', 'codigo', 'producto', 'qty_before', 'qty_after',
+                          'delta', 'reason', 'user')
+
+
+def _utc_timestamp() -> str:
+    import datetime
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None).isoformat() + 'Z'
+
+
+def _utc_day_start(day, days: int = 0):
+    """Inicio (00:00 hora local) del día `day` + `days` como created_at UTC sin 'Z'; None si no es YYYY-MM-DD."""
+    import datetime
+    try:
+        start = datetime.datetime.strptime(str(day)[:10], '%Y-%m-%d') + datetime.timedelta(days=days)
+    except ValueError:
+        return None
+    return start.astimezone(datetime.timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def log_stock_movement(product_id=None, delta=None, reason: str = '', user: str = '', codigo: str = '',
+                       producto: str = '', qty_before=None, qty_after=None, created_at: str = None) -> int:
+    """Agrega un movimiento al libro de stock (un INSERT, costo constante). Devuelve su id.
+
+    Si no se pasa delta se calcula como qty_after - qty_before. created_at por defecto es la
+    hora UTC actual en ISO con 'Z' (el mismo formato que usaba stock_history.json).
+    """
+    if delta is None:
+        delta = _as_float(qty_after) - _as_float(qty_before)
+    try:
+        product_id = int(product_id) if product_id is not None else None
+    except (TypeError, ValueError):
+        product_id = None
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO stock_movements (created_at, product_id, codigo, producto, qty_before, qty_after, delta, "
+            "reason, user) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (created_at or _utc_timestamp(), product_id, str(codigo or ''), str(producto or ''),
+             None if qty_before is None else _as_float(qty_before),
+             None if qty_after is None else _as_float(qty_after),
+             _as_float(delta), str(reason or ''), str(user or '')),
+        )
+    return cur.lastrowid
+
+
+def get_stock_movements(date_from=None, date_to=None, product_id=None, codigo=None, reason=None, user=None,
+                        before=None, limit: int = None) -> list:
+    """Movimientos de stock como dicts (columnas STOCK_MOVEMENT_COLUMNS), del más reciente al más antiguo.
+
+    Para paginar: before=(created_at, id) del último movimiento de la página anterior
+    (búsqueda por índice, sin OFFSET). Los filtros de texto comparan el valor exacto;
+    date_from/date_to son días en hora local.
+    """
+    where = []
+    params = []
+    # created_at está en UTC y las fechas del filtro son días locales
+    if date_from:
+        where.append("created_at >= ?")
+        params.append(_utc_day_start(date_from) or str(date_from)[:10])
+    if date_to:
+        # todo el día hasta: antes del inicio del día siguiente
+        where.append("created_at < ?")
+        params.append(_utc_day_start(date_to, 1) or str(date_to)[:10] + '~')
+    if product_id is not None:
+        where.append("product_id = ?")
+        params.append(int(product_id))
+    for column, value in (('codigo', codigo), ('reason', reason), ('user', user)):
+        if value:
+            where.append(f"{column} = ?")
+            params.append(str(value))
+    if before is not None:
+        where.append("(created_at, id) < (?, ?)")
+        params.extend((str(before[0]), int(before[1])))
+    sql = f"SELECT {', '.join(STOCK_MOVEMENT_COLUMNS)} FROM stock_movements"
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += " ORDER BY created_at DESC, id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return [dict(zip(STOCK_MOVEMENT_COLUMNS, row)) for row in _get_conn().execute(sql, params)]
+
+
+def get_stock_movement_choices() -> dict:
+    """Motivos y usuarios distintos del libro de stock (para los filtros)."""
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, nombre, apellido, cedula, telefono FROM clients WHERE id = ?", (client_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    return {
+        'reason': [r[0] for r in conn.execute("SELECT DISTINCT reason FROM stock_movements WHERE reason <> '' ORDER BY 1")],
+        'user': [r[0] for r in conn.execute("SELECT DISTINCT user FROM stock_movements WHERE user <> '' ORDER BY 1")],
+    }
+
+
+def import_stock_history_json(path) -> int:
+    """Importa el stock_history.json heredado (lista de registros). Devuelve cuántos se importaron.
+
+    Se omiten los que ya están (misma fecha/hora, código y motivo), así que puede repetirse.
+    Los archivos por día de stock_history/ no se importan: solo copiaban las entradas de este.
+    """
+    path = str(path)
+    if not os.path.isfile(path):
+        return 0
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if not isinstance(records, list):
+        return 0
+    count = 0
+    with transaction() as conn:
+        for r in records:
+            if not isinstance(r, dict):
+                continue
+            ts = str(r.get('timestamp') or r.get('fecha_hora') or r.get('timestamp_iso') or '')
+            codigo = str(r.get('codigo') or '')
+            motivo = str(r.get('motivo') or '')
+            if conn.execute(
+                "SELECT 1 FROM stock_movements WHERE created_at = ? AND codigo = ? AND reason = ?", (ts, codigo, motivo)
+            ).fetchone():
+                continue
+            before = r.get('cantidad_anterior', r.get('cant_ant'))
+            after = r.get('cantidad_nueva')
+            delta = r.get('added') if r.get('added') is not None else r.get('delta')
+            # los registros viejos no guardaban el id: se busca por código
+            row = conn.execute("SELECT id FROM products WHERE code = ? LIMIT 1", (codigo,)).fetchone() if codigo else None
+            log_stock_movement(row[0] if row else None, None if delta is None else _as_float(delta), motivo,
+                               r.get('usuario') or '', codigo, r.get('producto') or '', before, after,
+                               created_at=ts)
+            count += 1
+    return count
+
+
+# Cola de impresión
+# status: 'pendiente' -> 'imprimiendo' -> 'impreso' | 'error' (agotó los reintentos)
+PRINT_JOB_COLUMNS = ('id', 'created_at', 'updated_at', 'printer', 'invoice_numero', 'status', 'attempts',
+                     'next_attempt_at', 'last_error')
+
+
+def _print_job(row, with_payload=False) -> dict:
+    job = dict(zip(PRINT_JOB_COLUMNS, row))
+    if with_payload:
+        job['payload'] = bytes(row[len(PRINT_JOB_COLUMNS)])
+    return job
+
+
+def enqueue_print_job(payload: bytes, printer: str = '', invoice_numero: str = '', receipt_sha: str = '') -> int:
+    """Agrega un trabajo pendiente a la cola de impresión y devuelve su id.
+
+    Con `receipt_sha` (los bytes están en la tabla receipts) el payload se vacía al quedar
+    impreso, para no guardar el ticket dos veces.
+    """
+    import time
+    now = time.time()
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO print_jobs (created_at, updated_at, printer, invoice_numero, payload, status, "
+            "next_attempt_at, receipt_sha) VALUES (?, ?, ?, ?, ?, 'pendiente', ?, ?)",
+            (now, now, str(printer or ''), str(invoice_numero or ''), sqlite3.Binary(bytes(payload)), now,
+             str(receipt_sha or '')),
+        )
+    return cur.lastrowid
+
+
+def claim_print_job(now: float):
+    """Toma el trabajo pendiente más antiguo ya vencido y lo marca 'imprimiendo' (dict con payload) o None."""
+    with transaction(immediate=True) as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(PRINT_JOB_COLUMNS)}, payload FROM print_jobs "
+            "WHERE status = 'pendiente' AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT 1",
+            (float(now),),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE print_jobs SET status = 'imprimiendo', updated_at = ? WHERE id = ?", (float(now), row[0]))
+    job = _print_job(row, with_payload=True)
+    job['status'] = 'imprimiendo'
+    return job
+
+
+def next_print_job_due():
+    """Momento (epoch) del próximo reintento pendiente, o None si la cola está vacía."""
+    row = _get_conn().execute("SELECT MIN(next_attempt_at) FROM print_jobs WHERE status = 'pendiente'").fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+def update_print_job(job_id: int, status: str, attempts: int = None, next_attempt_at: float = None,
+                     last_error: str = None) -> bool:
+    import time
+    fields = ['status = ?', 'updated_at = ?']
+    params = [str(status), time.time()]
+    for column, value in (('attempts', attempts), ('next_attempt_at', next_attempt_at), ('last_error', last_error)):
+        if value is not None:
+            fields.append(f'{column} = ?')
+            params.append(value)
+    if status == 'impreso':
+        fields.append("payload = CASE WHEN receipt_sha <> '' THEN X'' ELSE payload END")
+    params.append(int(job_id))
+    with transaction() as conn:
+        cur = conn.execute(f"UPDATE print_jobs SET {', '.join(fields)} WHERE id = ?", params)
+    return cur.rowcount > 0
+
+
+def get_print_job(job_id: int, with_payload: bool = False):
+    cols = ', '.join(PRINT_JOB_COLUMNS) + (', payload' if with_payload else '')
+    row = _get_conn().execute(f"SELECT {cols} FROM print_jobs WHERE id = ?", (int(job_id),)).fetchone()
+    return _print_job(row, with_payload) if row else None
+
+
+def get_print_jobs(status=None, limit: int = 100) -> list:
+    """Trabajos (sin payload) del más reciente al más antiguo; status: uno o una tupla de estados."""
+    sql = f"SELECT {', '.join(PRINT_JOB_COLUMNS)} FROM print_jobs"
+    params = []
+    if status:
+        status = (status,) if isinstance(status, str) else tuple(status)
+        sql += f" WHERE status IN ({', '.join('?' * len(status))})"
+        params.extend(status)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(int(limit))
+    return [_print_job(row) for row in _get_conn().execute(sql, params)]
+
+
+def last_print_job(invoice_numero: str):
+    """Último trabajo de la factura que aún tiene sus bytes (dict con payload), o None.
+
+    Los impresos desde la caché de tickets ya soltaron el payload (ver enqueue_print_job).
+    """
+    row = _get_conn().execute(
+        f"SELECT {', '.join(PRINT_JOB_COLUMNS)}, payload FROM print_jobs WHERE invoice_numero = ? "
+        "AND length(payload) > 0 ORDER BY id DESC LIMIT 1",
+        (str(invoice_numero),),
+    ).fetchone()
+    return _print_job(row, with_payload=True) if row else None
+
+
+def recover_print_jobs() -> int:
+    """Al arrancar: los trabajos que quedaron 'imprimiendo' (caída a mitad) vuelven a 'pendiente'."""
+    with transaction() as conn:
+        cur = conn.execute("UPDATE print_jobs SET status = 'pendiente' WHERE status = 'imprimiendo'")
+    return cur.rowcount
+
+
+def purge_print_jobs(older_than_days: float = 30) -> int:
+    """Borra los trabajos impresos con más de `older_than_days` días."""
+    import time
+    with transaction() as conn:
+        cur = conn.execute("DELETE FROM print_jobs WHERE status = 'impreso' AND updated_at < ?",
+                           (time.time() - float(older_than_days) * 86400,))
+    return cur.rowcount
+
+
+# --- tickets impresos (utils/receipt_cache.py) ---
+
+def store_receipt(sha: str, data: bytes, size: int, printer: str = '') -> bool:
+    """Guarda un ticket comprimido bajo su sha; si ya estaba solo lo marca como usado. True si es nuevo.
+
+    El total de receipts_total se actualiza en la misma transacción.
+    """
+    import time
+    now = time.time()
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO receipts (sha, data, size, stored_size, printer, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(sha) DO NOTHING",
+            (str(sha), sqlite3.Binary(bytes(data)), int(size), len(data), str(printer or ''), now, now),
+        )
+        if cur.rowcount == 0:
+            conn.execute("UPDATE receipts SET last_used_at = ?, printer = ? WHERE sha = ?",
+                         (now, str(printer or ''), str(sha)))
+            return False
+        conn.execute("UPDATE receipts_total SET stored_size = stored_size + ? WHERE id = 1", (len(data),))
+    return True
+
+
+def load_receipt(sha: str):
+    """(datos comprimidos, impresora) del ticket, marcándolo como usado; None si no está (o se desalojó)."""
+    import time
+    if not sha:
+        return None
+    with transaction() as conn:
+        row = conn.execute("SELECT data, printer FROM receipts WHERE sha = ?", (str(sha),)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE receipts SET last_used_at = ? WHERE sha = ?", (time.time(), str(sha)))
+    return bytes(row[0]), row[1]
+
+
+def receipts_stored_size() -> int:
+    """Bytes (comprimidos) que ocupan los tickets guardados (receipts_total, sin recorrer la tabla)."""
+    row = _get_conn().execute("SELECT stored_size FROM receipts_total WHERE id = 1").fetchone()
+    return int(row[0]) if row else 0
+
+
+def evict_receipts(max_bytes: int) -> int:
+    """Desaloja los tickets usados hace más tiempo hasta que el total quede en `max_bytes` o menos."""
+    with transaction() as conn:
+        cur = conn.execute(
+            """
+            DELETE FROM receipts WHERE sha IN (
+                SELECT sha FROM (
+                    SELECT sha, SUM(stored_size) OVER (ORDER BY last_used_at DESC, sha) AS running
+                    FROM receipts
+                ) WHERE running > ?
+            )
+            """,
+            (int(max_bytes),),
+        )
+        conn.execute("UPDATE receipts_total SET stored_size = (SELECT COALESCE(SUM(stored_size), 0) FROM receipts) "
+                     "WHERE id = 1")
+    return cur.rowcount
+
+
+def get_invoice_receipt_sha(numero: str) -> str:
+    """sha del ticket impreso de la última factura con ese número ('' si no tiene)."""
+    row = _get_conn().execute(
+        "SELECT receipt_sha FROM invoices WHERE numero = ? ORDER BY id DESC LIMIT 1", (str(numero),)
+    ).fetchone()
+    return (row[0] or '') if row else ''
+
+
+def set_invoice_receipt_sha(numero: str, sha: str) -> bool:
+    """Asocia el ticket `sha` a la última factura con ese número."""
+    with transaction() as conn:
+        cur = conn.execute(
+            "UPDATE invoices SET receipt_sha = ? WHERE id = (SELECT MAX(id) FROM invoices WHERE numero = ?)",
+            (str(sha or ''), str(numero)),
+        )
+    return cur.rowcount > 0
+
+
+# --- números de factura (utils/invoice_id.py) ---
+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def next_invoice_number(day: str) -> int:
+    """Toma el siguiente número del día `day` ('YYYYMMDD') y lo devuelve.
+
+    Un solo UPSERT ... RETURNING: el bloqueo de escritura de SQLite lo hace atómico entre
+    ventanas y procesos. Llamarla dentro de la transacción que guarda la factura, así el
+    número y la factura se confirman (o se revierten) juntos, con un solo COMMIT.
+    """
+    with transaction(immediate=True) as conn:
+        sql = ("INSERT INTO invoice_sequence (day, last) VALUES (?, 1) "
+               "ON CONFLICT(day) DO UPDATE SET last = last + 1")
+        if _HAS_RETURNING:
+            return int(conn.execute(sql + " RETURNING last", (str(day),)).fetchone()[0])
+        # SQLite < 3.35 (sin RETURNING): la misma transacción ya tiene el bloqueo de escritura
+        conn.execute(sql, (str(day),))
+        return int(conn.execute("SELECT last FROM invoice_sequence WHERE day = ?", (str(day),)).fetchone()[0])
+
+
+def peek_invoice_number(day: str) -> int:
+    """Número que tomaría la próxima factura del día, sin reservarlo (para mostrarlo)."""
+    row = _get_conn().execute("SELECT last FROM invoice_sequence WHERE day = ?", (str(day),)).fetchone()
+    return (int(row[0]) if row else 0) + 1
+
+
+# --- facturas en pausa ---
+# El stock de una factura en pausa queda reservado (descontado en products): retomarla pasa
+# la reserva al carrito; reiniciarla o eliminarla la devuelve con release_items().
+
+# claves del dict con columna propia (en paused_invoices o paused_items); el resto va a extra
+_PAUSED_KEYS = {
+    'paused_id', 'id', 'numero_factura', 'productos', 'productos_display', 'timestamp', 'datetime', 'state',
+    'client', 'user', 'subtotal_bs', 'iva_amount_bs', 'total_bs', 'total_usd', 'payments', 'file',
+}
+
+
+def _paused_lines(conn, items) -> list:
+    """Líneas (line_no, product_id, name, qty, price, subtotal, vat) de los productos de una factura."""
+    lines = []
+    for n, p in enumerate(items or [], 1):
+        if not isinstance(p, dict):
+            continue
+        pid = p.get('id') if p.get('id') is not None else p.get('product_id')
+        try:
+            pid = int(pid) if pid is not None else None
+        except (TypeError, ValueError):
+            pid = None
+        name = str(p.get('name') or p.get('nombre') or '')
+        if pid is None and name:
+            # registros viejos de paused.json sin id: se busca una vez por nombre o código
+            row = conn.execute("SELECT id FROM products WHERE name = ? OR code = ? ORDER BY id LIMIT 1",
+                               (name, name)).fetchone()
+            pid = row[0] if row else None
+        qty = int(_as_float(p.get('quantity') if p.get('quantity') is not None else (p.get('qty') or p.get('cantidad'))))
+        price = _as_float(p.get('price') if p.get('price') is not None else p.get('precio'))
+        subtotal = _as_float(p.get('subtotal')) if p.get('subtotal') is not None else price * qty
+        lines.append((n, pid, name, qty, price, subtotal, _as_float(p.get('vat'))))
+    return lines
+
+
+def pause_invoice(inv: dict) -> int:
+    """Guarda una factura en pausa con sus líneas (una transacción). Devuelve su id (paused_id).
+
+    No toca el stock: las líneas del carrito ya están reservadas y siguen así.
+    """
+    _fecha, created_at = _invoice_datetime(inv)
+    client = inv.get('client')
+    extra = {k: v for k, v in inv.items() if k not in _PAUSED_KEYS}
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO paused_invoices (numero, created_at, user, client, subtotal_bs, iva_bs, total_bs, total_usd, "
+            "extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (str(inv.get('numero_factura') or inv.get('id') or ''), created_at, str(inv.get('user') or ''),
+             json.dumps(client, ensure_ascii=False) if client else None,
+             _as_float(inv.get('subtotal_bs')), _as_float(inv.get('iva_amount_bs')), _as_float(inv.get('total_bs')),
+             _as_float(inv.get('total_usd')), json.dumps(extra, ensure_ascii=False) if extra else None),
+        )
+        paused_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO paused_items (paused_id, line_no, product_id, name, qty, price, subtotal, vat) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(paused_id, *line) for line in _paused_lines(conn, inv.get('productos'))],
+        )
+    return paused_id
+
+
+def _paused_from_row(row) -> dict:
+    paused_id, numero, created_at, user, client, subtotal_bs, iva_bs, total_bs, total_usd, extra = row
+    inv = {}
+    if extra:
+        try:
+            inv.update(json.loads(extra))
+        except ValueError:
+            pass
+    inv.update({
+        'paused_id': paused_id,
+        'id': numero,
+        'numero_factura': numero,
+        'productos': [],
+        'subtotal_bs': subtotal_bs,
+        'iva_amount_bs': iva_bs,
+        'total_bs': total_bs,
+        'total_usd': total_usd,
+        'timestamp': created_at.replace('-', '').replace(':', '').replace(' ', '_'),
+        'datetime': created_at,
+        'state': 'PAUSADA',
+        'user': user or '',
+        'payments': {},
+    })
+    if client:
+        try:
+            inv['client'] = json.loads(client)
+        except ValueError:
+            pass
+    return inv
+
+
+def _get_paused(conn, paused_id=None) -> list:
+    where, params = (" WHERE id = ?", (int(paused_id),)) if paused_id is not None else ('', ())
+    invoices = [_paused_from_row(r) for r in conn.execute(
+        "SELECT id, numero, created_at, user, client, subtotal_bs, iva_bs, total_bs, total_usd, extra "
+        f"FROM paused_invoices{where} ORDER BY created_at, id", params)]
+    by_id = {inv['paused_id']: inv for inv in invoices}
+    if by_id:
+        item_where = " WHERE paused_id = ?" if paused_id is not None else ''
+        for pid_, product_id, name, qty, price, subtotal, vat in conn.execute(
+            f"SELECT paused_id, product_id, name, qty, price, subtotal, vat FROM paused_items{item_where} "
+            "ORDER BY paused_id, line_no", params
+        ):
+            inv = by_id.get(pid_)
+            if inv is not None:
+                inv['productos'].append({'id': product_id, 'name': name, 'quantity': qty, 'qty': qty, 'price': price,
+                                         'subtotal': subtotal, 'vat': vat})
+    return invoices
+
+
+def get_paused_invoices() -> list:
+    """Facturas en pausa, de la más antigua a la más reciente, con sus líneas (dos consultas)."""
+    return _get_paused(_get_conn())
+
+
+def get_paused_invoice(paused_id: int):
+    found = _get_paused(_get_conn(), paused_id)
+    return found[0] if found else None
+
+
+def _delete_paused(conn, paused_id: int) -> None:
+    conn.execute("DELETE FROM paused_items WHERE paused_id = ?", (int(paused_id),))
+    conn.execute("DELETE FROM paused_invoices WHERE id = ?", (int(paused_id),))
+
+
+def resume_paused_invoice(paused_id: int):
+    """Quita la factura de la pausa y la devuelve (dict) para cargarla en el carrito; None si no existe.
+
+    El stock sigue reservado: pasa al carrito.
+    """
+    with transaction(immediate=True) as conn:
+        found = _get_paused(conn, paused_id)
+        if not found:
+            return None
+        _delete_paused(conn, paused_id)
+    return found[0]
+
+
+def discard_paused_invoice(paused_id: int, user: str = ''):
+    """Elimina la factura en pausa y devuelve su stock reservado, todo en una transacción.
+
+    Registra un movimiento 'devolucion_venta' por producto. Devuelve la factura (dict) o None.
+    """
+    with transaction(immediate=True) as conn:
+        found = _get_paused(conn, paused_id)
+        if not found:
+            return None
+        inv = found[0]
+        lines = [(p['id'], p['quantity']) for p in inv['productos'] if p.get('id') is not None]
+        returned = _merge_items(lines)
+        before = get_products_by_ids(returned.keys())
+        release_items(lines)
+        for pid, row in before.items():
+            old_q = int(row[5])
+            log_stock_movement(pid, returned[pid], 'devolucion_venta', user, row[1], row[2], old_q,
+                               old_q + returned[pid])
+        _delete_paused(conn, paused_id)
+    return inv
+
+
+def _reserve_paused_lines(conn, paused_id: int) -> None:
+    """Reserva el stock de las líneas de una factura en pausa (las importadas de paused.json).
+
+    Registra un movimiento 'pausa_importada' por línea. Una línea sin stock suficiente queda
+    sin id de producto, como las que no se asociaron: eliminar la pausa no devuelve nada por ella.
+    """
+    lines = conn.execute(
+        "SELECT line_no, product_id, qty FROM paused_items WHERE paused_id = ? AND product_id IS NOT NULL "
+        "ORDER BY line_no", (int(paused_id),)
+    ).fetchall()
+    for line_no, pid, qty in lines:
+        if qty <= 0:
+            continue
+        if reserve_items([(pid, qty)]):
+            conn.execute("UPDATE paused_items SET product_id = NULL WHERE paused_id = ? AND line_no = ?",
+                         (int(paused_id), line_no))
+            continue
+        row = get_products_by_ids([pid]).get(pid)
+        if row is not None:
+            new_q = int(row[5])
+            log_stock_movement(pid, -qty, 'pausa_importada', '', row[1], row[2], new_q + qty, new_q)
+
+
+def import_paused_json(path) -> int:
+    """Importa el paused.json heredado (lista de facturas en pausa). Devuelve cuántas se importaron.
+
+    Las líneas sin id de producto se asocian por nombre o código. Antes, pausar devolvía el
+    stock del carrito; ahora la pausa lo conserva reservado, así que aquí se vuelve a reservar
+    (ver _reserve_paused_lines), todo en la misma transacción.
+    """
+    path = str(path)
+    if not os.path.isfile(path):
+        return 0
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if not isinstance(records, list):
+        return 0
+    count = 0
+    with transaction(immediate=True) as conn:
+        for inv in records:
+            if isinstance(inv, dict):
+                _reserve_paused_lines(conn, pause_invoice(inv))
+                count += 1
+    return count
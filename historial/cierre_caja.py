@@ -7,30 +7,41 @@ from tkinter import ttk, messagebox
 from typing import Any
 
 from . import dialogs
+from utils.cierre_analytics import compute_cierre_analytics
+from utils.task_runner import TaskRunner
 
 # Nombres de mes en español para carpetas
 _MESES = ('Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
           'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre')
 
-# Métodos considerados "Divisa" para el módulo exclusivo
-_METODOS_DIVISA = ('dólar', 'dólares', 'divisa', 'usd', 'dolar', 'dolares')
 
+def load_facturas_dia(facturas_dir: str, date_str: str) -> list:
+    """Facturas no anuladas del día (YYYY-MM-DD): una consulta a la tabla invoices.
 
-def _is_divisa_primary(inv: dict) -> bool:
-    """True si el método de pago principal de la factura es Dólar/Divisa."""
-    pm = inv.get('payment_methods')
-    if isinstance(pm, (list, tuple)) and pm:
-        first = str(pm[0]).strip().lower()
-        return any(m in first for m in _METODOS_DIVISA)
-    pays = inv.get('payments') or {}
-    usd = float(pays.get('usd') or 0)
-    if usd > 0:
-        efectivo = float(pays.get('efectivo_bs') or 0)
-        pv = float(pays.get('punto_bs') or 0)
-        pm_bs = float(pays.get('pago_movil_bs') or 0)
-        if usd >= efectivo and usd >= pv and usd >= pm_bs:
-            return True
-    return False
+    Si la BD no está disponible se leen los JSON de facturas_dir/YYYY-MM-DD como antes.
+    """
+    ds = (date_str or '')[:10]
+    try:
+        import database
+        return database.get_invoices(date_from=ds, date_to=ds, exclude_state='ANULADA', include_items=False)
+    except Exception:
+        pass
+    facturas_dia = []
+    day_dir = os.path.join(facturas_dir, ds)
+    if os.path.isdir(day_dir):
+        for fname in os.listdir(day_dir):
+            if not (fname.lower().endswith('.json') or 'invoice' in fname.lower()):
+                continue
+            fpath = os.path.join(day_dir, fname)
+            try:
+                with open(fpath, 'r', encoding='utf-8') as fp:
+                    inv = json.load(fp)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if (inv.get('state') or '').upper() == 'ANULADA':
+                continue
+            facturas_dia.append(inv)
+    return facturas_dia
 
 
 def compute_cierre_totals(facturas_dia: list, exchange_rate: float = 1.0) -> dict:
@@ -46,67 +57,121 @@ def compute_cierre_totals(facturas_dia: list, exchange_rate: float = 1.0) -> dic
     }
 
 
-def compute_cierre_analytics(facturas_dia: list, exchange_rate: float = 1.0) -> dict:
+def cierre_analytics_dia(app: Any, facturas_dir: str, date_str: str, exchange_rate: float = 1.0) -> dict:
+    """Analítica de cierre del día.
+
+    Sin servidor es una lectura de la tabla daily_sales (se mantiene al guardar y anular
+    facturas). Con servidor se recorren las facturas del día para sumar las del servidor
+    que no estén en la BD local. Si la BD no responde se calcula desde los JSON.
     """
-    Reporte analítico de cierre:
-    - Conteo de transacciones por método (cuántas facturas usaron cada método).
-    - Totales segregados por método (BS).
-    - Módulo Divisas: solo facturas con método Dólar/Divisa → total $ y equiv. BS.
-    - Gran total BS y USD.
+    ds = (date_str or '')[:10]
+    if not (getattr(app, 'server_url', None) and getattr(app, 'auth_token', None)):
+        try:
+            import database
+            return database.get_daily_sales(ds, exchange_rate)
+        except Exception:
+            pass
+    facturas_dia = load_facturas_dia(facturas_dir, ds)
+    if getattr(app, 'server_url', None) and getattr(app, 'auth_token', None):
+        try:
+            r = app.request_get(f"{app.server_url}/invoices?from_date={ds}&to_date={ds}", timeout=5)
+            if r and r.status_code == 200:
+                ids = {f.get('id') for f in facturas_dia}
+                for inv in (r.json() or []):
+                    if (inv.get('state') or '').upper() == 'ANULADA':
+                        continue
+                    if inv.get('id') not in ids:
+                        facturas_dia.append(inv)
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return compute_cierre_analytics(facturas_dia, exchange_rate)
+
+
+# Campos que se suman al combinar varios días
+_RANGE_SUM_FIELDS = (
+    'num_facturas', 'count_efectivo', 'count_pv', 'count_pm', 'count_dolar',
+    'total_efectivo', 'total_pv', 'total_pm', 'total_usd_bs', 'total_gral_bs', 'total_gral_usd',
+    'divisa_count', 'divisa_total_usd', 'divisa_total_bs_equiv',
+)
+
+
+def range_bounds(kind: str, ref_date: str = None) -> tuple:
+    """(desde, hasta) 'YYYY-MM-DD' para 'semana' (lunes a hoy), 'mes' (día 1 a hoy) o 'mes_anterior'."""
+    try:
+        ref = datetime.datetime.strptime((ref_date or '')[:10], '%Y-%m-%d').date()
+    except ValueError:
+        ref = datetime.date.today()
+    if kind == 'semana':
+        start = ref - datetime.timedelta(days=ref.weekday())
+        return start.isoformat(), ref.isoformat()
+    if kind == 'mes_anterior':
+        end = ref.replace(day=1) - datetime.timedelta(days=1)
+        return end.replace(day=1).isoformat(), end.isoformat()
+    return ref.replace(day=1).isoformat(), ref.isoformat()
+
+
+def previous_month_span(date_from: str, date_to: str) -> tuple:
+    """El mismo tramo del mes anterior (p. ej. 01..18 de marzo -> 01..18 de febrero)."""
+    d_from = datetime.datetime.strptime(date_from[:10], '%Y-%m-%d').date()
+    d_to = datetime.datetime.strptime(date_to[:10], '%Y-%m-%d').date()
+    prev_end_of_month = d_from.replace(day=1) - datetime.timedelta(days=1)
+
+    def _shift(d):
+        return prev_end_of_month.replace(day=min(d.day, prev_end_of_month.day))
+    return _shift(d_from).isoformat(), _shift(d_to).isoformat()
+
+
+def compute_range_report(days: list, date_from: str, date_to: str, exchange_rate: float = 1.0) -> dict:
+    """Combina la analítica diaria (database.get_daily_sales_range) de un rango.
+
+    Suma los campos de cierre y agrega: días con ventas, ticket promedio (BS y $),
+    promedio diario y mejor/peor día por total en BS.
     """
-    count_efectivo = count_pv = count_pm = count_dolar = 0
-    total_efectivo = total_pv = total_pm = total_usd_bs = 0.0
-    total_gral_usd = 0.0
-    divisa_total_usd = divisa_total_bs_equiv = 0.0
-    divisa_count = 0
-
-    for inv in facturas_dia:
-        pays = inv.get('payments') or {}
-        ef = float(pays.get('efectivo_bs') or 0)
-        pv = float(pays.get('punto_bs') or 0)
-        pm = float(pays.get('pago_movil_bs') or 0)
-        usd = float(pays.get('usd') or 0)
-        usd_bs = usd * exchange_rate
-
-        if ef > 0:
-            count_efectivo += 1
-        if pv > 0:
-            count_pv += 1
-        if pm > 0:
-            count_pm += 1
-        if usd > 0:
-            count_dolar += 1
-
-        total_efectivo += ef
-        total_pv += pv
-        total_pm += pm
-        total_usd_bs += usd_bs
-        total_gral_usd += float(inv.get('total_usd') or 0)
-
-        if _is_divisa_primary(inv):
-            divisa_count += 1
-            divisa_total_usd += float(inv.get('total_usd') or 0)
-            divisa_total_bs_equiv += float(inv.get('total_bs') or 0)  # o (total_usd * exchange_rate)
-
-    total_gral_bs = total_efectivo + total_pv + total_pm + total_usd_bs
-
-    return {
-        'num_facturas': len(facturas_dia),
-        'count_efectivo': count_efectivo,
-        'count_pv': count_pv,
-        'count_pm': count_pm,
-        'count_dolar': count_dolar,
-        'total_efectivo': total_efectivo,
-        'total_pv': total_pv,
-        'total_pm': total_pm,
-        'total_usd_bs': total_usd_bs,
-        'total_gral_bs': total_gral_bs,
-        'total_gral_usd': total_gral_usd,
-        'divisa_count': divisa_count,
-        'divisa_total_usd': divisa_total_usd,
-        'divisa_total_bs_equiv': divisa_total_bs_equiv,
+    r = {k: 0 for k in _RANGE_SUM_FIELDS}
+    for a in days:
+        for k in _RANGE_SUM_FIELDS:
+            r[k] += a.get(k) or 0
+    n = r['num_facturas']
+    r.update({
+        'desde': date_from,
+        'hasta': date_to,
         'exchange_rate': exchange_rate,
-    }
+        'dias': days,
+        'dias_con_ventas': len(days),
+        'ticket_promedio_bs': r['total_gral_bs'] / n if n else 0.0,
+        'ticket_promedio_usd': r['total_gral_usd'] / n if n else 0.0,
+        'promedio_diario_bs': r['total_gral_bs'] / len(days) if days else 0.0,
+        'mejor_dia': None,
+        'peor_dia': None,
+    })
+    if days:
+        best = max(days, key=lambda a: a.get('total_gral_bs') or 0)
+        worst = min(days, key=lambda a: a.get('total_gral_bs') or 0)
+        r['mejor_dia'] = (best['fecha'], best.get('total_gral_bs') or 0, best.get('num_facturas') or 0)
+        r['peor_dia'] = (worst['fecha'], worst.get('total_gral_bs') or 0, worst.get('num_facturas') or 0)
+    return r
+
+
+def load_range_report(date_from: str, date_to: str, exchange_rate: float = 1.0, compare: bool = False) -> dict:
+    """Reporte del rango desde daily_sales; con compare=True agrega 'comparacion' con el mes anterior."""
+    import database
+    report = compute_range_report(database.get_daily_sales_range(date_from, date_to, exchange_rate),
+                                  date_from, date_to, exchange_rate)
+    if compare:
+        p_from, p_to = previous_month_span(date_from, date_to)
+        prev = compute_range_report(database.get_daily_sales_range(p_from, p_to, exchange_rate),
+                                    p_from, p_to, exchange_rate)
+        report['comparacion'] = compare_reports(report, prev)
+    return report
+
+
+def compare_reports(current: dict, previous: dict) -> dict:
+    """{campo: (actual, anterior, variación % o None)} para los totales principales."""
+    out = {'desde': previous.get('desde'), 'hasta': previous.get('hasta')}
+    for k in ('num_facturas', 'total_gral_bs', 'total_gral_usd', 'ticket_promedio_bs', 'divisa_total_usd'):
+        cur, prev = current.get(k) or 0, previous.get(k) or 0
+        out[k] = (cur, prev, ((cur - prev) / prev * 100.0) if prev else None)
+    return out
 
 
 def get_cierre_base_path(app: Any) -> str:
@@ -246,6 +311,119 @@ def save_cierre_pdf(app: Any, analytics: dict, date_str: str, user: str = '') ->
         return ''
 
 
+def get_range_pdf_filename(date_from: str, date_to: str) -> str:
+    """Cierre_Mensual_MM-YYYY.pdf si el rango empieza el día 1 de un mes y no sale de él;
+    si no, Cierre_DD-MM-YYYY_al_DD-MM-YYYY.pdf."""
+    f, t = date_from[:10].split('-'), date_to[:10].split('-')
+    if f[2] == '01' and f[:2] == t[:2]:
+        return f"Cierre_Mensual_{f[1]}-{f[0]}.pdf"
+    return f"Cierre_{f[2]}-{f[1]}-{f[0]}_al_{t[2]}-{t[1]}-{t[0]}.pdf"
+
+
+def save_cierre_range_pdf(app: Any, report: dict, user: str = '') -> str:
+    """
+    Guarda el reporte de un rango (compute_range_report) en PDF, en la carpeta
+    Cierres_Caja/YYYY/MM_Mes/ del primer día. Retorna la ruta o '' si falla.
+    """
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import mm
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+        from reportlab.lib import colors
+    except ImportError:
+        return ''
+
+    date_from, date_to = report.get('desde', ''), report.get('hasta', '')
+    try:
+        folder = get_cierre_folder_for_date(app, date_from)
+        os.makedirs(folder, exist_ok=True)
+        filename = get_range_pdf_filename(date_from, date_to)
+    except (OSError, IndexError):
+        return ''
+    now = datetime.datetime.now()
+    path = os.path.join(folder, filename)
+    if os.path.exists(path):
+        path = os.path.join(folder, filename[:-4] + now.strftime('_%H%M%S') + '.pdf')
+
+    table_style = TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2b2b2b')),
+                              ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                              ('FONTSIZE', (0, 0), (-1, -1), 9),
+                              ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)])
+    try:
+        doc = SimpleDocTemplate(path, pagesize=A4, rightMargin=20 * mm, leftMargin=20 * mm,
+                                topMargin=15 * mm, bottomMargin=15 * mm)
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle('CierreTitle', parent=styles['Heading1'], fontSize=16)
+        r = report
+        story = [Paragraph('Cierre de Caja — Reporte por rango', title_style), Spacer(1, 6 * mm),
+                 Paragraph(f'Desde: {date_from}   Hasta: {date_to}', styles['Normal']),
+                 Paragraph(f'Generado: {now.strftime("%Y-%m-%d %H:%M")}', styles['Normal'])]
+        if user:
+            story.append(Paragraph(f'Usuario: {user}', styles['Normal']))
+        story.append(Spacer(1, 8 * mm))
+
+        story.append(Paragraph('<b>Resumen</b>', styles['Heading2']))
+        t = Table([
+            ['Concepto', 'Valor'],
+            ['Facturas', str(r.get('num_facturas', 0))],
+            ['Días con ventas', str(r.get('dias_con_ventas', 0))],
+            ['Total ventas (BS)', f"{r.get('total_gral_bs', 0):.2f}"],
+            ['Total ventas ($)', f"{r.get('total_gral_usd', 0):.2f}"],
+            ['Ticket promedio (BS / $)', f"{r.get('ticket_promedio_bs', 0):.2f} / {r.get('ticket_promedio_usd', 0):.2f}"],
+            ['Promedio diario (BS)', f"{r.get('promedio_diario_bs', 0):.2f}"],
+            ['Mejor día', f"{r['mejor_dia'][0]} ({r['mejor_dia'][1]:.2f} BS)" if r.get('mejor_dia') else '-'],
+            ['Peor día', f"{r['peor_dia'][0]} ({r['peor_dia'][1]:.2f} BS)" if r.get('peor_dia') else '-'],
+        ], colWidths=[100 * mm, 60 * mm])
+        t.setStyle(table_style)
+        story += [t, Spacer(1, 6 * mm)]
+
+        story.append(Paragraph('<b>Por método de pago</b>', styles['Heading2']))
+        t = Table([
+            ['Método', 'Transacciones', 'Total (BS)'],
+            ['Efectivo', str(r.get('count_efectivo', 0)), f"{r.get('total_efectivo', 0):.2f}"],
+            ['Punto de venta', str(r.get('count_pv', 0)), f"{r.get('total_pv', 0):.2f}"],
+            ['Pago móvil', str(r.get('count_pm', 0)), f"{r.get('total_pm', 0):.2f}"],
+            ['Dólar (equiv. BS)', str(r.get('count_dolar', 0)), f"{r.get('total_usd_bs', 0):.2f}"],
+        ], colWidths=[80 * mm, 40 * mm, 40 * mm])
+        t.setStyle(table_style)
+        story += [t, Spacer(1, 6 * mm)]
+
+        if r.get('divisa_count', 0) > 0:
+            story.append(Paragraph('<b>Módulo Divisas</b> (facturas con método Dólar/Divisa)', styles['Heading2']))
+            story.append(Paragraph(f"Cantidad de transacciones: {r.get('divisa_count', 0)}", styles['Normal']))
+            story.append(Paragraph(f"Total en USD ($): {r.get('divisa_total_usd', 0):.2f}", styles['Normal']))
+            story.append(Paragraph(f"Equivalente en BS: {r.get('divisa_total_bs_equiv', 0):.2f}", styles['Normal']))
+            story.append(Spacer(1, 6 * mm))
+
+        comp = r.get('comparacion')
+        if comp:
+            story.append(Paragraph(f"<b>Comparación con {comp.get('desde')} a {comp.get('hasta')}</b>", styles['Heading2']))
+            rows = [['Concepto', 'Actual', 'Anterior', 'Variación']]
+            for key, label in (('num_facturas', 'Facturas'), ('total_gral_bs', 'Total (BS)'),
+                               ('total_gral_usd', 'Total ($)'), ('ticket_promedio_bs', 'Ticket promedio (BS)')):
+                cur, prev, pct = comp[key]
+                rows.append([label, f'{cur:.2f}', f'{prev:.2f}', f'{pct:+.1f}%' if pct is not None else '-'])
+            t = Table(rows, colWidths=[60 * mm, 35 * mm, 35 * mm, 30 * mm])
+            t.setStyle(table_style)
+            story += [t, Spacer(1, 6 * mm)]
+
+        if r.get('dias'):
+            story.append(Paragraph('<b>Detalle por día</b>', styles['Heading2']))
+            rows = [['Fecha', 'Facturas', 'Total (BS)', 'Total ($)']]
+            for a in r['dias']:
+                rows.append([a['fecha'], str(a.get('num_facturas', 0)), f"{a.get('total_gral_bs', 0):.2f}",
+                             f"{a.get('total_gral_usd', 0):.2f}"])
+            t = Table(rows, colWidths=[45 * mm, 35 * mm, 40 * mm, 40 * mm], repeatRows=1)
+            t.setStyle(table_style)
+            story.append(t)
+
+        doc.build(story)
+        return path
+    except Exception:
+        return ''
+
+
 def show_cierre_caja(app, date_str: str = None, analytics: dict = None):
     """
     Ventana de Cierre de caja (analítica).
@@ -260,7 +438,7 @@ def show_cierre_caja(app, date_str: str = None, analytics: dict = None):
     win.title('Historial de Cierre de Caja')
     win.resizable(True, True)
     try:
-        win.geometry('520x580')
+        win.geometry('620x640')
     except Exception:
         pass
     content = dialogs.style_window(app, win)
@@ -274,6 +452,19 @@ def show_cierre_caja(app, date_str: str = None, analytics: dict = None):
     date_entry = ttk.Entry(f, textvariable=date_var, width=12)
     date_entry.pack(side=tk.LEFT, padx=6)
 
+    # reportes por rango (semana, mes, mes anterior o fechas libres) desde daily_sales
+    month_from, month_to = range_bounds('mes', date_var.get())
+    desde_var = tk.StringVar(value=month_from)
+    hasta_var = tk.StringVar(value=month_to)
+    rf = ttk.Frame(content)
+    rf.pack(fill=tk.X, pady=4)
+    ttk.Label(rf, text='Desde:').pack(side=tk.LEFT, padx=(0, 6))
+    ttk.Entry(rf, textvariable=desde_var, width=12).pack(side=tk.LEFT, padx=(0, 6))
+    ttk.Label(rf, text='Hasta:').pack(side=tk.LEFT, padx=(0, 6))
+    ttk.Entry(rf, textvariable=hasta_var, width=12).pack(side=tk.LEFT, padx=(0, 6))
+    rb = ttk.Frame(content)
+    rb.pack(fill=tk.X, pady=(0, 4))
+
     report_outer = tk.Frame(content, bg=border_gray, highlightbackground=border_gray, highlightcolor=border_gray, highlightthickness=1)
     report_outer.pack(fill=tk.BOTH, expand=True, padx=pad, pady=pad)
     report_inner = ttk.Frame(report_outer)
@@ -287,14 +478,18 @@ def show_cierre_caja(app, date_str: str = None, analytics: dict = None):
     vsb.pack(side=tk.RIGHT, fill=tk.Y)
     canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-    def _render_analytics(a: dict):
-        for w in scroll_frame.winfo_children():
-            w.destroy()
+    last_range = {}     # último reporte por rango mostrado (para el PDF)
+
+    def _render_analytics(a: dict, clear: bool = True, title: str = 'Facturas del día'):
+        if clear:
+            for w in scroll_frame.winfo_children():
+                w.destroy()
+            last_range.clear()
         if not a:
             ttk.Label(scroll_frame, text='Sin datos para la fecha seleccionada.').pack(anchor=tk.W)
             return
         num = a.get('num_facturas', 0)
-        ttk.Label(scroll_frame, text=f'Facturas del día: {num}', font=('Helvetica', 10, 'bold')).pack(anchor=tk.W)
+        ttk.Label(scroll_frame, text=f'{title}: {num}', font=('Helvetica', 10, 'bold')).pack(anchor=tk.W)
         ttk.Separator(scroll_frame, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=6)
         ttk.Label(scroll_frame, text='Conteo de transacciones por método', font=('Helvetica', 10, 'bold')).pack(anchor=tk.W)
         ttk.Label(scroll_frame, text=f'  Efectivo: {a.get("count_efectivo", 0)}').pack(anchor=tk.W)
@@ -318,42 +513,112 @@ def show_cierre_caja(app, date_str: str = None, analytics: dict = None):
         ttk.Label(scroll_frame, text=f'  Total ventas (BS): {a.get("total_gral_bs", 0):.2f}', font=('Helvetica', 10, 'bold')).pack(anchor=tk.W)
         ttk.Label(scroll_frame, text=f'  Total ventas ($): {a.get("total_gral_usd", 0):.2f}', font=('Helvetica', 10, 'bold')).pack(anchor=tk.W)
 
+    runner = TaskRunner(win)
+    status_var = tk.StringVar(value='')
+
+    def _fetch(task, ds, tc):
+        # hilo de trabajo: resumen del día (o facturas + servidor); sin tocar widgets
+        return cierre_analytics_dia(app, facturas_dir, ds, tc)
+
+    def _on_loaded(a):
+        status_var.set('')
+        cargar_btn.configure(state='normal')
+        _render_analytics(a)
+
+    def _on_error(e):
+        status_var.set('')
+        cargar_btn.configure(state='normal')
+        messagebox.showerror('Cierre de caja', f'No se pudieron cargar las facturas: {e}', parent=win)
+
     def _cargar():
         ds = date_var.get().strip()
         if not ds or len(ds) < 10:
             messagebox.showwarning('Fecha', 'Indique una fecha (YYYY-MM-DD)')
             return
-        facturas_dia = []
-        day_dir = os.path.join(facturas_dir, ds[:10])
-        if os.path.isdir(day_dir):
-            for fname in os.listdir(day_dir):
-                if not (fname.lower().endswith('.json') or 'invoice' in fname.lower()):
-                    continue
-                fpath = os.path.join(day_dir, fname)
-                try:
-                    with open(fpath, 'r', encoding='utf-8') as fp:
-                        inv = json.load(fp)
-                except (OSError, json.JSONDecodeError):
-                    continue
-                if (inv.get('state') or '').upper() == 'ANULADA':
-                    continue
-                facturas_dia.append(inv)
-        if getattr(app, 'server_url', None) and getattr(app, 'auth_token', None):
-            try:
-                r = app.request_get(f"{app.server_url}/invoices?from_date={ds[:10]}&to_date={ds[:10]}", timeout=5)
-                if r and r.status_code == 200:
-                    for inv in (r.json() or []):
-                        if (inv.get('state') or '').upper() == 'ANULADA':
-                            continue
-                        if not any(f.get('id') == inv.get('id') for f in facturas_dia):
-                            facturas_dia.append(inv)
-            except (AttributeError, TypeError, ValueError):
-                pass
-        tc = float(getattr(app, 'exchange_rate', 1.0))
-        a = compute_cierre_analytics(facturas_dia, tc)
-        _render_analytics(a)
+        runner.cancel_all()
+        try:
+            tc = float(getattr(app, 'exchange_rate', 1.0))
+        except (TypeError, ValueError):
+            tc = 1.0
+        cargar_btn.configure(state='disabled')
+        status_var.set('Cargando facturas…')
+        runner.run(_fetch, ds, tc, on_done=_on_loaded, on_error=_on_error)
+
+    def _render_range(r: dict):
+        for w in scroll_frame.winfo_children():
+            w.destroy()
+        last_range.clear()
+        last_range.update(r)
+        ttk.Label(scroll_frame, text=f"Del {r['desde']} al {r['hasta']}", font=('Helvetica', 11, 'bold')).pack(anchor=tk.W)
+        if not r.get('num_facturas'):
+            ttk.Label(scroll_frame, text='Sin ventas en el rango.').pack(anchor=tk.W)
+            return
+        ttk.Label(scroll_frame, text=f"  Facturas: {r['num_facturas']} en {r['dias_con_ventas']} día(s) con ventas").pack(anchor=tk.W)
+        ttk.Label(scroll_frame, text=f"  Ticket promedio: {r['ticket_promedio_bs']:.2f} BS / {r['ticket_promedio_usd']:.2f} $").pack(anchor=tk.W)
+        ttk.Label(scroll_frame, text=f"  Promedio diario: {r['promedio_diario_bs']:.2f} BS").pack(anchor=tk.W)
+        if r.get('mejor_dia'):
+            ttk.Label(scroll_frame, text=f"  Mejor día: {r['mejor_dia'][0]} — {r['mejor_dia'][1]:.2f} BS ({r['mejor_dia'][2]} facturas)").pack(anchor=tk.W)
+            ttk.Label(scroll_frame, text=f"  Peor día: {r['peor_dia'][0]} — {r['peor_dia'][1]:.2f} BS ({r['peor_dia'][2]} facturas)").pack(anchor=tk.W)
+        comp = r.get('comparacion')
+        if comp:
+            ttk.Separator(scroll_frame, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=6)
+            ttk.Label(scroll_frame, text=f"Comparación con {comp['desde']} al {comp['hasta']}", font=('Helvetica', 10, 'bold')).pack(anchor=tk.W)
+            for key, label in (('num_facturas', 'Facturas'), ('total_gral_bs', 'Total (BS)'),
+                               ('total_gral_usd', 'Total ($)'), ('ticket_promedio_bs', 'Ticket promedio (BS)')):
+                cur, prev, pct = comp[key]
+                var_txt = f'{pct:+.1f}%' if pct is not None else '-'
+                ttk.Label(scroll_frame, text=f'  {label}: {cur:.2f} vs {prev:.2f} ({var_txt})').pack(anchor=tk.W)
+        ttk.Separator(scroll_frame, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=6)
+        # mismas secciones que el cierre de un día (conteos, totales por método, divisas, gran total)
+        _render_analytics(r, clear=False, title='Facturas del rango')
+
+    def _cargar_rango(kind: str = None):
+        if kind:
+            d_from, d_to = range_bounds(kind, date_var.get())
+            desde_var.set(d_from)
+            hasta_var.set(d_to)
+        d_from, d_to = desde_var.get().strip()[:10], hasta_var.get().strip()[:10]
+        try:
+            if datetime.datetime.strptime(d_from, '%Y-%m-%d') > datetime.datetime.strptime(d_to, '%Y-%m-%d'):
+                d_from, d_to = d_to, d_from
+        except ValueError:
+            messagebox.showwarning('Fecha', 'Indique fechas con formato YYYY-MM-DD', parent=win)
+            return
+        runner.cancel_all()
+        try:
+            tc = float(getattr(app, 'exchange_rate', 1.0))
+        except (TypeError, ValueError):
+            tc = 1.0
+        status_var.set('Cargando rango…')
+        # mes en curso: comparar con el mismo tramo del mes anterior
+        compare = kind in ('mes', 'mes_anterior') or (d_from[8:] == '01' and d_from[:7] == d_to[:7])
+        runner.run(lambda task: load_range_report(d_from, d_to, tc, compare=compare),
+                   on_done=lambda r: (status_var.set(''), _render_range(r)), on_error=_on_error)
+
+    def _pdf_rango():
+        if not last_range:
+            messagebox.showinfo('PDF', 'Cargue primero un rango.', parent=win)
+            return
+        report = dict(last_range)
+        status_var.set('Generando PDF…')
 
-    ttk.Button(f, text='Cargar', command=_cargar).pack(side=tk.LEFT, padx=6)
+        def _done(path):
+            status_var.set('')
+            if path:
+                messagebox.showinfo('PDF', f'Reporte guardado en:\n{path}', parent=win)
+            else:
+                messagebox.showerror('PDF', 'No se pudo generar el PDF (¿reportlab instalado?)', parent=win)
+        runner.run(lambda task: save_cierre_range_pdf(app, report, getattr(app, 'user', '')), on_done=_done, on_error=_on_error)
+
+    ttk.Button(rb, text='Semana', command=lambda: _cargar_rango('semana')).pack(side=tk.LEFT, padx=(0, 6))
+    ttk.Button(rb, text='Mes', command=lambda: _cargar_rango('mes')).pack(side=tk.LEFT, padx=6)
+    ttk.Button(rb, text='Mes anterior', command=lambda: _cargar_rango('mes_anterior')).pack(side=tk.LEFT, padx=6)
+    ttk.Button(rb, text='Cargar rango', command=_cargar_rango).pack(side=tk.LEFT, padx=6)
+    ttk.Button(rb, text='Guardar PDF', command=_pdf_rango).pack(side=tk.LEFT, padx=6)
+
+    cargar_btn = ttk.Button(f, text='Cargar', command=_cargar)
+    cargar_btn.pack(side=tk.LEFT, padx=6)
+    ttk.Label(f, textvariable=status_var).pack(side=tk.LEFT, padx=6)
     if analytics and date_str:
         _render_analytics(analytics)
     else:
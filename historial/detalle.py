@@ -1,5 +1,4 @@
 """Detalle de factura (reimprimir) para la carpeta venta."""
-import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 
@@ -145,7 +144,12 @@ def show_factura_detail(app, factura):
 
     def reimprimir():
         try:
-            os.startfile(factura.get('file', ''), 'print')
+            from utils.print_spooler import get_spooler
+            spooler = get_spooler()
+            spooler.start()
+            if spooler.reprint(factura.get('numero_factura') or factura.get('id') or '', factura) is None:
+                messagebox.showwarning('Impresión', 'Factura no disponible para reimprimir.')
+                return
             messagebox.showinfo('Impresión', 'Factura enviada a la impresora.')
         except Exception as e:
             messagebox.showerror('Error', f'No se pudo imprimir: {e}')
@@ -9,10 +9,41 @@ import shutil
 from tkinter import ttk, messagebox, filedialog
 
 from . import dialogs
+from utils.task_runner import TaskRunner
 
 logger = logging.getLogger('VentaExport')
 
 
+def export_invoice_lines_csv(path: str, date_from: str = None, date_to: str = None,
+                             progress=None, cancelled=None) -> int:
+    """Escribe en `path` una fila por línea de factura del rango (YYYY-MM-DD, inclusive).
+
+    Lee de la BD con un cursor y escribe a medida que llegan las filas (memoria
+    constante). progress(hechas, total) se llama cada 1000 filas; si cancelled()
+    devuelve True se detiene y borra el archivo parcial. Devuelve las filas escritas.
+    """
+    import database
+    total = database.count_invoice_lines(date_from, date_to)
+    n = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(database.INVOICE_LINE_COLUMNS)
+        for row in database.iter_invoice_lines(date_from, date_to):
+            w.writerow(row)
+            n += 1
+            if n % 1000 == 0:
+                if cancelled is not None and cancelled():
+                    break
+                if progress is not None:
+                    progress(n, total)
+    if cancelled is not None and cancelled():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return n
+
+
 def show_export_menu(app):
     data_dir = getattr(app, '_data_dir', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
     facturas_dir = getattr(app, '_facturas_dir', os.path.join(data_dir, 'facturas'))
@@ -30,37 +61,103 @@ def show_export_menu(app):
     pad = 14
     ttk.Label(content, text='Exportar a CSV', font=('Helvetica', 12, 'bold')).pack(pady=(0, pad))
 
+    # rango para las exportaciones de facturas (vacío = todo el historial)
+    rango = ttk.Frame(content)
+    rango.pack(fill=tk.X, pady=(0, 6))
+    desde_var = tk.StringVar(value='')
+    hasta_var = tk.StringVar(value='')
+    ttk.Label(rango, text='Desde:').pack(side=tk.LEFT)
+    ttk.Entry(rango, textvariable=desde_var, width=11).pack(side=tk.LEFT, padx=(2, 8))
+    ttk.Label(rango, text='Hasta:').pack(side=tk.LEFT)
+    ttk.Entry(rango, textvariable=hasta_var, width=11).pack(side=tk.LEFT, padx=(2, 0))
+
+    def _rango():
+        """(desde, hasta) validados o None si alguna fecha es inválida."""
+        out = []
+        for var in (desde_var, hasta_var):
+            txt = var.get().strip()
+            if txt:
+                try:
+                    txt = datetime.datetime.strptime(txt, '%Y-%m-%d').date().isoformat()
+                except ValueError:
+                    messagebox.showwarning('Exportar', 'Use fechas con formato AAAA-MM-DD', parent=win)
+                    return None
+            out.append(txt or None)
+        return tuple(out)
+
+    runner = TaskRunner(win)
+    status_var = tk.StringVar(value='')
+
+    def _write_facturas(task, path, date_from, date_to):
+        # hilo de trabajo: consulta y escritura del CSV; se detiene si se cierra la ventana
+        import database
+        # una consulta a la tabla invoices (sin líneas) en lugar de abrir cada JSON
+        invoices = database.get_invoices(date_from, date_to, include_items=False)
+        total = len(invoices)
+        n = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['numero', 'fecha', 'total_bs', 'total_usd', 'estado'])
+            for inv in invoices:
+                if task.cancelled:
+                    break
+                nro = inv.get('numero_factura') or inv.get('id') or ''
+                fecha = inv.get('datetime') or inv.get('timestamp') or ''
+                w.writerow((nro, fecha, inv.get('total_bs', 0), inv.get('total_usd', 0), inv.get('state', '')))
+                n += 1
+                if n % 500 == 0:
+                    task.progress(n, total)
+        if task.cancelled:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return n
+
     def _export_facturas():
+        rng = _rango()
+        if rng is None:
+            return
         path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[('CSV', '*.csv')], title='Guardar facturas')
         if not path:
             return
-        try:
-            rows = []
-            base = facturas_dir
-            for entry in sorted(os.listdir(base)) if os.path.isdir(base) and os.path.exists(base) else []:
-                day_path = os.path.join(base, entry)
-                if not os.path.isdir(day_path):
-                    continue
-                for fname in os.listdir(day_path):
-                    if not fname.lower().endswith('.json'):
-                        continue
-                    with open(os.path.join(day_path, fname), 'r', encoding='utf-8') as f:
-                        inv = json.load(f)
-                    nro = inv.get('numero_factura') or inv.get('id') or ''
-                    fecha = inv.get('datetime') or inv.get('timestamp') or ''
-                    total_bs = inv.get('total_bs', 0)
-                    total_usd = inv.get('total_usd', 0)
-                    state = inv.get('state', '')
-                    rows.append((nro, fecha, total_bs, total_usd, state))
-            with open(path, 'w', encoding='utf-8', newline='') as f:
-                w = csv.writer(f)
-                w.writerow(['numero', 'fecha', 'total_bs', 'total_usd', 'estado'])
-                w.writerows(rows)
-            messagebox.showinfo('Exportar', f'Exportadas {len(rows)} facturas a {path}')
-        except (OSError, json.JSONDecodeError, TypeError) as e:
-            logger.exception('Export facturas CSV')
+
+        def _done(n):
+            messagebox.showinfo('Exportar', f'Exportadas {n} facturas a {path}')
+            win.destroy()
+
+        def _failed(e):
+            logger.error('Export facturas CSV: %s', e)
+            status_var.set('')
             messagebox.showerror('Error', str(e))
-        win.destroy()
+            win.destroy()
+
+        status_var.set('Exportando facturas…')
+        runner.run(_write_facturas, path, *rng, on_done=_done, on_error=_failed,
+                   on_progress=lambda done, total, _t='': status_var.set(f'Exportando facturas… {done}/{total}'))
+
+    def _export_lineas():
+        rng = _rango()
+        if rng is None:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[('CSV', '*.csv')], title='Guardar detalle de facturas')
+        if not path:
+            return
+
+        def _done(n):
+            messagebox.showinfo('Exportar', f'Exportadas {n} líneas de factura a {path}')
+            win.destroy()
+
+        def _failed(e):
+            logger.error('Export líneas CSV: %s', e)
+            status_var.set('')
+            messagebox.showerror('Error', str(e))
+
+        status_var.set('Exportando detalle…')
+        runner.run(lambda task: export_invoice_lines_csv(path, *rng, progress=task.progress,
+                                                         cancelled=lambda: task.cancelled),
+                   on_done=_done, on_error=_failed,
+                   on_progress=lambda done, total, _t='': status_var.set(f'Exportando detalle… {done}/{total} líneas'))
 
     def _export_productos():
         path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[('CSV', '*.csv')], title='Guardar productos')
@@ -114,7 +211,9 @@ def show_export_menu(app):
         win.destroy()
 
     ttk.Button(content, text='  Exportar facturas', command=_export_facturas, width=24).pack(fill=tk.X, pady=4)
+    ttk.Button(content, text='  Exportar detalle (líneas)', command=_export_lineas, width=24).pack(fill=tk.X, pady=4)
     ttk.Button(content, text='  Exportar productos', command=_export_productos, width=24).pack(fill=tk.X, pady=4)
     ttk.Button(content, text='  Exportar clientes', command=_export_clientes, width=24).pack(fill=tk.X, pady=4)
     ttk.Button(content, text='  Crear respaldo local', command=_backup_local, width=24).pack(fill=tk.X, pady=4)
+    ttk.Label(content, textvariable=status_var).pack(fill=tk.X, pady=(4, 0))
     ttk.Button(content, text='Cerrar', command=win.destroy).pack(pady=pad)
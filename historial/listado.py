@@ -2,6 +2,7 @@
 
 Función principal: show_facturas(app)
 """
+import datetime
 import json
 import logging
 import os
@@ -9,9 +10,15 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 
 from . import dialogs
+from .manifest import list_days, count_day, load_day, update_invoice, dominant_method
+from utils.column_autosizer import ColumnAutoSizer
+from utils.task_runner import TaskRunner
 
 logger = logging.getLogger('VentaHist')
 
+# días que muestra el historial al abrirse (setting 'historial_dias'; 0 = todos)
+DEFAULT_DAYS = 30
+
 
 def show_facturas(app):
     """Abre la ventana de historial de facturas finalizadas."""
@@ -47,6 +54,24 @@ def show_facturas(app):
     hdr.pack(fill=tk.X, pady=(pad, 4))
     ttk.Label(hdr, text='Facturas finalizadas', font=('Helvetica', int(14 * ui_scale), 'bold')).pack(side=tk.LEFT, padx=pad)
 
+    # filtro por rango de fechas (por defecto, los últimos N días)
+    try:
+        import database
+        n_days = int(database.get_setting('historial_dias', str(DEFAULT_DAYS)) or 0)
+    except Exception:
+        n_days = DEFAULT_DAYS
+    today = datetime.date.today()
+    desde_var = tk.StringVar(value=(today - datetime.timedelta(days=n_days - 1)).isoformat() if n_days > 0 else '')
+    hasta_var = tk.StringVar(value='')
+    filter_bar = ttk.Frame(hdr)
+    filter_bar.pack(side=tk.RIGHT, padx=pad)
+    ttk.Label(filter_bar, text='Desde:').pack(side=tk.LEFT)
+    desde_entry = ttk.Entry(filter_bar, textvariable=desde_var, width=11)
+    desde_entry.pack(side=tk.LEFT, padx=(2, 8))
+    ttk.Label(filter_bar, text='Hasta:').pack(side=tk.LEFT)
+    hasta_entry = ttk.Entry(filter_bar, textvariable=hasta_var, width=11)
+    hasta_entry.pack(side=tk.LEFT, padx=(2, 8))
+
     # Use a plain frame instead of PanedWindow to avoid any sash/separator
     main_pane = ttk.Frame(content)
     main_pane.pack(fill=tk.BOTH, expand=True, padx=pad, pady=pad)
@@ -109,169 +134,272 @@ def show_facturas(app):
         pass
     tree.pack(fill=tk.BOTH, expand=True)
 
-    invoices_map = {}
-    date_children = {}
+    # anchos de columna a partir de una muestra de los textos más largos (no de cada celda)
+    import tkinter.font as tkfont
+    cols = ('#0', 'Nro', 'FechaHora', 'Productos', 'Total', 'Pago')
     try:
-        for entry in sorted(os.listdir(facturas_base)):
-            day_path = os.path.join(facturas_base, entry)
-            if not os.path.isdir(day_path):
-                continue
-            date_node = tree.insert('', tk.END, text=entry, open=False)
-            date_children[date_node] = []
-            files = sorted([f for f in os.listdir(day_path) if f.lower().endswith('.json') or f.lower().startswith('invoice_') or f.lower().startswith('factura_')])
-            for idx, fname in enumerate(files, 1):
-                fpath = os.path.join(day_path, fname)
-                try:
-                    with open(fpath, 'r', encoding='utf-8') as f:
-                        inv = json.load(f)
-                except (OSError, json.JSONDecodeError, TypeError):
-                    continue
-                def _prod_preview(p):
-                                name = (p.get('name') or '').strip()
-                                if name:
-                                    name = name[0].upper() + name[1:] if len(name) > 1 else name.upper()
-                                qty = p.get('qty') if p.get('qty') is not None else p.get('quantity', '')
-                                return f"{name}({qty})"
-                productos_str = ', '.join(_prod_preview(p) for p in inv.get('productos', []))
-                preview = productos_str if len(productos_str) <= 80 else productos_str[:77] + '...'
-                fecha_h = inv.get('datetime') or inv.get('timestamp', '')
-                total_str = f"{inv.get('total_bs', 0):.2f} BS / {inv.get('total_usd', 0):.2f} $"
-                pays = inv.get('payments', {}) or {}
-                try:
-                    tc = float(getattr(app, 'exchange_rate', 1.0))
-                except Exception:
-                    tc = 1.0
-                amounts = {
-                    'Dólar': float(pays.get('usd', 0)) * tc,
-                    'Punto de Venta': float(pays.get('punto_bs', 0)),
-                    'Pago Móvil': float(pays.get('pago_movil_bs', 0)),
-                    'Efectivo': float(pays.get('efectivo_bs', 0))
-                }
-                method = 'Desconocido'
-                try:
-                    if any(v and float(v) for v in amounts.values()):
-                        method = max(amounts, key=lambda k: amounts[k])
-                except Exception:
-                    pass
-                pm = inv.get('payment_methods') if isinstance(inv.get('payment_methods'), (list, tuple)) else None
-                method_display = ', '.join(pm) if pm else method
-                nro_display = inv.get('numero_factura') or str(idx)
-                if (inv.get('state') or '').upper() == 'ANULADA':
-                    nro_display = f"{nro_display} [Anulada]"
-                child = tree.insert(date_node, tk.END, text=inv.get('timestamp', ''), values=(nro_display, fecha_h, preview, total_str, method_display))
-                invoices_map[child] = inv
-                date_children[date_node].append(child)
+        base_font = tkfont.Font(family='Helvetica', size=int(9 * ui_scale))
     except Exception:
-        pass
+        base_font = tkfont.nametofont('TkDefaultFont')
+    sizer = ColumnAutoSizer(base_font, cols, padding=int(12 * ui_scale))
+    sizer.add_headers([tree.heading(c)['text'] for c in cols])
+    applied_widths = {}
 
-    # Auto-size columns to content and prevent user from resizing columns
-    try:
-        import tkinter.font as tkfont
-        cols = ('#0', 'Nro', 'FechaHora', 'Productos', 'Total', 'Pago')
-        # use the same base font size as the tree style if possible
-        try:
-            base_font = tkfont.Font(family='Helvetica', size=int(9 * ui_scale))
-        except Exception:
-            base_font = tkfont.nametofont('TkDefaultFont')
-        padding = int(12 * ui_scale)
-        # measure header and values
-        max_widths = {c: base_font.measure(tree.heading(c)['text']) + padding for c in cols}
-        for parent in tree.get_children(''):
-            # include date rows for #0
+    status_var = tk.StringVar(value='')
+    ttk.Label(list_frame, textvariable=status_var, font=('Helvetica', int(9 * ui_scale))).pack(fill=tk.X, pady=(2, 0))
+    runner = TaskRunner(win)
+
+    invoices_map = {}
+    json_paths = {}
+    full_cache = {}
+    date_children = {}
+    day_paths = {}      # nodo de fecha -> carpeta del día, mientras no se haya cargado
+    loading = {}        # nodo de fecha -> callbacks pendientes mientras se carga
+    # Los nodos de fecha salen solo del listado de carpetas (con un conteo de archivos);
+    # las facturas de un día se leen de su manifiesto (historial/manifest.py) al expandirlo
+    # y el JSON completo de una factura solo al seleccionarla. Las lecturas de disco van
+    # en un hilo (utils/task_runner.py) y las filas se insertan por partes.
+
+    def _insert_summaries(date_node, day_path, rows):
+        sized = []
+        for idx, summ in rows:
+            total_str = f"{float(summ.get('total_bs', 0) or 0):.2f} BS / {float(summ.get('total_usd', 0) or 0):.2f} $"
+            nro_display = summ.get('numero') or str(idx)
+            if (summ.get('state') or '').upper() == 'ANULADA':
+                nro_display = f"{nro_display} [Anulada]"
+            values = (nro_display, summ.get('datetime', ''), summ.get('preview', ''), total_str, summ.get('method', ''))
+            child = tree.insert(date_node, tk.END, text=summ.get('timestamp', ''), values=values)
+            sized.append((summ.get('timestamp', ''),) + values)
+            invoices_map[child] = summ
+            json_paths[child] = os.path.join(day_path, summ['file'])
+            date_children[date_node].append(child)
+        sizer.add_rows(sized)
+
+    def _load_day(date_node, on_loaded=None):
+        """Carga (una sola vez) las facturas del día; on_loaded se llama al terminar."""
+        if date_node in loading:
+            if on_loaded is not None:
+                loading[date_node].append(on_loaded)
+            return
+        day_path = day_paths.pop(date_node, None)
+        if day_path is None:
+            if on_loaded is not None:
+                on_loaded()
+            return
+        loading[date_node] = [on_loaded] if on_loaded is not None else []
+        placeholders = list(tree.get_children(date_node))
+        for ph in placeholders:
+            tree.item(ph, text='Cargando…')
+
+        def _work(task):
+            rows = [(idx, summ) for idx, summ in enumerate(load_day(day_path), 1) if not summ.get('invalid')]
+            task.emit(rows)
+            return len(rows)
+
+        def _on_chunk(rows):
+            if placeholders:
+                tree.delete(*placeholders)
+                placeholders.clear()
+            _insert_summaries(date_node, day_path, rows)
+
+        def _on_done(_n):
+            if placeholders:
+                tree.delete(*placeholders)
+                placeholders.clear()
+            status_var.set('')
+            if applied_widths:
+                # días expandidos después del primero: crecer columnas si hace falta
+                _fit_columns()
+            for cb in loading.pop(date_node, []):
+                cb()
+
+        def _on_error(e):
+            loading.pop(date_node, None)
+            day_paths[date_node] = day_path
+            status_var.set(f'Error al cargar {os.path.basename(day_path)}: {e}')
+
+        status_var.set(f'Cargando {os.path.basename(day_path)}…')
+        runner.run(_work, on_chunk=_on_chunk, on_done=_on_done, on_error=_on_error)
+
+    def _populate(date_from=None, date_to=None, on_loaded=None):
+        runner.cancel_all()
+        for node in tree.get_children(''):
+            tree.delete(node)
+        for d in (invoices_map, json_paths, full_cache, date_children, day_paths, loading):
+            d.clear()
+
+        def _work(task):
+            days = list_days(facturas_base, date_from, date_to)
+            for i, entry in enumerate(days, 1):
+                if task.cancelled:
+                    return None
+                day_path = os.path.join(facturas_base, entry)
+                task.emit([(entry, day_path, count_day(day_path))])
+                if i % 50 == 0:
+                    task.progress(i, len(days))
+            return len(days)
+
+        def _on_chunk(rows):
+            for entry, day_path, n in rows:
+                values = ('', '', f"{n} factura{'s' if n != 1 else ''}", '', '')
+                date_node = tree.insert('', tk.END, text=entry, open=False, values=values)
+                sizer.add_rows([(entry,) + values])
+                date_children[date_node] = []
+                day_paths[date_node] = day_path
+                if n:
+                    # hijo provisional para que aparezca el indicador de expandir
+                    tree.insert(date_node, tk.END, text='…')
+
+        def _on_done(n_days):
+            status_var.set('')
             try:
-                txt = tree.item(parent, 'text')
-                w = base_font.measure(str(txt) or '') + padding
-                if w > max_widths['#0']:
-                    max_widths['#0'] = w
+                empty_hint.configure(text='No hay facturas finalizadas.' if not n_days else 'Seleccione una factura de la lista.')
             except Exception:
                 pass
-            # children (actual invoices)
-            for child in tree.get_children(parent):
-                vals = tree.item(child, 'values') or ()
-                # '#0' column uses item text
-                try:
-                    t0 = tree.item(child, 'text')
-                    w0 = base_font.measure(str(t0) or '') + padding
-                    if w0 > max_widths['#0']:
-                        max_widths['#0'] = w0
-                except Exception:
-                    pass
-                # other columns map to vals indices
-                try:
-                    for idx, cid in enumerate(cols[1:], start=0):
-                        v = vals[idx] if idx < len(vals) else ''
-                        w = base_font.measure(str(v) or '') + padding
-                        if w > max_widths[cid]:
-                            max_widths[cid] = w
-                except Exception:
-                    pass
-        # apply widths and prevent stretching
-        total_w = 0
-        for c in cols:
-            try:
-                minw = tree.column(c, option='minwidth') or 20
-            except Exception:
-                minw = 20
-            w = int(max(max_widths.get(c, 40), int(minw)))
-            tree.column(c, width=w, stretch=False)
-            total_w += w
-        # set left/right frame widths to match content and detail panel
+            if on_loaded is not None:
+                on_loaded()
+
+        status_var.set('Leyendo historial…')
+        runner.run(_work, on_chunk=_on_chunk, on_done=_on_done,
+                   on_progress=lambda done, total, _t='': status_var.set(f'Leyendo historial… {done}/{total} días'),
+                   on_error=lambda e: status_var.set(f'Error al leer el historial: {e}'))
+
+    def _on_tree_open(event=None):
         try:
-            right_w = int(360 * ui_scale)
-            extra = int(80 * ui_scale)
-            # ensure left frame uses total_w
-            try:
-                left.config(width=total_w)
-                left.pack_propagate(False)
-            except Exception:
-                pass
-            try:
-                right.config(width=right_w)
-                right.pack_propagate(False)
-            except Exception:
-                pass
+            _load_day(tree.focus())
         except Exception:
-            right_w = int(360 * ui_scale)
-        # now compute final window size, cap to screen and center
+            pass
+
+    def _valid_date(txt):
+        txt = (txt or '').strip()
+        if not txt:
+            return ''
+        try:
+            return datetime.datetime.strptime(txt, '%Y-%m-%d').date().isoformat()
+        except ValueError:
+            return None
+
+    def apply_filter(event=None):
+        d_from, d_to = _valid_date(desde_var.get()), _valid_date(hasta_var.get())
+        if d_from is None or d_to is None:
+            messagebox.showwarning('Filtrar', 'Use fechas con formato AAAA-MM-DD', parent=win)
+            return
+        _populate(d_from or None, d_to or None)
+        on_select()
+
+    def show_all():
+        desde_var.set('')
+        hasta_var.set('')
+        apply_filter()
+
+    def _open_last_day():
+        # el día más reciente se muestra abierto (y sirve para medir las columnas)
         try:
+            last_day = tree.get_children('')[-1]
+        except IndexError:
+            _fit_columns()
+            return
+        tree.item(last_day, open=True)
+        _load_day(last_day, on_loaded=_fit_columns)
+
+    tree.bind('<<TreeviewOpen>>', _on_tree_open)
+    desde_entry.bind('<Return>', apply_filter)
+    hasta_entry.bind('<Return>', apply_filter)
+    ttk.Button(filter_bar, text='Filtrar', command=apply_filter, style="TButton").pack(side=tk.LEFT, padx=(0, 4))
+    ttk.Button(filter_bar, text='Todo', command=show_all, style="TButton").pack(side=tk.LEFT)
+
+    def _full_invoice(item):
+        """JSON completo de la factura (se lee una vez, al necesitar el detalle)."""
+        if item in full_cache:
+            return full_cache[item]
+        inv = None
+        fpath = json_paths.get(item)
+        if fpath:
             try:
-                win.update_idletasks()
-            except Exception:
-                pass
-            extra = int(80 * ui_scale)
-            win_w = int(total_w + right_w + extra)
-            win_h = int(default_h)
-            # cap to screen size with margins
+                with open(fpath, 'r', encoding='utf-8') as f:
+                    inv = json.load(f)
+            except (OSError, json.JSONDecodeError, TypeError):
+                inv = None
+        if isinstance(inv, dict):
+            full_cache[item] = inv
+        return inv if isinstance(inv, dict) else None
+
+    def _fit_columns():
+        """Ajusta las columnas al contenido cargado (ver utils/column_autosizer.py) y la ventana a ellas."""
+        try:
             try:
-                screen_w = win.winfo_screenwidth()
-                screen_h = win.winfo_screenheight()
-                max_w = max(int(screen_w * 0.9), 200)
-                max_h = max(int(screen_h * 0.9), 200)
-                if win_w > max_w:
-                    win_w = max_w
-                if win_h > max_h:
-                    win_h = max_h
+                minw = {c: int(tree.column(c, option='minwidth') or 20) for c in cols}
             except Exception:
-                pass
+                minw = {}
+            widths = sizer.widths(minw)
+            if widths == applied_widths:
+                return
+            first_fit = not applied_widths
+            applied_widths.clear()
+            applied_widths.update(widths)
+            # apply widths and prevent stretching
+            total_w = 0
+            for c in cols:
+                tree.column(c, width=widths[c], stretch=False)
+                total_w += widths[c]
+            # set left/right frame widths to match content and detail panel
             try:
-                win.geometry(f"{win_w}x{win_h}")
-                win.minsize(win_w, win_h)
-                win.maxsize(win_w, win_h)
-                win.resizable(False, False)
+                right_w = int(360 * ui_scale)
+                extra = int(80 * ui_scale)
+                # ensure left frame uses total_w
+                try:
+                    left.config(width=total_w)
+                    left.pack_propagate(False)
+                except Exception:
+                    pass
+                try:
+                    right.config(width=right_w)
+                    right.pack_propagate(False)
+                except Exception:
+                    pass
             except Exception:
-                pass
+                right_w = int(360 * ui_scale)
+            # now compute final window size, cap to screen and center
             try:
-                dialogs.center_window(app, win, win_w, win_h)
+                try:
+                    win.update_idletasks()
+                except Exception:
+                    pass
+                extra = int(80 * ui_scale)
+                win_w = int(total_w + right_w + extra)
+                win_h = int(default_h)
+                # cap to screen size with margins
+                try:
+                    screen_w = win.winfo_screenwidth()
+                    screen_h = win.winfo_screenheight()
+                    max_w = max(int(screen_w * 0.9), 200)
+                    max_h = max(int(screen_h * 0.9), 200)
+                    if win_w > max_w:
+                        win_w = max_w
+                    if win_h > max_h:
+                        win_h = max_h
+                except Exception:
+                    pass
+                try:
+                    win.geometry(f"{win_w}x{win_h}")
+                    win.minsize(win_w, win_h)
+                    win.maxsize(win_w, win_h)
+                    win.resizable(False, False)
+                except Exception:
+                    pass
+                if first_fit:
+                    try:
+                        dialogs.center_window(app, win, win_w, win_h)
+                    except Exception:
+                        pass
             except Exception:
                 pass
         except Exception:
             pass
-    except Exception:
-        pass
 
     detail_hdr = ttk.Label(right, text='Detalle', font=('Helvetica', 12, 'bold'))
     detail_hdr.pack(anchor=tk.W, pady=(6, 4), padx=8)
-    empty_hint = ttk.Label(right, text='No hay facturas finalizadas.' if not invoices_map else 'Seleccione una factura de la lista.', font=('Helvetica', 10))
+    empty_hint = ttk.Label(right, text='Cargando…', font=('Helvetica', 10))
     empty_hint.pack(anchor=tk.W, padx=8, pady=(0, 4))
     outer_box = tk.Frame(right, bg=border_gray)
     outer_box.pack(fill=tk.BOTH, expand=True, padx=8, pady=4)
@@ -358,7 +486,7 @@ def show_facturas(app):
         if item in date_children and date_children.get(item):
             messagebox.showinfo('Seleccione', 'Seleccione una factura dentro de la fecha seleccionada')
             return
-        inv = invoices_map.get(item)
+        inv = _full_invoice(item) if item in invoices_map else None
         if not inv:
             messagebox.showwarning('Seleccionar', 'Factura no encontrada')
             return
@@ -378,18 +506,21 @@ def show_facturas(app):
         if item in date_children:
             messagebox.showinfo('Reimprimir', 'Seleccione una factura (no una carpeta de fecha)')
             return
-        inv = invoices_map.get(item)
+        inv = _full_invoice(item) if item in invoices_map else None
         if not inv:
             messagebox.showwarning('Reimprimir', 'Factura no encontrada')
             return
-        file_path = inv.get('file', '')
-        if not file_path or not os.path.isfile(file_path):
-            messagebox.showwarning('Reimprimir', 'Archivo de factura no disponible para reimprimir')
-            return
+        # mismos bytes del ticket original por la cola de impresión; las facturas anteriores a
+        # la cola se vuelven a armar con el mismo renderer que do_print
         try:
-            os.startfile(file_path, 'print')
-            messagebox.showinfo('Impresión', 'Enviado a la impresora')
-        except (OSError, AttributeError) as e:
+            from utils.print_spooler import get_spooler
+            spooler = get_spooler()
+            spooler.start()
+            if spooler.reprint(inv.get('numero_factura') or inv.get('id') or '', inv) is None:
+                messagebox.showwarning('Reimprimir', 'Factura no disponible para reimprimir')
+                return
+            messagebox.showinfo('Impresión', 'Enviado a la cola de impresión')
+        except Exception as e:
             messagebox.showerror('Error', f'No se pudo reimprimir: {e}')
 
     def anular_selected():
@@ -401,7 +532,7 @@ def show_facturas(app):
         if item in date_children:
             messagebox.showinfo('Anular', 'Seleccione una factura (no una carpeta de fecha)')
             return
-        inv = invoices_map.get(item)
+        inv = _full_invoice(item) if item in invoices_map else None
         if not inv:
             return
         if (inv.get('state') or '').upper() == 'ANULADA':
@@ -420,7 +551,13 @@ def show_facturas(app):
                 return
         inv['state'] = 'ANULADA'
         inv['anulada_motivo'] = motivo
-        fpath = inv.get('file')
+        try:
+            import database
+            database.void_invoice(inv.get('numero_factura') or inv.get('id') or '', motivo)
+        except Exception as e:
+            logger.warning('No se pudo guardar anulación en la BD: %s', e)
+        # JSON del día (inv['file'] es el .txt impreso, no el registro)
+        fpath = json_paths.get(item)
         if fpath and os.path.isfile(fpath):
             try:
                 with open(fpath, 'r', encoding='utf-8') as f:
@@ -431,10 +568,20 @@ def show_facturas(app):
                     json.dump(data, f, ensure_ascii=False, indent=2)
             except (OSError, json.JSONDecodeError, TypeError) as e:
                 logger.warning('No se pudo guardar anulación en archivo: %s', e)
+            try:
+                update_invoice(os.path.dirname(fpath), os.path.basename(fpath), state='ANULADA')
+            except OSError as e:
+                logger.warning('No se pudo actualizar el manifiesto: %s', e)
+        try:
+            invoices_map[item]['state'] = 'ANULADA'
+        except (KeyError, TypeError):
+            pass
         vals_old = tree.item(item, 'values')
         nro_old = str(vals_old[0]) if vals_old else inv.get('numero_factura') or ''
         if not nro_old.endswith(' [Anulada]'):
             tree.item(item, values=(nro_old + ' [Anulada]',) + (vals_old[1:] if len(vals_old) > 1 else ()))
+            if sizer.add_rows([('', nro_old + ' [Anulada]')]):
+                _fit_columns()
         messagebox.showinfo('Anular', 'Factura marcada como anulada.')
 
     ttk.Button(btns, text='Ver Detalle', command=open_detail, style="Accent.TButton").pack(side=tk.LEFT, padx=6)
@@ -460,32 +607,19 @@ def show_facturas(app):
             return
         item = sel[0]
         if item in date_children:
+            if item in day_paths or item in loading:
+                # se vuelve a mostrar cuando terminen de cargarse las facturas del día
+                _load_day(item, on_loaded=lambda it=item: on_select() if it in tree.selection() else None)
             try:
                 products_text.configure(state='normal')
                 products_text.delete('1.0', tk.END)
                 products_text.insert(tk.END, f"Facturas del día {tree.item(item, 'text')}:\n\n")
                 for child in date_children.get(item, []):
-                    inv = invoices_map.get(child)
-                    if not inv:
+                    summ = invoices_map.get(child)
+                    if not summ:
                         continue
-                    pm = inv.get('payment_methods') if isinstance(inv.get('payment_methods'), (list, tuple)) else None
-                    if pm:
-                        method = ', '.join(pm)
-                    else:
-                        pays = inv.get('payments', {}) or {}
-                        method = 'Desconocido'
-                        try:
-                            tc = float(getattr(app, 'exchange_rate', 1.0))
-                        except Exception:
-                            tc = 1.0
-                        amounts = {'Dólar': float(pays.get('usd', 0)) * tc, 'Punto de Venta': float(pays.get('punto_bs', 0)), 'Pago Móvil': float(pays.get('pago_movil_bs', 0)), 'Efectivo': float(pays.get('efectivo_bs', 0))}
-                        try:
-                            if any(v and float(v) for v in amounts.values()):
-                                method = max(amounts, key=lambda k: amounts[k])
-                        except Exception:
-                            pass
-                    total_bs = inv.get('total_bs', 0)
-                    products_text.insert(tk.END, f"ID: {inv.get('timestamp', '')} — Total: {total_bs:.2f} BS — Método: {method}\n")
+                    total_bs = float(summ.get('total_bs', 0) or 0)
+                    products_text.insert(tk.END, f"ID: {summ.get('timestamp', '')} — Total: {total_bs:.2f} BS — Método: {summ.get('method', '')}\n")
                 products_text.configure(state='disabled')
             except Exception:
                 pass
@@ -496,7 +630,7 @@ def show_facturas(app):
             info_vars['iva'].set('0.00 BS')
             info_vars['total'].set('')
             return
-        inv = invoices_map.get(item)
+        inv = _full_invoice(item) if item in invoices_map else None
         if not inv:
             return
         info_vars['id'].set(inv.get('numero_factura') or str(inv.get('id', '')) or inv.get('timestamp', ''))
@@ -504,22 +638,8 @@ def show_facturas(app):
         info_vars['subtotal'].set(f"{inv.get('subtotal_bs', 0):.2f} BS")
         info_vars['iva'].set(f"{inv.get('iva_amount_bs', 0):.2f} BS")
         info_vars['total'].set(f"{inv.get('total_bs', 0):.2f} BS")
-        pays = inv.get('payments', {}) or {}
-        try:
-            tc = float(getattr(app, 'exchange_rate', 1.0))
-        except Exception:
-            tc = 1.0
-        amounts = {'Dólar': float(pays.get('usd', 0)) * tc, 'Punto de Venta': float(pays.get('punto_bs', 0)), 'Pago Móvil': float(pays.get('pago_movil_bs', 0)), 'Efectivo': float(pays.get('efectivo_bs', 0))}
-        pm = inv.get('payment_methods') if isinstance(inv.get('payment_methods'), (list, tuple)) else None
-        if pm:
-            method_display = ', '.join(pm)
-        else:
-            method_display = 'Desconocido'
-            try:
-                if any(v and float(v) for v in amounts.values()):
-                    method_display = max(amounts, key=lambda k: amounts[k])
-            except Exception:
-                pass
+        # mismo método que muestra el listado (calculado en el manifiesto)
+        method_display = invoices_map[item].get('method') or dominant_method(inv)
         payment_method_var.set(method_display)
         color_map = {'Dólar': '#0062ff', 'Punto de Venta': '#1E90FF', 'Pago Móvil': '#00a2ff', 'Efectivo': '#AAAAAA', 'Desconocido': '#E0E0E0'}
         try:
@@ -596,3 +716,4 @@ def show_facturas(app):
             pass
 
     tree.bind('<<TreeviewSelect>>', on_select)
+    _populate(_valid_date(desde_var.get()) or None, on_loaded=_open_last_day)
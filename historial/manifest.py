@@ -0,0 +1,188 @@
+"""Manifiesto por día de facturas (data/facturas/YYYY-MM-DD/_manifest.jsonl) con el resumen del historial."""
+import json
+import os
+import time
+
+MANIFEST_NAME = '_manifest.jsonl'
+
+
+def _is_invoice_file(fname: str) -> bool:
+    return fname.lower().endswith('.json') and not fname.startswith('_')
+
+
+def _prod_preview(p) -> str:
+    name = (p.get('name') or '').strip()
+    if name:
+        name = name[0].upper() + name[1:] if len(name) > 1 else name.upper()
+    qty = p.get('qty') if p.get('qty') is not None else p.get('quantity', '')
+    return f"{name}({qty})"
+
+
+def dominant_method(inv: dict, tc: float = None) -> str:
+    """Método de pago con mayor monto (en BS) o los de payment_methods si vienen explícitos."""
+    pm = inv.get('payment_methods') if isinstance(inv.get('payment_methods'), (list, tuple)) else None
+    if pm:
+        return ', '.join(pm)
+    pays = inv.get('payments', {}) or {}
+    if tc is None:
+        # tasa de la propia factura (total BS / total $), no la del día en que se consulta
+        try:
+            tc = float(inv.get('total_bs') or 0) / float(inv.get('total_usd') or 0)
+        except (TypeError, ValueError, ZeroDivisionError):
+            tc = 1.0
+    try:
+        amounts = {
+            'Dólar': float(pays.get('usd', 0) or 0) * tc,
+            'Punto de Venta': float(pays.get('punto_bs', 0) or 0),
+            'Pago Móvil': float(pays.get('pago_movil_bs', 0) or 0),
+            'Efectivo': float(pays.get('efectivo_bs', 0) or 0),
+        }
+        if any(amounts.values()):
+            return max(amounts, key=lambda k: amounts[k])
+    except (TypeError, ValueError):
+        pass
+    return 'Desconocido'
+
+
+def summarize(fname: str, inv: dict) -> dict:
+    """Resumen de una factura tal como lo usa el listado del historial."""
+    productos_str = ', '.join(_prod_preview(p) for p in inv.get('productos', []) if isinstance(p, dict))
+    preview = productos_str if len(productos_str) <= 80 else productos_str[:77] + '...'
+    return {
+        'file': fname,
+        'numero': inv.get('numero_factura') or '',
+        'id': inv.get('id'),
+        'timestamp': inv.get('timestamp', ''),
+        'datetime': inv.get('datetime') or inv.get('timestamp', ''),
+        'preview': preview,
+        'total_bs': float(inv.get('total_bs', 0) or 0),
+        'total_usd': float(inv.get('total_usd', 0) or 0),
+        'method': dominant_method(inv),
+        'state': (inv.get('state') or '').upper(),
+    }
+
+
+def list_days(facturas_dir: str, date_from: str = None, date_to: str = None) -> list:
+    """Carpetas de día (YYYY-MM-DD) dentro del rango, en orden ascendente. Solo lista el directorio."""
+    days = []
+    try:
+        with os.scandir(facturas_dir) as it:
+            for e in it:
+                if not e.is_dir():
+                    continue
+                if date_from and e.name < date_from:
+                    continue
+                if date_to and e.name > date_to:
+                    continue
+                days.append(e.name)
+    except OSError:
+        pass
+    return sorted(days)
+
+
+def count_day(day_dir: str) -> int:
+    """Cantidad de facturas del día sin abrir ningún archivo."""
+    try:
+        with os.scandir(day_dir) as it:
+            return sum(1 for e in it if _is_invoice_file(e.name))
+    except OSError:
+        return 0
+
+
+def _mark_fresh(path: str, day_dir: str) -> None:
+    # el mtime del manifiesto debe quedar >= al del directorio (os.replace lo modifica)
+    try:
+        t = max(time.time(), os.stat(day_dir).st_mtime)
+        os.utime(path, (t, t))
+    except OSError:
+        pass
+
+
+def _append_lines(day_dir: str, records: list) -> None:
+    path = os.path.join(day_dir, MANIFEST_NAME)
+    data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+    # una sola escritura en modo append: la línea queda completa o no queda
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    _mark_fresh(path, day_dir)
+
+
+def append_invoice(day_dir: str, fname: str, inv: dict) -> None:
+    """Agrega el resumen de una factura recién guardada en day_dir/fname."""
+    _append_lines(day_dir, [summarize(fname, inv)])
+
+
+def update_invoice(day_dir: str, fname: str, **fields) -> None:
+    """Registra cambios (p. ej. state='ANULADA') de una factura ya listada."""
+    _append_lines(day_dir, [{'file': fname, **fields}])
+
+
+def rebuild(day_dir: str) -> list:
+    """Relee todos los JSON del día y reescribe el manifiesto. Devuelve los resúmenes."""
+    entries = []
+    for fname in sorted(f for f in os.listdir(day_dir) if _is_invoice_file(f)):
+        try:
+            with open(os.path.join(day_dir, fname), 'r', encoding='utf-8') as f:
+                inv = json.load(f)
+        except (OSError, json.JSONDecodeError, TypeError):
+            inv = None
+        if isinstance(inv, dict):
+            entries.append(summarize(fname, inv))
+        else:
+            # se registra igual para que el manifiesto cubra el archivo y no se reconstruya cada vez
+            entries.append({'file': fname, 'invalid': True})
+    path = os.path.join(day_dir, MANIFEST_NAME)
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for e in entries:
+                f.write(json.dumps(e, ensure_ascii=False) + '\n')
+        os.replace(tmp, path)
+        _mark_fresh(path, day_dir)
+    except OSError:
+        pass
+    return entries
+
+
+def _read(path: str) -> dict:
+    merged = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                # línea incompleta (corte de luz a mitad de escritura): se ignora
+                continue
+            fname = rec.get('file')
+            if not fname:
+                continue
+            if fname in merged:
+                merged[fname].update(rec)
+            else:
+                merged[fname] = rec
+    return merged
+
+
+def load_day(day_dir: str) -> list:
+    """Resúmenes de las facturas del día, ordenados por nombre de archivo.
+
+    Usa el manifiesto si está al día; si falta o quedó viejo lo reconstruye.
+    Los archivos ilegibles aparecen con 'invalid': True.
+    """
+    path = os.path.join(day_dir, MANIFEST_NAME)
+    try:
+        files = {f for f in os.listdir(day_dir) if _is_invoice_file(f)}
+        if os.path.isfile(path) and os.stat(path).st_mtime >= os.stat(day_dir).st_mtime:
+            merged = _read(path)
+            # cubre exactamente los JSON presentes (por si se copió/borró algo a mano)
+            if set(merged) == files:
+                return [merged[f] for f in sorted(merged)]
+    except OSError:
+        pass
+    return rebuild(day_dir)
@@ -1,6 +1,4 @@
 """Facturas en pausa: listado y acciones para carpeta venta."""
-import json
-import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 
@@ -10,8 +8,7 @@ _UI_SCALE = 1.15
 
 
 def show_paused_invoices(app):
-    data_dir = getattr(app, '_data_dir', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
-    products_path = os.path.join(data_dir, getattr(app, 'FILE_PRODUCTS', 'products.json'))
+    import database
 
     win = tk.Toplevel(app.root)
     win.title('Facturas en pausa')
@@ -97,7 +94,11 @@ def show_paused_invoices(app):
     except Exception:
         today = None
         yesterday = None
-    for inv in getattr(app, 'paused_invoices', []):
+    try:
+        paused = database.get_paused_invoices()
+    except Exception:
+        paused = []
+    for inv in paused:
         cid = inv.get('id', '')
         ts = inv.get('timestamp') or inv.get('id') or ''
         fecha_human = ''
@@ -133,7 +134,7 @@ def show_paused_invoices(app):
         if not node:
             node = tree.insert('', tk.END, text=date_label, open=False)
             date_nodes[date_label] = node
-        child = tree.insert(node, tk.END, text=ts, iid=cid,
+        child = tree.insert(node, tk.END, text=ts, iid=f"p{inv['paused_id']}",
                     values=(cid, fecha_human, hora, client_name, productos_str, f"{total_bs:.2f}", f"{total_usd:.2f}"))
         invoices_map[child] = inv
 
@@ -209,22 +210,34 @@ def show_paused_invoices(app):
         if not inv:
             messagebox.showwarning('Retomar', 'Por favor seleccione una factura (no una carpeta de fecha)')
             return
-        inv_id = inv.get('id')
+        try:
+            app.clear_selected_items()
+        except Exception:
+            pass
+        # sale de la pausa en una transacción; su reserva de stock pasa al carrito
+        try:
+            inv = database.resume_paused_invoice(inv['paused_id'])
+        except Exception as e:
+            messagebox.showerror('Retomar', f'No se pudo retomar la factura: {e}')
+            return
+        if inv is None:
+            messagebox.showwarning('Retomar', 'La factura ya no está en pausa')
+            win.destroy()
+            return
         try:
             if inv.get('client'):
                 app.set_active_client(inv.get('client'))
         except Exception:
             pass
         try:
-            app.clear_selected_items()
             for p in inv.get('productos', []):
                 try:
                     # prefer using real product id so quantities accumulate correctly
-                    pid = p.get('id') if p.get('id') is not None else p.get('product_id')
+                    pid = p.get('id')
                     qty = int(p.get('qty') or p.get('quantity') or 1)
                     name = p.get('name', '')
                     price = float(p.get('price', 0.0) or 0.0)
-                    if pid is not None:
+                    if pid is not None and int(pid) > 0:
                         try:
                             pid_i = int(pid)
                             # add directly to factura panel without reserving stock (paused invoices keep reservation)
@@ -242,9 +255,7 @@ def show_paused_invoices(app):
         except Exception:
             pass
         try:
-            app.paused_invoices = [i for i in app.paused_invoices if i.get('id') != inv_id]
-            if hasattr(app, 'save_paused_to_disk'):
-                app.save_paused_to_disk()
+            app.update_totals()
         except Exception:
             pass
         messagebox.showinfo('Retomada', 'Factura cargada en el carrito. Revísela y finalice la compra cuando esté lista.')
@@ -260,28 +271,11 @@ def show_paused_invoices(app):
         if not inv:
             messagebox.showwarning('Reiniciar', 'Por favor seleccione una factura (no una carpeta de fecha)')
             return
-        inv_id = inv.get('id')
         try:
-            for p in inv.get('productos', []):
-                try:
-                    prod = next((x for x in app.products if x.get('producto') == p.get('name') or x.get('codigo') == p.get('name')), None)
-                    if prod and prod.get('cantidad_disponible') is not None:
-                        old_q = int(prod.get('cantidad_disponible'))
-                        new_q = old_q + int(p.get('qty', 0))
-                        app._log_stock_change(prod.get('codigo'), prod.get('producto'), old_q, new_q, 'devolucion_venta')
-                        prod['cantidad_disponible'] = new_q
-                except Exception:
-                    pass
-            with open(products_path, 'w', encoding='utf-8') as f:
-                json.dump(app.products, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
-        try:
-            app.paused_invoices = [i for i in app.paused_invoices if i.get('id') != inv_id]
-            if hasattr(app, 'save_paused_to_disk'):
-                app.save_paused_to_disk()
-        except Exception:
-            pass
+            database.discard_paused_invoice(inv['paused_id'], getattr(app, 'user', '') or '')
+        except Exception as e:
+            messagebox.showerror('Reiniciar', f'No se pudo reiniciar la factura: {e}')
+            return
         try:
             if hasattr(app, 'load_products'):
                 app.load_products()
@@ -300,28 +294,16 @@ def show_paused_invoices(app):
         if not inv:
             messagebox.showwarning('Eliminar', 'Por favor seleccione una factura (no una carpeta de fecha)')
             return
-        inv_id = inv.get('id')
         if not messagebox.askyesno('Eliminar', '¿Eliminar la factura pausada? Esto restaurará el stock y no se podrá recuperar.'):
             return
         try:
-            for p in inv.get('productos', []):
-                try:
-                    prod = next((x for x in app.products if x.get('producto') == p.get('name') or x.get('codigo') == p.get('name')), None)
-                    if prod and prod.get('cantidad_disponible') is not None:
-                        old_q = int(prod.get('cantidad_disponible'))
-                        new_q = old_q + int(p.get('qty', 0))
-                        app._log_stock_change(prod.get('codigo'), prod.get('producto'), old_q, new_q, 'devolucion_venta')
-                        prod['cantidad_disponible'] = new_q
-                except Exception:
-                    pass
-            with open(products_path, 'w', encoding='utf-8') as f:
-                json.dump(app.products, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+            database.discard_paused_invoice(inv['paused_id'], getattr(app, 'user', '') or '')
+        except Exception as e:
+            messagebox.showerror('Eliminar', f'No se pudo eliminar la factura: {e}')
+            return
         try:
-            app.paused_invoices = [i for i in app.paused_invoices if i.get('id') != inv_id]
-            if hasattr(app, 'save_paused_to_disk'):
-                app.save_paused_to_disk()
+            if hasattr(app, 'load_products'):
+                app.load_products()
         except Exception:
             pass
         messagebox.showinfo('Eliminada', 'Factura pausada eliminada y stock restaurado')
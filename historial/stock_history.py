@@ -1,7 +1,10 @@
 """Historial de movimientos de stock para carpeta venta."""
+import datetime
 import tkinter as tk
 from tkinter import ttk
-import os, json
+
+# movimientos por página; se piden más al acercarse al final de la lista
+PAGE_SIZE = 200
 
 
 def show_stock_history_window(app):
@@ -41,7 +44,39 @@ def show_stock_history_window(app):
         tk.Label(hdr, text='Movimientos de entrada y salida de productos.', font=('Helvetica', int(10 * _UI_SCALE)), bg=panel_bg, fg=fg_text).pack(side=tk.LEFT, padx=(12, 0))
     except Exception:
         pass
-    cols = ('fecha_hora', 'codigo', 'producto', 'cant_ant', 'cant_nueva', 'delta', 'motivo')
+    # filtros: código, motivo, usuario y rango de fechas (AAAA-MM-DD)
+    try:
+        import database
+        choices = database.get_stock_movement_choices()
+    except Exception:
+        choices = {'reason': [], 'user': []}
+    filt = tk.Frame(frm, bg=panel_bg)
+    filt.grid(row=1, column=0, sticky='ew', pady=(0, pad // 2))
+    codigo_var = tk.StringVar(value='')
+    motivo_var = tk.StringVar(value='')
+    usuario_var = tk.StringVar(value='')
+    desde_var = tk.StringVar(value='')
+    hasta_var = tk.StringVar(value='')
+
+    def _label(text):
+        try:
+            tk.Label(filt, text=text, bg=panel_bg, fg=fg_text).pack(side=tk.LEFT, padx=(0, 2))
+        except Exception:
+            pass
+
+    _label('Código:')
+    codigo_entry = ttk.Entry(filt, textvariable=codigo_var, width=12)
+    codigo_entry.pack(side=tk.LEFT, padx=(0, 8))
+    _label('Motivo:')
+    ttk.Combobox(filt, textvariable=motivo_var, values=[''] + choices.get('reason', []), width=16).pack(side=tk.LEFT, padx=(0, 8))
+    _label('Usuario:')
+    ttk.Combobox(filt, textvariable=usuario_var, values=[''] + choices.get('user', []), width=12).pack(side=tk.LEFT, padx=(0, 8))
+    _label('Desde:')
+    ttk.Entry(filt, textvariable=desde_var, width=11).pack(side=tk.LEFT, padx=(0, 8))
+    _label('Hasta:')
+    ttk.Entry(filt, textvariable=hasta_var, width=11).pack(side=tk.LEFT, padx=(0, 8))
+
+    cols = ('fecha_hora', 'codigo', 'producto', 'cant_ant', 'cant_nueva', 'delta', 'motivo', 'usuario')
     row_h = int(24 * _UI_SCALE)
     try:
         s = ttk.Style()
@@ -58,6 +93,7 @@ def show_stock_history_window(app):
     tree.heading('cant_nueva', text='Cant. nueva')
     tree.heading('delta', text='Delta')
     tree.heading('motivo', text='Motivo')
+    tree.heading('usuario', text='Usuario')
     cw = lambda x: int(x * _UI_SCALE)
     tree.column('fecha_hora', width=cw(150), anchor=tk.W)
     tree.column('codigo', width=cw(100), anchor=tk.W)
@@ -66,47 +102,90 @@ def show_stock_history_window(app):
     tree.column('cant_nueva', width=cw(72), anchor=tk.E)
     tree.column('delta', width=cw(72), anchor=tk.E)
     tree.column('motivo', width=cw(130), anchor=tk.W)
+    tree.column('usuario', width=cw(90), anchor=tk.W)
     tree_frame = tk.Frame(frm, bg=panel_bg)
-    tree_frame.grid(row=1, column=0, sticky='nsew', pady=(0, pad))
-    frm.rowconfigure(1, weight=1)
+    tree_frame.grid(row=2, column=0, sticky='nsew', pady=(0, pad))
+    frm.rowconfigure(2, weight=1)
     vsb = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
-    tree.configure(yscrollcommand=vsb.set)
     tree.grid(row=0, column=0, sticky='nsew')
     vsb.grid(row=0, column=1, sticky='ns')
     tree_frame.rowconfigure(0, weight=1)
     tree_frame.columnconfigure(0, weight=1)
-    data_dir = getattr(app, '_data_dir', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
-    stock_path = os.path.join(data_dir, 'stock_history.json')
-    history = []
-    if os.path.exists(stock_path):
-        try:
-            with open(stock_path, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-        except (OSError, json.JSONDecodeError, TypeError):
-            history = []
-    if not isinstance(history, list):
-        history = []
-    for r in reversed(history):
-        # support older keys and compute delta
-        ts = r.get('timestamp') or r.get('fecha_hora') or r.get('timestamp_iso', '')
-        codigo = r.get('codigo', '')
-        producto = (r.get('producto', '') or '')[:48] + ('...' if len(r.get('producto', '') or '') > 48 else '')
-        cant_ant = r.get('cantidad_anterior', r.get('cant_ant', ''))
-        cant_new = r.get('cantidad_nueva', r.get('cantidad_nueva', r.get('cantidad_nueva', '')))
+    status_var = tk.StringVar(value='')
+    try:
+        tk.Label(frm, textvariable=status_var, font=('Helvetica', int(10 * _UI_SCALE)), bg=panel_bg, fg=fg_text).grid(row=3, column=0, sticky='w')
+    except Exception:
+        pass
+
+    # estado de la paginación: filtros vigentes y clave (created_at, id) del último movimiento mostrado
+    state = {'filters': {}, 'last': None, 'more': True, 'shown': 0, 'pending': False}
+
+    def _filters():
+        out = {'codigo': codigo_var.get().strip(), 'reason': motivo_var.get().strip(), 'user': usuario_var.get().strip()}
+        for key, var in (('date_from', desde_var), ('date_to', hasta_var)):
+            txt = var.get().strip()
+            if txt:
+                try:
+                    txt = datetime.datetime.strptime(txt, '%Y-%m-%d').date().isoformat()
+                except ValueError:
+                    status_var.set('Use fechas con formato AAAA-MM-DD')
+                    return None
+            out[key] = txt or None
+        return out
+
+    def _load_page():
+        state['pending'] = False
+        if not state['more']:
+            return
         try:
-            # try numeric delta computation if possible
-            ca = float(r.get('cantidad_anterior', 0) or 0)
-            cn = float(r.get('cantidad_nueva', 0) or 0)
-            delta = cn - ca
+            import database
+            rows = database.get_stock_movements(before=state['last'], limit=PAGE_SIZE, **state['filters'])
         except Exception:
-            delta = r.get('delta', '')
-        # if historical record contains 'added', prefer that
-        if r.get('added') is not None:
-            delta = r.get('added')
-        tree.insert('', tk.END, values=(ts, codigo, producto, cant_ant, cant_new, delta, r.get('motivo', '')))
-    if not history:
+            rows = []
+        for r in rows:
+            producto = r.get('producto') or ''
+            producto = producto[:48] + ('...' if len(producto) > 48 else '')
+            cant_ant = '' if r.get('qty_before') is None else f"{r['qty_before']:g}"
+            cant_new = '' if r.get('qty_after') is None else f"{r['qty_after']:g}"
+            tree.insert('', tk.END, values=(r.get('created_at') or '', r.get('codigo') or '', producto, cant_ant,
+                                            cant_new, f"{r.get('delta') or 0:g}", r.get('reason') or '', r.get('user') or ''))
+        if rows:
+            state['last'] = (rows[-1]['created_at'], rows[-1]['id'])
+        state['shown'] += len(rows)
+        state['more'] = len(rows) == PAGE_SIZE
+        if not state['shown']:
+            status_var.set('Aún no hay movimientos registrados.' if not any(state['filters'].values())
+                           else 'Ningún movimiento coincide con los filtros.')
+        else:
+            status_var.set(f"{state['shown']} movimientos" + (' — desplace para ver más' if state['more'] else ''))
+
+    def _on_scroll(first, last):
+        vsb.set(first, last)
+        # cerca del final: pedir la página siguiente
         try:
-            tk.Label(frm, text='Aún no hay movimientos registrados.', font=('Helvetica', int(11 * _UI_SCALE)), bg=panel_bg, fg=fg_text).grid(row=2, column=0, pady=pad)
+            if state['more'] and not state['pending'] and float(last) >= 0.9:
+                state['pending'] = True
+                tree.after_idle(_load_page)
         except Exception:
             pass
-    ttk.Button(frm, text='Cerrar', command=win.destroy, style='TButton').grid(row=3, column=0, pady=pad)
+
+    tree.configure(yscrollcommand=_on_scroll)
+
+    def _apply(event=None):
+        filters = _filters()
+        if filters is None:
+            return
+        tree.delete(*tree.get_children())
+        state.update(filters=filters, last=None, more=True, shown=0, pending=False)
+        _load_page()
+
+    def _clear():
+        for var in (codigo_var, motivo_var, usuario_var, desde_var, hasta_var):
+            var.set('')
+        _apply()
+
+    ttk.Button(filt, text='Filtrar', command=_apply).pack(side=tk.LEFT, padx=(0, 4))
+    ttk.Button(filt, text='Limpiar', command=_clear).pack(side=tk.LEFT)
+    codigo_entry.bind('<Return>', _apply)
+    _apply()
+    ttk.Button(frm, text='Cerrar', command=win.destroy, style='TButton').grid(row=4, column=0, pady=pad)
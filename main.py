@@ -1,36 +1,41 @@
 from ventanas.login_window import LoginWindow
 import database
 try:
-    from utils.bcv_fetch import obtener_bcv
+    from utils.rate_service import get_service as get_rate_service
 except Exception:
-    obtener_bcv = None
+    get_rate_service = None
+try:
+    from utils.print_spooler import get_spooler
+except Exception:
+    get_spooler = None
 
 
 def main():
     database.init_db()
-    # On app start: if exchange mode is 'Automático', fetch BCV and set exchange_rate for selected currency
+    # La app abre con la última tasa guardada; en modo 'Automático' el servicio consulta el
+    # BCV en segundo plano (TTL, reintentos) y aplica la tasa nueva cuando llega
+    rate_service = None
+    try:
+        if get_rate_service is not None:
+            rate_service = get_rate_service()
+            rate_service.start()
+    except Exception:
+        rate_service = None
+    # cola de impresión: retoma los tickets que quedaron pendientes
+    spooler = None
     try:
-        mode = database.get_setting('exchange_mode', 'Manual')
-        if mode == 'Automático' and obtener_bcv is not None:
-            try:
-                res = obtener_bcv()
-                if res and 'error' not in res:
-                    cur = database.get_setting('currency', 'USD')
-                    key = 'dolar' if cur == 'USD' else 'euro'
-                    val = res.get(key)
-                    if val:
-                        database.set_setting('exchange_rate', str(val))
-                        try:
-                            database.update_prices_by_rate(float(val))
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+        if get_spooler is not None:
+            spooler = get_spooler()
+            spooler.start()
     except Exception:
-        pass
+        spooler = None
     app = LoginWindow()
     app.mainloop()
+    if rate_service is not None:
+        rate_service.stop(timeout=1)
+    if spooler is not None:
+        spooler.stop(timeout=1)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
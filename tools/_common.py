@@ -0,0 +1,27 @@
+"""Lo que comparten los scripts de tools/: la raíz del proyecto en sys.path, BD temporal y check()."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+
+
+def temp_db(prefix: str, name: str = 'app.db', init: bool = True) -> Path:
+    """Apunta database a `name` dentro de una carpeta temporal nueva (y la inicializa); devuelve la carpeta."""
+    tmp = Path(tempfile.mkdtemp(prefix=prefix))
+    database.DB_PATH = tmp / name
+    database.DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    if init:
+        database.init_db()
+    return tmp
+
+
+def check(label, cond):
+    print(('OK   ' if cond else 'FALLA') + ' ' + label)
+    if not cond:
+        sys.exit(1)
@@ -0,0 +1,55 @@
+"""Benchmark: reporte de cierre de 365 días desde daily_sales frente a recorrer las facturas."""
+import datetime
+import random
+import sys
+import time
+
+from _common import temp_db
+import database
+from historial.cierre_caja import compute_cierre_analytics, load_range_report, save_cierre_range_pdf
+
+PER_DAY = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+
+tmp = temp_db('bench_rango_', 'db/bench.db')
+(tmp / 'data').mkdir()
+
+random.seed(3)
+start = datetime.date(2025, 1, 1)
+t0 = time.perf_counter()
+with database.transaction():
+    for d in range(365):
+        day = start + datetime.timedelta(days=d)
+        for n in range(PER_DAY):
+            usd = random.choice([0, 0, 0, 4.0])
+            total_usd = 4.0
+            database.save_invoice({
+                'numero_factura': f"{day.strftime('%Y%m%d')}-{n}",
+                'datetime': f'{day.isoformat()} 09:{n % 60:02d}:00',
+                'total_usd': total_usd, 'total_bs': total_usd * 36.5,
+                'payments': {'usd': usd, 'efectivo_bs': 0 if usd else total_usd * 36.5, 'punto_bs': 0, 'pago_movil_bs': 0},
+            })
+print(f'{365 * PER_DAY} facturas guardadas en {time.perf_counter() - t0:.1f} s\n')
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    print(f'{label:<48} {(time.perf_counter() - t0) * 1000:9.1f} ms')
+    return out
+
+
+report = timed('365 días desde daily_sales', lambda: load_range_report('2025-01-01', '2025-12-31', 36.5))
+timed('365 días recorriendo facturas', lambda: compute_cierre_analytics(
+    database.get_invoices('2025-01-01', '2025-12-31', exclude_state='ANULADA', include_items=False), 36.5))
+month = timed('mes + comparación con el mes anterior', lambda: load_range_report('2025-03-01', '2025-03-31', 36.5, compare=True))
+print(f"\nfacturas {report['num_facturas']}, total {report['total_gral_bs']:.2f} BS, "
+      f"ticket {report['ticket_promedio_bs']:.2f} BS, mejor día {report['mejor_dia'][0]}")
+
+
+class _App:
+    _data_dir = str(tmp / 'data')
+
+
+path = timed('PDF mensual', lambda: save_cierre_range_pdf(_App(), month))
+print(path or '(reportlab no disponible)')
+database.close_conn()
@@ -0,0 +1,77 @@
+"""Benchmark: ancho de columnas del historial midiendo cada celda frente a ColumnAutoSizer."""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.column_autosizer import ColumnAutoSizer
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+PER_DAY = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+COLS = ('#0', 'Nro', 'FechaHora', 'Productos', 'Total', 'Pago')
+HEADERS = ('Fecha', 'Nro', 'Fecha/Hora', 'Productos', 'Total (BS/$)', 'Método')
+
+random.seed(7)
+NAMES = ['Harina Pan', 'Arroz', 'Café molido', 'Azúcar', 'Aceite', 'Queso blanco', 'Mantequilla', 'Pasta larga']
+rows = []
+for i in range(ROWS):
+    prods = ', '.join(f'{random.choice(NAMES)}({random.randint(1, 9)})' for _ in range(random.randint(1, 6)))
+    prods = prods if len(prods) <= 80 else prods[:77] + '...'
+    total = random.uniform(5, 9000)
+    rows.append((f'20250101_{i:06d}', f'{i + 1:08d}', f'2025-01-01 08:{i % 60:02d}:00', prods,
+                 f'{total:.2f} BS / {total / 36.5:.2f} $', random.choice(['Efectivo', 'Punto de Venta', 'Pago Móvil', 'Dólar'])))
+
+calls = [0]
+try:
+    import tkinter as tk
+    import tkinter.font as tkfont
+    root = tk.Tk()
+    root.withdraw()
+    font = tkfont.Font(family='Helvetica', size=10)
+
+    def measure(text):
+        calls[0] += 1
+        return font.measure(text)
+    mode = 'Tk'
+except Exception:
+    font = None
+    _w = {}
+
+    def measure(text):
+        calls[0] += 1
+        return sum(_w.setdefault(ch, 5 + (ord(ch) * 7) % 5) for ch in text)
+    mode = 'simulada'
+
+print(f'{ROWS} filas, medición {mode}')
+
+# antes: una medición por celda
+calls[0] = 0
+t0 = time.perf_counter()
+before = {c: measure(h) + 12 for c, h in zip(COLS, HEADERS)}
+for row in rows:
+    for c, v in zip(COLS, row):
+        w = measure(v) + 12
+        if w > before[c]:
+            before[c] = w
+dt_before, calls_before = time.perf_counter() - t0, calls[0]
+print(f'{"antes: measure por celda":<36} {dt_before * 1000:9.1f} ms  {calls_before:7d} mediciones')
+
+# ahora: muestra de los más largos + cache de glifos, filas llegando por días
+calls[0] = 0
+t0 = time.perf_counter()
+sizer = ColumnAutoSizer(font, COLS, padding=12, measure=measure)
+sizer.add_headers(HEADERS)
+for start in range(0, ROWS, PER_DAY):
+    sizer.add_rows(rows[start:start + PER_DAY])
+    after = sizer.widths()
+dt_after, calls_after = time.perf_counter() - t0, calls[0]
+print(f'{"ahora: ColumnAutoSizer (por día)":<36} {dt_after * 1000:9.1f} ms  {calls_after:7d} mediciones')
+diff = {c: after[c] - before[c] for c in COLS if after[c] != before[c]}
+print('anchos iguales' if not diff else f'diferencias (px): {diff}')
+
+# un glifo más ancho que aún no se midió no puede quedar fuera por la cota
+glyph_w = {'i': 2, 'W': 10}
+sizer = ColumnAutoSizer(None, ('a',), padding=0, sample=1, measure=lambda t: sum(glyph_w[ch] for ch in t))
+sizer.add_rows([('iii',), ('WW',)])
+print('glifo nuevo más ancho: ' + ('OK' if sizer.widths()['a'] == 20 else f"FALLA ({sizer.widths()['a']} px)"))
@@ -0,0 +1,66 @@
+"""Benchmark: latencia de los helpers de database.py con conexión por llamada frente a la persistente."""
+import sqlite3
+import sys
+import time
+
+from _common import temp_db
+import database
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+temp_db('bench_db_', 'bench.db')
+database.set_setting('exchange_rate', '36.5')
+pid = database.add_product_full(code='1', name='Producto bench', price_bs=10.0, price_usd=1.0, quantity=10 ** 9)
+
+
+# -- patrón anterior: una conexión nueva por llamada --
+def old_get_setting(key, default=None):
+    conn = sqlite3.connect(database.DB_PATH)
+    try:
+        row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    finally:
+        conn.close()
+
+
+def old_decrease(product_id, amount):
+    conn = sqlite3.connect(database.DB_PATH)
+    try:
+        cur = conn.execute("UPDATE products SET quantity = quantity - ? WHERE id = ? AND quantity >= ?", (amount, product_id, amount))
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def old_get_products():
+    conn = sqlite3.connect(database.DB_PATH)
+    try:
+        return conn.execute("SELECT id, code, name, price_bs, price_usd, quantity FROM products ORDER BY id DESC").fetchall()
+    finally:
+        conn.close()
+
+
+def bench(label, fn, n=N):
+    fn()  # calentar
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    dt = time.perf_counter() - t0
+    print(f'{label:<56} {dt / n * 1e6:9.1f} µs/llamada')
+    return dt / n
+
+
+cases = [
+    ('get_setting', lambda: old_get_setting('exchange_rate'), lambda: database.get_setting('exchange_rate')),
+    ('decrease_product_quantity', lambda: old_decrease(pid, 1), lambda: database.decrease_product_quantity(pid, 1)),
+    ('get_products', old_get_products, database.get_products),
+]
+
+print(f'BD temporal: {database.DB_PATH}  ({N} iteraciones)')
+for name, before, after in cases:
+    b = bench(f'{name} (antes: conexión por llamada)', before)
+    a = bench(f'{name} (después: conexión persistente)', after)
+    print(f'{"":<56} x{b / a if a else 0:.1f} más rápido\n')
+
+database.close_conn()
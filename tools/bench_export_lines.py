@@ -0,0 +1,54 @@
+"""Benchmark: tiempo y pico de memoria de la exportación CSV del detalle de facturas."""
+import datetime
+import random
+import sys
+import time
+import tracemalloc
+
+from _common import temp_db
+import database
+from historial.export import export_invoice_lines_csv
+
+PER_DAY = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+DAYS = int(sys.argv[2]) if len(sys.argv) > 2 else 180
+
+tmp = temp_db('bench_export_', 'bench.db')
+
+random.seed(11)
+NAMES = ['Harina Pan', 'Arroz', 'Café molido', 'Azúcar', 'Aceite', 'Queso blanco']
+start = datetime.date(2025, 1, 1)
+t0 = time.perf_counter()
+with database.transaction():
+    for d in range(DAYS):
+        day = start + datetime.timedelta(days=d)
+        for n in range(PER_DAY):
+            items = [{'id': i, 'name': random.choice(NAMES), 'quantity': random.randint(1, 5), 'price': 1.5}
+                     for i in range(random.randint(1, 8))]
+            total_usd = sum(it['quantity'] * it['price'] for it in items)
+            database.save_invoice({
+                'numero_factura': f"{day.strftime('%Y%m%d')}-{n}",
+                'datetime': f'{day.isoformat()} 09:{n % 60:02d}:00',
+                'productos': items, 'total_usd': total_usd, 'total_bs': total_usd * 36.5,
+                'payments': {'usd': 0, 'efectivo_bs': total_usd * 36.5, 'punto_bs': 0, 'pago_movil_bs': 0},
+            })
+print(f'{DAYS * PER_DAY} facturas guardadas en {time.perf_counter() - t0:.1f} s\n')
+
+
+def run(label, date_from, date_to):
+    path = tmp / 'lineas.csv'
+    t0 = time.perf_counter()
+    n = export_invoice_lines_csv(str(path), date_from, date_to)
+    dt = time.perf_counter() - t0
+    # segunda pasada solo para el pico de memoria (tracemalloc hace lenta la primera)
+    tracemalloc.start()
+    export_invoice_lines_csv(str(path), date_from, date_to)
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<24} {n:8d} líneas {dt * 1000:9.1f} ms  pico {peak / 1024:8.1f} KiB  '
+          f'{path.stat().st_size / 1024:9.1f} KiB en disco')
+
+
+end = start + datetime.timedelta(days=DAYS - 1)
+run('un mes', start.isoformat(), (start + datetime.timedelta(days=29)).isoformat())
+run(f'{DAYS} días', start.isoformat(), end.isoformat())
+database.close_conn()
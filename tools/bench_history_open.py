@@ -0,0 +1,76 @@
+"""Benchmark: disco leído al abrir el historial de facturas, con 2 días y con todos."""
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from historial import manifest
+
+DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 730
+PER_DAY = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+tmp = tempfile.mkdtemp(prefix='bench_hist_')
+
+
+def make_invoice(day, n):
+    ts = datetime.datetime.combine(day, datetime.time(8)) + datetime.timedelta(seconds=n * 7)
+    num = f"{day.strftime('%Y%m%d')}-{n}"
+    return {
+        'id': num, 'numero_factura': num,
+        'productos': [{'name': f'Producto {k}', 'qty': 1 + k % 3, 'price': 12.5 * (k + 1)} for k in range(4)],
+        'total_usd': 3.48, 'total_bs': 127.02,
+        'timestamp': ts.strftime('%Y%m%d_%H%M%S'), 'datetime': ts.strftime('%Y-%m-%d %H:%M:%S'),
+        'payments': {'punto_bs': 127.02, 'efectivo_bs': 0, 'usd': 0, 'pago_movil_bs': 0},
+    }
+
+
+def make_tree(base, days):
+    end = datetime.date(2025, 12, 31)
+    for i in range(days):
+        day = end - datetime.timedelta(days=i)
+        d = os.path.join(base, day.isoformat())
+        os.makedirs(d, exist_ok=True)
+        for n in range(1, PER_DAY + 1):
+            inv = make_invoice(day, n)
+            fname = f"{inv['id']}.json"
+            with open(os.path.join(d, fname), 'w', encoding='utf-8') as f:
+                json.dump(inv, f, ensure_ascii=False, indent=2)
+            manifest.append_invoice(d, fname, inv)
+
+
+def open_before(base):
+    n = 0
+    for entry in sorted(os.listdir(base)):
+        d = os.path.join(base, entry)
+        for fname in sorted(os.listdir(d)):
+            if manifest._is_invoice_file(fname):
+                with open(os.path.join(d, fname), 'r', encoding='utf-8') as f:
+                    json.load(f)
+                n += 1
+    return n
+
+
+def open_now(base):
+    days = manifest.list_days(base)
+    n = sum(manifest.count_day(os.path.join(base, d)) for d in days)
+    if days:
+        manifest.load_day(os.path.join(base, days[-1]))
+    return n
+
+
+def timed(label, fn, base):
+    t0 = time.perf_counter()
+    n = fn(base)
+    print(f'{label:<40} {(time.perf_counter() - t0) * 1000:9.1f} ms  ({n} facturas)')
+
+
+for days in (2, DAYS):
+    base = os.path.join(tmp, f'{days}d')
+    make_tree(base, days)
+    print(f'{days} días x {PER_DAY} facturas')
+    timed('  antes: leer todos los JSON', open_before, base)
+    timed('  ahora: carpetas + conteo + último día', open_now, base)
+    print()
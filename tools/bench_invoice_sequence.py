@@ -0,0 +1,94 @@
+"""Benchmark: números de factura repetidos con varios procesos vendiendo a la vez."""
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from _common import temp_db
+
+PROCS = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+PER_PROC = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+
+def _invoice(numero):
+    return {'numero_factura': numero, 'productos': [{'id': 1, 'name': 'Harina Pan', 'quantity': 2, 'price': 1.5}],
+            'subtotal_usd': 3.0, 'total_usd': 3.0, 'subtotal_bs': 109.56, 'total_bs': 109.56,
+            'payments': {'efectivo_bs': 109.56}}
+
+
+def legacy_worker(db_path, data_dir, n, start, out):
+    """Flujo anterior de do_print: número del JSON, factura en la BD, JSON + 1."""
+    import database
+    database.DB_PATH = Path(db_path)
+    path = os.path.join(data_dir, 'invoice_counter.json')
+    today = time.strftime('%Y%m%d')
+    start.wait()
+    got = []
+    for _ in range(n):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            nxt = int(data.get('next', 1)) if data.get('date') == today else 1
+        except (OSError, ValueError):
+            nxt = 1
+        numero = f'{today}-{nxt}'
+        database.save_invoice(_invoice(numero))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            nxt = int(data.get('next', 1)) + 1 if data.get('date') == today else 2
+        except (OSError, ValueError):
+            nxt = 2
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'date': today, 'next': nxt}, f)
+        got.append(numero)
+    out.put(got)
+
+
+def sequence_worker(db_path, data_dir, n, start, out):
+    """Flujo nuevo: número y factura en la misma transacción."""
+    import database
+    from utils.invoice_id import allocate_invoice_id
+    database.DB_PATH = Path(db_path)
+    start.wait()
+    got = []
+    for _ in range(n):
+        with database.transaction(immediate=True):
+            numero = allocate_invoice_id()
+            database.save_invoice(_invoice(numero))
+        got.append(numero)
+    out.put(got)
+
+
+def run(worker, label):
+    import database
+    tmp = temp_db('bench_invoice_seq_')
+    db_path = str(database.DB_PATH)
+    database.close_conn()
+    start = multiprocessing.Event()
+    out = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(db_path, tmp, PER_PROC, start, out)) for _ in range(PROCS)]
+    for p in procs:
+        p.start()
+    time.sleep(0.5)  # que todos hayan abierto la BD
+    t0 = time.perf_counter()
+    start.set()
+    ids = []
+    for _ in procs:
+        ids.extend(out.get())
+    dt = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    dupes = sum(c - 1 for c in Counter(ids).values() if c > 1)
+    last = max(int(i.rsplit('-', 1)[1]) for i in ids)
+    print(f'{label:<28} {len(ids):>8} {dupes:>10} {last:>10} {len(ids) / dt:>10.0f}')
+
+
+if __name__ == '__main__':
+    print(f'{PROCS} procesos x {PER_PROC} facturas')
+    print(f'{"":<28} {"facturas":>8} {"repetidos":>10} {"último N":>10} {"fact/s":>10}')
+    run(legacy_worker, 'contador JSON (antes)')
+    run(sequence_worker, 'invoice_sequence (ahora)')
@@ -0,0 +1,79 @@
+"""Benchmark: cargar facturas desde los JSON por archivo frente a la tabla invoices."""
+import datetime
+import json
+import os
+import sys
+import time
+
+from _common import temp_db
+import database
+
+PER_DAY = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+BIG_DAY = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+# BD en otro directorio para que init_db no importe sola tmp/facturas
+tmp = temp_db('bench_inv_', 'db/bench.db')
+facturas_dir = tmp / 'facturas'
+start = datetime.date(2025, 1, 1)
+big_day = datetime.date(2025, 12, 31)
+
+
+def make_invoice(day, n):
+    ts = datetime.datetime.combine(day, datetime.time(8)) + datetime.timedelta(seconds=n * 7)
+    num = f"{day.strftime('%Y%m%d')}-{n}"
+    return {
+        'id': num, 'numero_factura': num,
+        'productos': [{'name': f'Producto {k}', 'qty': 1 + k % 3, 'price': 12.5 * (k + 1)} for k in range(4)],
+        'subtotal_usd': 3.0, 'iva_amount_usd': 0.48, 'total_usd': 3.48,
+        'subtotal_bs': 109.5, 'iva_amount_bs': 17.52, 'total_bs': 127.02,
+        'file': '', 'timestamp': ts.strftime('%Y%m%d_%H%M%S'), 'datetime': ts.strftime('%Y-%m-%d %H:%M:%S'),
+        'state': 'FINALIZADA', 'global_iva_pct': 16, 'iva_enabled': True, 'paper_size': '58mm',
+        'payments': {'punto_bs': 127.02 if n % 2 else 0, 'efectivo_bs': 0 if n % 2 else 127.02, 'usd': 0,
+                     'pago_movil_bs': 0, 'pago_movil_ref': ''},
+    }
+
+
+total = 0
+day = start
+while day <= big_day:
+    d = facturas_dir / day.isoformat()
+    d.mkdir(parents=True, exist_ok=True)
+    for n in range(1, (BIG_DAY if day == big_day else PER_DAY) + 1):
+        with open(d / f"{day.strftime('%Y%m%d')}-{n}.json", 'w', encoding='utf-8') as f:
+            json.dump(make_invoice(day, n), f, ensure_ascii=False, indent=2)
+        total += 1
+    day += datetime.timedelta(days=1)
+
+t0 = time.perf_counter()
+imported = database.import_invoices_from_json(facturas_dir)
+print(f'{total} facturas JSON en {facturas_dir}')
+print(f'{"importación única":<44} {time.perf_counter() - t0:9.2f} s  ({imported} facturas)\n')
+
+
+def load_json_dir(paths):
+    out = []
+    for p in paths:
+        if not p.is_dir():
+            continue
+        for fname in os.listdir(p):
+            with open(p / fname, 'r', encoding='utf-8') as f:
+                inv = json.load(f)
+            if (inv.get('state') or '').upper() != 'ANULADA':
+                out.append(inv)
+    return out
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    n = len(fn())
+    print(f'{label:<44} {(time.perf_counter() - t0) * 1000:9.1f} ms  ({n} facturas)')
+
+
+bd = big_day.isoformat()
+timed(f'cierre {bd}: JSON por archivo', lambda: load_json_dir([facturas_dir / bd]))
+timed(f'cierre {bd}: get_invoices', lambda: database.get_invoices(bd, bd, exclude_state='ANULADA', include_items=False))
+timed('año completo: JSON por archivo', lambda: load_json_dir(sorted(facturas_dir.iterdir())))
+timed('año completo: get_invoices (con líneas)', lambda: database.get_invoices('2025-01-01', '2025-12-31'))
+timed('año completo: get_invoices (sin líneas)', lambda: database.get_invoices('2025-01-01', '2025-12-31', include_items=False))
+
+database.close_conn()
@@ -0,0 +1,100 @@
+"""Benchmark y comprobaciones de stock de las facturas en pausa."""
+import json
+import sys
+import time
+
+from _common import check, temp_db
+import database
+
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+tmp = temp_db('bench_paused_')
+pids = [database.add_product_full(str(n), f'Producto {n}', 36.5, 1.0, 10 ** 6) for n in range(1, 21)]
+
+
+def cart(n_lines=8):
+    return {'id': '20250113-1', 'timestamp': '20250113_103000', 'datetime': '2025-01-13 10:30:00',
+            'productos': [{'id': pids[i], 'name': f'Producto {i + 1}', 'price': 36.5, 'quantity': 2,
+                           'subtotal': 73.0, 'vat': 0.0} for i in range(n_lines)],
+            'subtotal_bs': 73.0 * n_lines, 'iva_amount_bs': 0.0, 'total_bs': 73.0 * n_lines, 'state': 'PAUSADA'}
+
+
+def legacy_pause_resume(registry, path):
+    """Flujo anterior: agregar a la lista y reescribir paused.json; quitarla y reescribirlo."""
+    registry.append(cart())
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, ensure_ascii=False, indent=2)
+    registry.pop()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, ensure_ascii=False, indent=2)
+
+
+def new_pause_resume():
+    database.resume_paused_invoice(database.pause_invoice(cart()))
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(*args)
+    return (time.perf_counter() - t0) / REPEAT * 1000
+
+
+print(f'{"":<26} {"paused.json (ms)":>17} {"tablas (ms)":>12}')
+for existing in (5, 500):
+    registry = [cart() for _ in range(existing)]
+    while len(database.get_paused_invoices()) < existing:
+        database.pause_invoice(cart())
+    t_old = timed(legacy_pause_resume, registry, tmp / 'paused.json')
+    t_new = timed(new_pause_resume)
+    print(f'{f"pausar+retomar, {existing} en pausa":<26} {t_old:17.2f} {t_new:12.2f}')
+    for inv in database.get_paused_invoices():
+        database.resume_paused_invoice(inv['paused_id'])
+print()
+
+# stock: el carrito reservó, la pausa conserva la reserva
+inv = cart(3)
+check('reserva del carrito', database.reserve_items([(p['id'], p['quantity']) for p in inv['productos']]) == [])
+stock = lambda: {pid: row[5] for pid, row in database.get_products_by_ids(pids[:3]).items()}
+reserved = stock()
+paused_id = database.pause_invoice(inv)
+resumed = database.resume_paused_invoice(paused_id)
+check('retomar devuelve las líneas por id y no toca el stock',
+      [p['id'] for p in resumed['productos']] == pids[:3] and stock() == reserved)
+check('retomar dos veces la misma factura devuelve None', database.resume_paused_invoice(paused_id) is None)
+
+# eliminar: devuelve el stock y lo registra, en una transacción
+paused_id = database.pause_invoice(inv)
+database.discard_paused_invoice(paused_id, 'cajero')
+check('eliminar devuelve el stock reservado', all(stock()[pid] == reserved[pid] + 2 for pid in pids[:3]))
+moves = database.get_stock_movements(product_id=pids[0], limit=1)
+check('y registra la devolución en el libro de stock',
+      moves and moves[0]['reason'] == 'devolucion_venta' and moves[0]['delta'] == 2 and moves[0]['user'] == 'cajero')
+check('ya no está en pausa', database.get_paused_invoice(paused_id) is None)
+
+# paused.json heredado: líneas sin id se asocian por nombre
+legacy = [{'id': '20250110-4', 'timestamp': '20250110_090000', 'total_bs': 73.0,
+           'productos': [{'name': 'Producto 5', 'qty': 2, 'price': 36.5}]}]
+(tmp / 'legacy.json').write_text(json.dumps(legacy), encoding='utf-8')
+check('importa paused.json', database.import_paused_json(tmp / 'legacy.json') == 1)
+imported = database.get_paused_invoices()[-1]
+check('la línea sin id queda con el id del producto', imported['productos'][0]['id'] == pids[4]
+      and imported['id'] == '20250110-4' and imported['timestamp'] == '20250110_090000')
+
+# el paused.json heredado no reservaba: importar reserva y eliminar deja el stock como estaba
+scarce = database.add_product_full('999', 'Producto escaso', 36.5, 1.0, 1)
+legacy = [{'id': '20250110-5', 'timestamp': '20250110_091500', 'total_bs': 146.0,
+           'productos': [{'name': 'Producto 6', 'qty': 2, 'price': 36.5},
+                         {'id': scarce, 'name': 'Producto escaso', 'qty': 3, 'price': 36.5}]}]
+(tmp / 'legacy.json').write_text(json.dumps(legacy), encoding='utf-8')
+on_shelf = {pid: row[5] for pid, row in database.get_products_by_ids([pids[5], scarce]).items()}
+database.import_paused_json(tmp / 'legacy.json')
+imported = database.get_paused_invoices()[-1]
+after_import = {pid: row[5] for pid, row in database.get_products_by_ids([pids[5], scarce]).items()}
+check('importar reserva el stock de sus líneas', after_import[pids[5]] == on_shelf[pids[5]] - 2)
+check('sin stock suficiente la línea queda sin id y sin reservar',
+      imported['productos'][1]['id'] is None and after_import[scarce] == on_shelf[scarce])
+database.discard_paused_invoice(imported['paused_id'], 'cajero')
+check('importar y eliminar deja el stock igual',
+      {pid: row[5] for pid, row in database.get_products_by_ids([pids[5], scarce]).items()} == on_shelf)
+database.close_conn()
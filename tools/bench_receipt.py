@@ -0,0 +1,106 @@
+"""Benchmark: armar el ticket con el código anterior de do_print frente a receipt_renderer (mismo texto)."""
+import datetime
+import random
+import sys
+import time
+
+from _common import temp_db
+import database
+from utils.receipt_renderer import get_renderer
+
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+temp_db('bench_ticket_', 'bench.db')
+database.set_setting('shop_rif', 'J-40123456-7')
+database.set_setting('vat_enabled', '1')
+database.set_setting('vat_percent', '16')
+
+RATE = 36.52
+SHOP = 'MI COMERCIO C.A.'
+WHEN = datetime.datetime(2025, 1, 13, 10, 30)
+random.seed(5)
+NAMES = ['Harina Pan', 'Arroz Mary', 'Café molido 500g', 'Azúcar', 'Aceite Vatel 1L', 'Queso blanco duro']
+
+
+def cart(n):
+    # mezcla de precios en BS y en USD, como el carrito
+    return [{'id': i, 'name': random.choice(NAMES), 'quantity': random.randint(1, 4),
+             'price': random.choice([round(random.uniform(1, 9), 2), round(random.uniform(40, 300), 2)])}
+            for i in range(n)]
+
+
+def legacy(selected, rate, paper_size, client_name):
+    """Armado anterior de do_print (misma lógica), con los datos de hora/cliente fijos."""
+    rif = str(database.get_setting('shop_rif', 'J-12345678-9') or 'J-12345678-9')
+    iva_enabled = str(database.get_setting('vat_enabled', '0')) == '1'
+    vat_pct = float(database.get_setting('vat_percent', '16') or 16.0)
+
+    def unit(it):
+        p = float(it.get('price') or 0.0)
+        return p / rate if rate and p > rate * 0.1 else p
+    if '58' in paper_size:
+        W = 32
+        lines = [f"{SHOP:^{W}}", f"{'RIF: ' + rif:^{W}}", '-' * W, f"CLI: {client_name[:25]}",
+                 f"FECHA: {WHEN.strftime('%d/%m/%y %H:%M')}", '-' * W, f"{'CN':<3}{'PRODUCTO':<9}{'$':>7}{'Bs':>13}", '-' * W]
+        sub_usd = 0.0
+        for it in selected:
+            qty = int(it.get('quantity') or 1)
+            t_usd = round(unit(it) * qty, 2)
+            sub_usd += t_usd
+            lines.append(f"{qty:<3}{it['name'][:8]:<9}{t_usd:>7.2f}{round(t_usd * rate, 2):>13.2f}")
+        imp_usd = round(sub_usd * (vat_pct / 100.0), 2) if iva_enabled else 0.0
+        total_usd = round(sub_usd + imp_usd, 2)
+        lines += ['-' * W, f"SUBTOTAL: {sub_usd:>8.2f}$ | {sub_usd * rate:>9.2f}B",
+                  f"IVA {int(vat_pct)}%:  {imp_usd:>8.2f}$ | {imp_usd * rate:>9.2f}B", '-' * W,
+                  f"{'TOTAL USD:':<15} {total_usd:>15.2f} $", f"{'TOTAL BS:':<15} {total_usd * rate:>15.2f} Bs",
+                  '-' * W, f"{'¡GRACIAS POR SU COMPRA!':^{W}}"]
+        return '\n'.join(lines)
+    lines = ['\n' + '=' * 45, f"{SHOP:^45}", f"{'RIF: ' + rif:^45}", '-' * 45,
+             f"Fecha: {WHEN.strftime('%d/%m/%Y %H:%M')}", f"Cliente: {client_name}",
+             f"Tasa del día: {rate:,.2f} BS/USD", '-' * 45, f"{'Cant':<5}{'Descripción':<18}{'USD':>10}{'BS':>12}", '-' * 45]
+    subtotal_usd = 0.0
+    for it in selected:
+        qty = int(it.get('quantity') or 1)
+        p_usd = round(unit(it) * qty, 2)
+        subtotal_usd += p_usd
+        lines.append(f"{qty:<5}{it['name'][:18]:<18}{p_usd:>10,.2f}{round(p_usd * rate, 2):>12,.2f}")
+    impuesto_usd = round(subtotal_usd * (vat_pct / 100.0), 2) if iva_enabled else 0.0
+    total = round(subtotal_usd + impuesto_usd, 2)
+    lines += ['-' * 45,
+              f"{'SUBTOTAL:':>23} {subtotal_usd:>10,.2f} USD | {round(subtotal_usd * rate, 2):>10,.2f} BS",
+              f"{'IVA (' + str(int(vat_pct)) + '%):':>23} {impuesto_usd:>10,.2f} USD | {round(impuesto_usd * rate, 2):>10,.2f} BS",
+              f"{'TOTAL A PAGAR:':>23} {total:>10,.2f} USD | {round(total * rate, 2):>10,.2f} BS",
+              '-' * 45, f"{'GRACIAS POR SU COMPRA':^45}", '=' * 45 + '\n']
+    return '\n'.join(lines)
+
+
+renderer = get_renderer()
+
+
+def new(selected, rate, paper_size, client_name):
+    model = renderer.model(selected, rate, client_name=client_name, when=WHEN)
+    return renderer.render(model, paper_size, SHOP)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        out = fn(*args)
+    return (time.perf_counter() - t0) / REPEAT * 1e6, out
+
+
+print(f'{"":<22} {"antes (µs)":>12} {"ahora (µs)":>12}  texto')
+for n in (3, 500):
+    items = cart(n)
+    for paper in ('58mm', '80mm'):
+        t_old, text_old = timed(legacy, items, RATE, paper, 'Ana Pérez')
+        t_new, data = timed(new, items, RATE, paper, 'Ana Pérez')
+        same = data.decode('utf-8') == text_old
+        print(f'{f"{n} líneas, {paper}":<22} {t_old:12.1f} {t_new:12.1f}  {"igual" if same else "DISTINTO"}')
+
+# cambiar un ajuste recompila el layout
+before = new(cart(3), RATE, '58mm', 'Ana')
+database.set_setting('shop_rif', 'J-99999999-9')
+after = new(cart(3), RATE, '58mm', 'Ana')
+print('\nlayout recompilado al cambiar shop_rif:', b'J-99999999-9' in after and b'J-99999999-9' not in before)
+database.close_conn()
@@ -0,0 +1,51 @@
+"""Benchmark: latencia de escaneo (código -> producto -> reserva de stock)."""
+import sys
+import time
+
+from _common import temp_db
+import database
+from utils.product_index import ProductIndex, parse_scan
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+temp_db('bench_scan_', 'bench.db')
+with database.transaction() as conn:
+    conn.executemany(
+        "INSERT INTO products (code, name, price_bs, price_usd, quantity) VALUES (?, ?, ?, ?, ?)",
+        ((str(i), f'Producto {i}', 1.0, 0.1, 10 ** 6) for i in range(1, N + 1)),
+    )
+
+t0 = time.perf_counter()
+index = ProductIndex().attach()
+print(f'BD temporal: {database.DB_PATH}  ({N} productos)')
+print(f'{"construcción del índice":<40} {(time.perf_counter() - t0) * 1000:9.1f} ms')
+
+codes = [str(i).zfill(4) for i in range(1, N + 1, max(1, N // 500))]
+
+
+def old_lookup(code):
+    for row in database.get_products():
+        display = str(row[1]).zfill(4) if str(row[1]).isdigit() else str(row[1])
+        if display == code:
+            return row
+
+
+t0 = time.perf_counter()
+for c in codes[:20]:
+    old_lookup(c)
+print(f'{"filtrar catálogo en Python":<40} {(time.perf_counter() - t0) / 20 * 1e6:9.1f} µs/código')
+
+t0 = time.perf_counter()
+for c in codes:
+    index.lookup(c)
+print(f'{"ProductIndex.lookup":<40} {(time.perf_counter() - t0) / len(codes) * 1e6:9.1f} µs/código')
+
+t0 = time.perf_counter()
+for c in codes:
+    qty, code = parse_scan('3*' + c)
+    row = index.lookup(code)
+    database.decrease_product_quantity(row[0], qty)
+print(f'{"escaneo completo (lookup + reserva)":<40} {(time.perf_counter() - t0) / len(codes) * 1e6:9.1f} µs/código')
+
+index.detach()
+database.close_conn()
@@ -0,0 +1,49 @@
+"""Benchmark: filtrado del inventario en Python frente a search_products (FTS5)."""
+import re
+import sys
+import time
+import unicodedata
+
+from _common import temp_db
+import database
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+WORDS = ['Café', 'Azúcar', 'Harina', 'Arroz', 'Aceite', 'Jabón', 'Atún', 'Leche', 'Pasta', 'Galletas']
+
+temp_db('bench_search_', 'bench.db')
+with database.transaction() as conn:
+    conn.executemany(
+        "INSERT INTO products (code, name, price_bs, price_usd, quantity) VALUES (?, ?, ?, ?, ?)",
+        ((str(i), f'{WORDS[i % len(WORDS)]} {i % 113} presentación {i}', 1.0, 0.1, 5) for i in range(1, N + 1)),
+    )
+
+
+def normalize_text(s):
+    s = unicodedata.normalize('NFD', str(s or ''))
+    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+    return re.sub(r'[^\w\s]', '', s).lower()
+
+
+def old_filter(q):
+    nq = normalize_text(q)
+    out = []
+    for pid, code, name, *_ in database.get_products():
+        display_code = str(code).zfill(4) if str(code).isdigit() else str(code or pid)
+        if nq in normalize_text(display_code) or nq in normalize_text(name):
+            out.append(pid)
+    return out
+
+
+print(f'BD temporal: {database.DB_PATH}  ({N} productos)')
+for q in ('a', 'cafe', 'cafe 7', 'jabon 112 present', '4999', 'zzz'):
+    t0 = time.perf_counter()
+    old_filter(q)
+    old_dt = time.perf_counter() - t0
+    reps = 20
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        rows = database.search_products(q)
+    new_dt = (time.perf_counter() - t0) / reps
+    print(f'{q!r:<22} {len(rows):>6} filas   antes {old_dt * 1000:8.1f} ms   FTS {new_dt * 1000:8.2f} ms')
+
+database.close_conn()
@@ -0,0 +1,103 @@
+"""Benchmark: init_db y búsquedas por código, nombre y cédula antes y después de las migraciones."""
+import sqlite3
+import sys
+import time
+
+from _common import temp_db
+import database
+
+N_PRODUCTS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+N_CLIENTS = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+temp_db('bench_startup_', 'bench.db', init=False)    # init_db se mide más abajo
+db_path = database.DB_PATH
+
+# -- BD con el esquema previo a las migraciones --
+conn = sqlite3.connect(db_path)
+conn.executescript(
+    """
+    CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL, role TEXT NOT NULL DEFAULT 'employee', nombre TEXT DEFAULT '',
+        apellido TEXT DEFAULT '', cedula TEXT DEFAULT '', telefono TEXT DEFAULT '');
+    CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, code TEXT DEFAULT '', name TEXT NOT NULL,
+        price_bs REAL NOT NULL DEFAULT 0, price_usd REAL NOT NULL DEFAULT 0, quantity INTEGER NOT NULL DEFAULT 0);
+    CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, apellido TEXT NOT NULL,
+        cedula TEXT NOT NULL UNIQUE, telefono TEXT);
+    CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT);
+    """
+)
+conn.executemany(
+    "INSERT INTO products (code, name, price_bs, price_usd, quantity) VALUES (?, ?, ?, ?, ?)",
+    ((str(i), f'Producto {i:06d} marca {i % 97}', i * 0.5, i * 0.01, i % 50) for i in range(1, N_PRODUCTS + 1)),
+)
+conn.executemany(
+    "INSERT INTO clients (nombre, apellido, cedula, telefono) VALUES (?, ?, ?, ?)",
+    ((f'Nombre{i % 500}', f'Apellido{i % 3000}', f'V{10000000 + i}', '0414-0000000') for i in range(1, N_CLIENTS + 1)),
+)
+conn.commit()
+
+LOOKUPS = [
+    ('productos por código', "SELECT id FROM products WHERE code = ?", (str(N_PRODUCTS // 2),)),
+    ('productos por nombre (prefijo)', "SELECT id FROM products WHERE name LIKE ?", ('producto 0250%',)),
+    ('clientes por cédula', "SELECT id FROM clients WHERE cedula = ?", (f'V{10000000 + N_CLIENTS // 2}',)),
+    ('clientes por apellido, nombre', "SELECT id FROM clients WHERE apellido = ? AND nombre = ?", ('Apellido42', 'Nombre42')),
+]
+
+
+def time_lookups(c, reps=50):
+    out = {}
+    for label, sql, args in LOOKUPS:
+        c.execute(sql, args).fetchall()
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            c.execute(sql, args).fetchall()
+        out[label] = (time.perf_counter() - t0) / reps
+    return out
+
+
+def legacy_init(c):
+    """Réplica de lo que hacía init_db antes en cada arranque."""
+    for ddl in (
+        "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS clients (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, apellido TEXT NOT NULL, cedula TEXT NOT NULL UNIQUE, telefono TEXT)",
+    ):
+        c.execute(ddl)
+    c.commit()
+    c.execute("PRAGMA table_info(users)").fetchall()
+    c.execute("UPDATE users SET role = 'admin' WHERE username = 'admin'")
+    c.commit()
+    c.execute("SELECT * FROM users WHERE username = 'admin'").fetchone()
+    c.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+    c.commit()
+
+
+print(f'BD temporal: {db_path}  ({N_PRODUCTS} productos, {N_CLIENTS} clientes)')
+before = time_lookups(conn)
+t0 = time.perf_counter()
+legacy_init(conn)
+legacy_dt = time.perf_counter() - t0
+conn.close()
+
+t0 = time.perf_counter()
+database.init_db()
+first_dt = time.perf_counter() - t0
+
+runs = []
+for _ in range(20):
+    database.close_conn()
+    t0 = time.perf_counter()
+    database.init_db()
+    runs.append(time.perf_counter() - t0)
+database.close_conn()
+
+print(f'{"init_db anterior (por arranque)":<44} {legacy_dt * 1000:9.2f} ms')
+print(f'{"init_db primera vez (migraciones v0 -> v%d)" % database.SCHEMA_VERSION:<44} {first_dt * 1000:9.2f} ms')
+print(f'{"init_db con esquema al día (mediana)":<44} {sorted(runs)[len(runs) // 2] * 1000:9.2f} ms\n')
+
+conn = sqlite3.connect(db_path)
+after = time_lookups(conn)
+conn.close()
+for label, _, _ in LOOKUPS:
+    b, a = before[label], after[label]
+    print(f'{label:<44} {b * 1e6:10.1f} µs -> {a * 1e6:8.1f} µs  (x{b / a if a else 0:.0f})')
@@ -0,0 +1,57 @@
+"""Benchmark: registrar un movimiento de stock reescribiendo stock_history.json frente a un INSERT."""
+import datetime
+import json
+import sys
+import time
+
+from _common import temp_db
+import database
+
+PREVIOUS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+MEASURE = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+tmp = temp_db('bench_stock_', 'bench.db', init=False)
+database.migrate()
+
+
+def record(i):
+    return {'timestamp': f'2025-01-01T00:00:{i % 60:02d}Z', 'codigo': f'P{i % 500}', 'producto': f'Producto {i % 500}',
+            'cantidad_anterior': 10, 'cantidad_nueva': 12, 'motivo': 'agregado', 'usuario': 'admin'}
+
+
+json_path = tmp / 'stock_history.json'
+with open(json_path, 'w', encoding='utf-8') as f:
+    json.dump([record(i) for i in range(PREVIOUS)], f, ensure_ascii=False, indent=2)
+t0 = time.perf_counter()
+database.import_stock_history_json(json_path)
+print(f'{PREVIOUS} movimientos previos importados en {time.perf_counter() - t0:.2f} s\n')
+
+
+def old_append(rec):
+    with open(json_path, 'r', encoding='utf-8') as f:
+        arr = json.load(f) or []
+    arr.append(rec)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(arr, f, ensure_ascii=False, indent=2)
+
+
+t0 = time.perf_counter()
+for i in range(MEASURE):
+    old_append(record(i))
+old = (time.perf_counter() - t0) / MEASURE
+t0 = time.perf_counter()
+for i in range(MEASURE):
+    database.log_stock_movement(None, None, 'agregado', 'admin', f'P{i}', f'Producto {i}', 10, 12,
+                                created_at=datetime.datetime(2025, 1, 2).isoformat() + 'Z')
+new = (time.perf_counter() - t0) / MEASURE
+print(f'{"antes: reescribir stock_history.json":<40} {old * 1000:8.2f} ms por movimiento')
+print(f'{"ahora: INSERT en stock_movements":<40} {new * 1000:8.2f} ms por movimiento')
+
+# los filtros Desde/Hasta son días locales; created_at está en UTC
+evening = datetime.datetime(2025, 3, 5, 21, 30).astimezone(datetime.timezone.utc).replace(tzinfo=None)
+mid_id = database.log_stock_movement(None, 1, 'ajuste', 'admin', 'NOCHE', 'Noche', 0, 1,
+                                     created_at=evening.isoformat() + 'Z')
+day = [m['id'] for m in database.get_stock_movements('2025-03-05', '2025-03-05', codigo='NOCHE')]
+next_day = database.get_stock_movements('2025-03-06', '2025-03-06', codigo='NOCHE')
+print('movimiento de las 21:30 en su día local: ' + ('OK' if day == [mid_id] and not next_day else 'FALLA'))
+database.close_conn()
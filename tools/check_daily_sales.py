@@ -0,0 +1,35 @@
+"""Verifica daily_sales contra las facturas (--fix corrige las diferencias)."""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Verificar daily_sales contra las facturas')
+    parser.add_argument('desde', nargs='?', help='YYYY-MM-DD')
+    parser.add_argument('hasta', nargs='?', help='YYYY-MM-DD (por defecto, igual a desde)')
+    parser.add_argument('--fix', action='store_true', help='reescribir los días con diferencias')
+    parser.add_argument('--db', help='ruta de la BD (por defecto data/app.db)')
+    args = parser.parse_args(argv)
+    if args.db:
+        database.DB_PATH = Path(args.db)
+    database.migrate()
+    hasta = args.hasta or args.desde
+    drift = database.verify_daily_sales(args.desde, hasta, fix=args.fix)
+    if not drift:
+        print('Sin diferencias.')
+        return 0
+    print(f"{'fecha':<12} {'campo':<24} {'guardado':>14} {'calculado':>14}")
+    for fecha, campo, guardado, calculado in drift:
+        print(f'{fecha:<12} {campo:<24} {guardado:>14.2f} {calculado:>14.2f}')
+    dias = len({d[0] for d in drift})
+    print(f"{len(drift)} diferencias en {dias} día(s){' — corregidas' if args.fix else ''}.")
+    return 0 if args.fix else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
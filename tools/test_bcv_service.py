@@ -0,0 +1,104 @@
+"""Prueba de utils/rate_service.py contra un servidor HTTP local con el marcado del BCV."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _common import check, temp_db
+import database
+from utils.bcv_fetch import parse_bcv_html
+from utils.rate_service import RateService, apply_rates
+
+FIXTURE = """<html><body>
+<div id="euro" class="col-sm-12"><div class="field-content"><strong> 39,81450000 </strong></div></div>
+<div id="dolar" class="col-sm-12"><div class="field-content"><strong> 36,52170000 </strong></div></div>
+<div class="pull-right dinpro center">Fecha Valor: <span class="date-display-single">Lunes, 13 Enero 2025</span></div>
+</body></html>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive: permite ver si la Session reutiliza la conexión
+    fail_next = 0
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(self.client_address)
+        if type(self).fail_next > 0:
+            type(self).fail_next -= 1
+            status, body = 503, b'no disponible'
+        else:
+            status, body = 200, FIXTURE.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+temp_db('test_bcv_')
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+# parseo del HTML
+rates = parse_bcv_html(FIXTURE)
+check('parse_bcv_html lee dólar, euro y fecha',
+      rates['dolar'] == 36.5217 and rates['euro'] == 39.8145 and rates['fecha'] == 'Lunes, 13 Enero 2025')
+check('parse_bcv_html sin tasas devuelve None', parse_bcv_html('<html></html>')['dolar'] is None)
+
+# reintentos: dos 503 y luego 200
+service = RateService(url=url, ttl=60, retries=3, backoff=0.05)
+_Handler.fail_next = 2
+t0 = time.perf_counter()
+rates = service.refresh()
+dt = time.perf_counter() - t0
+check('refresh reintenta tras 503 y obtiene la tasa', rates.get('dolar') == 36.5217 and len(_Handler.requests) == 3)
+check('espera exponencial entre intentos (0.05 + 0.1 s)', dt >= 0.15)
+
+# TTL: sin nueva consulta mientras está vigente, también para otra instancia (settings)
+refreshed = service.refresh()
+check('dentro del TTL no consulta de nuevo', len(_Handler.requests) == 3 and refreshed['dolar'] == 36.5217)
+check('otra instancia usa la consulta guardada en settings', RateService(url=url, ttl=60).is_fresh())
+check('con TTL vencido ya no está vigente', not RateService(url=url, ttl=0).is_fresh())
+
+# force consulta y reutiliza la conexión de la Session
+service.refresh(force=True)
+check('force vuelve a consultar', len(_Handler.requests) == 4)
+check('la Session reutiliza la conexión', _Handler.requests[-1] == _Handler.requests[-2])
+
+# todos los intentos fallan: error sin excepción y se conserva la última tasa buena
+_Handler.fail_next = 10
+failed = RateService(url=url, ttl=60, retries=1, backoff=0.01).refresh(force=True)
+check('si fallan todos los intentos devuelve error', 'error' in failed)
+check('la última consulta buena se conserva', RateService(url=url, ttl=60).cached()['dolar'] == 36.5217)
+_Handler.fail_next = 0
+
+# aplicar la tasa según la moneda
+database.set_setting('currency', 'EUR')
+check('apply_rates guarda la tasa de la moneda', apply_rates(rates) == 39.8145
+      and database.get_setting('exchange_rate') == '39.8145')
+database.set_setting('currency', 'USD')
+
+# hilo de refresco en modo Automático: aplica y avisa
+database.set_setting('exchange_mode', 'Automático')
+database.set_setting('exchange_rate', '1.0')
+landed = threading.Event()
+background = RateService(url=url, ttl=0.5, retries=0)
+check('la última tasa está disponible al instante', background.last_rate() == 1.0)
+token = background.subscribe(lambda r: landed.set())
+background.start()
+check('el hilo avisa cuando llega una tasa nueva', landed.wait(5))
+time.sleep(0.1)
+check('el hilo aplica la tasa en settings', database.get_setting('exchange_rate') == '36.5217')
+t0 = time.perf_counter()
+background.stop(timeout=5)
+check('stop() detiene el hilo enseguida', time.perf_counter() - t0 < 1)
+background.unsubscribe(token)
+
+server.shutdown()
+database.close_conn()
+print('\nTodo OK')
@@ -0,0 +1,121 @@
+"""Prueba de utils/print_spooler.py con la impresora virtual."""
+import os
+import time
+
+from _common import check, temp_db
+import database
+from utils.print_spooler import ESC_INIT, DirectoryBackend, PrintSpooler, make_backend
+
+tmp = temp_db('test_spooler_')
+virtual = tmp / 'virtual'
+printer = f'virtual:{virtual}'
+
+
+class SlowBackend(DirectoryBackend):
+    """Impresora lenta: tarda `delay` s por ticket."""
+    delay = 0.3
+
+    def send(self, data, job=None):
+        time.sleep(self.delay)
+        super().send(data, job)
+
+
+class FlakyBackend(DirectoryBackend):
+    """Falla las primeras `failures` veces (impresora sin papel / apagada)."""
+    failures = 2
+    calls = []
+
+    def send(self, data, job=None):
+        type(self).calls.append(time.time())
+        if len(type(self).calls) <= type(self).failures:
+            raise OSError('impresora sin respuesta')
+        super().send(data, job)
+
+
+def factory_for(cls):
+    return lambda spec: cls(spec.partition(':')[2])
+
+
+# envío sin bloquear y en orden, con una impresora lenta
+events = []
+spooler = PrintSpooler(backend_factory=factory_for(SlowBackend))
+spooler.subscribe(lambda job: events.append((job['id'], job['status'])))
+spooler.start()
+t0 = time.perf_counter()
+ids = [spooler.submit_text(f'Ticket {n}\nTotal: {n}.00 Bs', printer, f'20250101-{n}') for n in range(1, 4)]
+submit_ms = (time.perf_counter() - t0) * 1000
+check(f'submit no espera a la impresora ({submit_ms:.1f} ms para 3 tickets de {SlowBackend.delay} s)', submit_ms < 150)
+check('la cola termina', spooler.wait_idle(timeout=5))
+files = sorted(os.listdir(virtual))
+check('un archivo por ticket, en orden', [f.split('_')[0] for f in files] == [f'{i:08d}' for i in ids])
+check('contenido del ticket', (virtual / files[0]).read_bytes() == 'Ticket 1\nTotal: 1.00 Bs'.encode('utf-8'))
+check('avisos pendiente -> imprimiendo -> impreso', [s for i, s in events if i == ids[0]] == ['pendiente', 'imprimiendo', 'impreso'])
+spooler.stop(timeout=2)
+
+# reintentos con espera exponencial
+FlakyBackend.calls = []
+spooler = PrintSpooler(retries=3, backoff=0.1, backend_factory=factory_for(FlakyBackend))
+spooler.start()
+job_id = spooler.submit_text('Ticket con reintentos', printer, '20250101-9')
+check('reintenta hasta imprimir', spooler.wait_idle(timeout=5))
+job = database.get_print_job(job_id)
+check('impreso al tercer intento', job['status'] == 'impreso' and job['attempts'] == 3 and len(FlakyBackend.calls) == 3)
+gaps = [b - a for a, b in zip(FlakyBackend.calls, FlakyBackend.calls[1:])]
+check(f'espera creciente entre intentos ({gaps[0]:.2f} s, {gaps[1]:.2f} s)', gaps[0] >= 0.09 and gaps[1] >= 0.19)
+
+# agota los reintentos: queda en error y se puede reintentar a mano
+FlakyBackend.calls = []
+FlakyBackend.failures = 100
+job_id = spooler.submit_text('Ticket sin impresora', printer, '20250101-10')
+check('agota los reintentos', spooler.wait_idle(timeout=5))
+job = database.get_print_job(job_id)
+check("queda en 'error' con el motivo", job['status'] == 'error' and 'sin respuesta' in job['last_error'])
+FlakyBackend.failures = 0
+spooler.retry(job_id)
+check('retry() lo imprime', spooler.wait_idle(timeout=5) and database.get_print_job(job_id)['status'] == 'impreso')
+spooler.stop(timeout=2)
+
+# caída a mitad de impresión: el trabajo vuelve a la cola al arrancar
+job_id = database.enqueue_print_job(b'Ticket tras caida', printer, '20250101-11')
+database.claim_print_job(time.time())
+check("quedó 'imprimiendo'", database.get_print_job(job_id)['status'] == 'imprimiendo')
+spooler = PrintSpooler()
+spooler.start()
+check('al arrancar se imprime lo pendiente', spooler.wait_idle(timeout=5)
+      and database.get_print_job(job_id)['status'] == 'impreso')
+
+# reimpresión: mismos bytes que el original
+new_id = spooler.reprint('20250101-2')
+spooler.wait_idle(timeout=5)
+check('reprint envía los mismos bytes',
+      database.get_print_job(new_id, with_payload=True)['payload'] == database.get_print_job(ids[1], with_payload=True)['payload'])
+check('reprint sin trabajo previo devuelve None', spooler.reprint('no-existe') is None)
+
+# destino ESC/POS a un archivo (como un dispositivo /dev/usb/lp0)
+device = tmp / 'lp0'
+job_id = spooler.submit_text('Café ¡Gracias!', f'escpos:{device}', '20250101-12')
+spooler.wait_idle(timeout=5)
+raw = device.read_bytes()
+check('ESC/POS: init, texto en cp437 y corte', raw.startswith(ESC_INIT) and 'Café ¡Gracias!'.encode('cp437') in raw
+      and raw.endswith(b'\x1dV\x01'))
+check('destino sin tipo = impresora de Windows', make_backend('EPSON TM-T20').kind == 'windows')
+
+# dentro de una transacción: sin aviso hasta el COMMIT, y nada si se revierte
+events = []
+token = spooler.subscribe(lambda job: events.append((job['id'], job['status'])))
+try:
+    with database.transaction(immediate=True):
+        rolled_back = spooler.submit_text('Ticket revertido', printer, '20250101-13')
+        raise RuntimeError('falla al guardar la factura')
+except RuntimeError:
+    pass
+check('revertido: sin aviso ni trabajo', not events and database.get_print_job(rolled_back) is None)
+with database.transaction(immediate=True):
+    job_id = spooler.submit_text('Ticket confirmado', printer, '20250101-14')
+    check('sin aviso antes del COMMIT', not events)
+check('aviso tras el COMMIT', (job_id, 'pendiente') in events)
+check('y se imprime', spooler.wait_idle(timeout=5) and database.get_print_job(job_id)['status'] == 'impreso')
+spooler.unsubscribe(token)
+spooler.stop(timeout=2)
+database.close_conn()
+print('\nTodo OK')
@@ -0,0 +1,95 @@
+"""Prueba de utils/receipt_cache.py y de la reimpresión con los bytes exactos."""
+import datetime
+import os
+import time
+import zlib
+
+from _common import check, temp_db
+import database
+from utils.print_spooler import PrintSpooler
+from utils.receipt_cache import ReceiptCache, get_receipt_cache, receipt_sha
+from utils.receipt_renderer import get_renderer
+
+tmp = temp_db('test_receipts_')
+printer = f"virtual:{tmp / 'virtual'}"
+
+
+def printed(job_id):
+    """Bytes que recibió la impresora virtual para el trabajo."""
+    return next((tmp / 'virtual').glob(f'{job_id:08d}_*.txt')).read_bytes()
+
+
+# ida y vuelta, comprimido y direccionado por contenido
+cache = ReceiptCache(max_bytes=10 ** 6)
+ticket = ('\n'.join(f'{n:<3}Harina Pan {n:>7.2f}{n * 36.52:>13.2f}' for n in range(60))).encode('utf-8')
+sha = cache.put(ticket, printer)
+check('la clave es el sha256 de los bytes', sha == receipt_sha(ticket))
+check('get devuelve los mismos bytes y la impresora', cache.get(sha) == (ticket, printer))
+stored = database.receipts_stored_size()
+check(f'se guarda comprimido ({len(ticket)} -> {stored} bytes)', stored < len(ticket) / 2)
+cache.put(ticket, printer)
+check('el mismo contenido se guarda una sola vez', database.receipts_stored_size() == stored)
+check('sha desconocido devuelve None', cache.get('0' * 64) is None)
+check('el total llevado al día coincide con la tabla', stored == database._get_conn().execute(
+    "SELECT SUM(stored_size) FROM receipts").fetchone()[0])
+
+# desalojo LRU: con tope para ~3 tickets, el usado hace más tiempo sale primero
+database.evict_receipts(0)
+tickets = [(f'Ticket {n}\n' + 'x' * 50 + os.urandom(400).hex()).encode('utf-8') for n in range(4)]
+small = ReceiptCache(max_bytes=len(zlib.compress(tickets[0])) * 3 + 20)
+shas = []
+for t in tickets[:3]:
+    shas.append(small.put(t))
+    time.sleep(0.01)
+small.get(shas[0])                      # el primero pasa a ser el más reciente
+time.sleep(0.01)
+shas.append(small.put(tickets[3]))
+check('al pasar el tope sale el menos usado', small.get(shas[1]) is None)
+check('los usados hace poco se conservan', all(small.get(s) is not None for s in (shas[0], shas[2], shas[3])))
+check('el total queda dentro del tope', database.receipts_stored_size() <= small.max_bytes)
+
+# reimpresión: la factura guarda el sha y reprint envía los mismos bytes
+database.evict_receipts(0)
+check('desalojar todo deja el total en 0', database.receipts_stored_size() == 0)
+spooler = PrintSpooler()
+spooler.start()
+rate = 36.52
+items = [{'id': i, 'name': f'Producto {i}', 'quantity': 1 + i % 3, 'price': [2.5, 120.0][i % 2]} for i in range(40)]
+when = datetime.datetime(2025, 1, 13, 10, 30)
+model = get_renderer().model(items, rate, client_name='Ana', when=when, numero='20250113-7')
+job_id = spooler.submit_receipt(model, '58mm', 'MI COMERCIO C.A.', printer, '20250113-7')
+check('submit_receipt deja el sha en el modelo', len(model.get('receipt_sha', '')) == 64)
+database.save_invoice({
+    'numero_factura': '20250113-7', 'productos': items, 'datetime': when.strftime('%Y-%m-%d %H:%M:%S'),
+    'subtotal_usd': model['subtotal_usd'], 'iva_amount_usd': model['iva_usd'], 'total_usd': model['total_usd'],
+    'subtotal_bs': model['subtotal_bs'], 'iva_amount_bs': model['iva_bs'], 'total_bs': model['total_bs'],
+    'global_iva_pct': model['vat_pct'], 'iva_enabled': model['iva_usd'] > 0, 'paper_size': '58mm',
+    'exchange_rate': rate, 'receipt_sha': model['receipt_sha'], 'client': {'nombre': 'Ana'},
+})
+check('la factura guarda el sha', database.get_invoice('20250113-7')['receipt_sha'] == model['receipt_sha'])
+spooler.wait_idle(timeout=5)
+original = printed(job_id)
+check('el trabajo impreso no guarda otra copia del ticket',
+      database.get_print_job(job_id, with_payload=True)['payload'] == b''
+      and get_receipt_cache().get(model['receipt_sha'])[0] == original)
+database.purge_print_jobs(-1)           # sin trabajos previos: la reimpresión sale de la caché
+t0 = time.perf_counter()
+reprint_id = spooler.reprint('20250113-7')
+lookup_ms = (time.perf_counter() - t0) * 1000
+spooler.wait_idle(timeout=5)
+check(f'reprint envía los bytes exactos desde la caché ({lookup_ms:.2f} ms)',
+      printed(reprint_id) == original)
+
+# ticket desalojado (y los trabajos impresos sin bytes): se vuelve a generar desde la factura
+database.evict_receipts(0)
+database.set_setting('print_backend', 'virtual')      # se regenera hacia la impresora configurada
+database.set_setting('virtual_printer_dir', str(tmp / 'virtual'))
+regen_id = spooler.reprint('20250113-7')
+spooler.wait_idle(timeout=5)
+check('desalojado: se regenera con el renderer y da los mismos bytes',
+      printed(regen_id) == original)
+check('y vuelve a quedar en la caché', get_receipt_cache().get(model['receipt_sha']) is not None)
+check('reprint de una factura inexistente devuelve None', spooler.reprint('no-existe') is None)
+spooler.stop(timeout=2)
+database.close_conn()
+print('\nTodo OK')
@@ -5,36 +5,43 @@ import urllib3
 # Desactivar advertencias de certificados inseguros
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+BCV_URL = "https://www.bcv.org.ve/"
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://www.google.com/'
+}
 
-def obtener_bcv():
-    url = "https://www.bcv.org.ve/"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Referer': 'https://www.google.com/'
-    }
-    try:
-        response = requests.get(url, headers=headers, verify=False, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        ids = {'dolar': 'dolar', 'euro': 'euro'}
-        resultados = {}
-        for moneda, id_html in ids.items():
-            contenedor = soup.find('div', id=id_html)
-            if contenedor:
-                strong = contenedor.find('strong')
-                if strong and strong.text:
-                    valor_texto = strong.text.strip()
-                    try:
-                        valor_float = float(valor_texto.replace(',', '.'))
-                        resultados[moneda] = valor_float
-                    except Exception:
-                        resultados[moneda] = None
-                else:
+
+def parse_bcv_html(content):
+    """Extrae {'dolar', 'euro', 'fecha'} de la página del BCV (None en lo que no aparezca)."""
+    soup = BeautifulSoup(content, 'html.parser')
+    ids = {'dolar': 'dolar', 'euro': 'euro'}
+    resultados = {}
+    for moneda, id_html in ids.items():
+        contenedor = soup.find('div', id=id_html)
+        if contenedor:
+            strong = contenedor.find('strong')
+            if strong and strong.text:
+                valor_texto = strong.text.strip()
+                try:
+                    valor_float = float(valor_texto.replace(',', '.'))
+                    resultados[moneda] = valor_float
+                except Exception:
                     resultados[moneda] = None
             else:
                 resultados[moneda] = None
-        fecha_box = soup.find('span', class_='date-display-single')
-        resultados['fecha'] = fecha_box.text.strip() if fecha_box else None
-        return resultados
+        else:
+            resultados[moneda] = None
+    fecha_box = soup.find('span', class_='date-display-single')
+    resultados['fecha'] = fecha_box.text.strip() if fecha_box else None
+    return resultados
+
+
+def obtener_bcv(url=BCV_URL, session=None, timeout=10):
+    """Consulta el BCV una vez. Para la app usar utils.rate_service (caché, reintentos, en segundo plano)."""
+    try:
+        response = (session or requests).get(url, headers=HEADERS, verify=False, timeout=timeout)
+        response.raise_for_status()
+        return parse_bcv_html(response.content)
     except Exception as e:
         return {"error": f"Error de conexión: {str(e)}"}
@@ -0,0 +1,84 @@
+"""Analítica de cierre de caja a partir de facturas, sin Tk."""
+
+# Métodos considerados "Divisa" para el módulo exclusivo
+_METODOS_DIVISA = ('dólar', 'dólares', 'divisa', 'usd', 'dolar', 'dolares')
+
+
+def _is_divisa_primary(inv: dict) -> bool:
+    """True si el método de pago principal de la factura es Dólar/Divisa."""
+    pm = inv.get('payment_methods')
+    if isinstance(pm, (list, tuple)) and pm:
+        first = str(pm[0]).strip().lower()
+        return any(m in first for m in _METODOS_DIVISA)
+    pays = inv.get('payments') or {}
+    usd = float(pays.get('usd') or 0)
+    if usd > 0:
+        efectivo = float(pays.get('efectivo_bs') or 0)
+        pv = float(pays.get('punto_bs') or 0)
+        pm_bs = float(pays.get('pago_movil_bs') or 0)
+        if usd >= efectivo and usd >= pv and usd >= pm_bs:
+            return True
+    return False
+
+
+def compute_cierre_analytics(facturas_dia: list, exchange_rate: float = 1.0) -> dict:
+    """
+    Reporte analítico de cierre:
+    - Conteo de transacciones por método (cuántas facturas usaron cada método).
+    - Totales segregados por método (BS).
+    - Módulo Divisas: solo facturas con método Dólar/Divisa → total $ y equiv. BS.
+    - Gran total BS y USD.
+    """
+    count_efectivo = count_pv = count_pm = count_dolar = 0
+    total_efectivo = total_pv = total_pm = total_usd_bs = 0.0
+    total_gral_usd = 0.0
+    divisa_total_usd = divisa_total_bs_equiv = 0.0
+    divisa_count = 0
+
+    for inv in facturas_dia:
+        pays = inv.get('payments') or {}
+        ef = float(pays.get('efectivo_bs') or 0)
+        pv = float(pays.get('punto_bs') or 0)
+        pm = float(pays.get('pago_movil_bs') or 0)
+        usd = float(pays.get('usd') or 0)
+        usd_bs = usd * exchange_rate
+
+        if ef > 0:
+            count_efectivo += 1
+        if pv > 0:
+            count_pv += 1
+        if pm > 0:
+            count_pm += 1
+        if usd > 0:
+            count_dolar += 1
+
+        total_efectivo += ef
+        total_pv += pv
+        total_pm += pm
+        total_usd_bs += usd_bs
+        total_gral_usd += float(inv.get('total_usd') or 0)
+
+        if _is_divisa_primary(inv):
+            divisa_count += 1
+            divisa_total_usd += float(inv.get('total_usd') or 0)
+            divisa_total_bs_equiv += float(inv.get('total_bs') or 0)  # o (total_usd * exchange_rate)
+
+    total_gral_bs = total_efectivo + total_pv + total_pm + total_usd_bs
+
+    return {
+        'num_facturas': len(facturas_dia),
+        'count_efectivo': count_efectivo,
+        'count_pv': count_pv,
+        'count_pm': count_pm,
+        'count_dolar': count_dolar,
+        'total_efectivo': total_efectivo,
+        'total_pv': total_pv,
+        'total_pm': total_pm,
+        'total_usd_bs': total_usd_bs,
+        'total_gral_bs': total_gral_bs,
+        'total_gral_usd': total_gral_usd,
+        'divisa_count': divisa_count,
+        'divisa_total_usd': divisa_total_usd,
+        'divisa_total_bs_equiv': divisa_total_bs_equiv,
+        'exchange_rate': exchange_rate,
+    }
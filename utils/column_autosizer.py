@@ -0,0 +1,101 @@
+"""Ancho de columnas de un Treeview según su contenido, midiendo solo los textos más anchos."""
+import heapq
+
+# anchos por carácter por fuente: clave de fuente -> {carácter: px}
+_GLYPH_CACHE = {}
+
+
+def _font_key(font) -> str:
+    try:
+        return str(font.actual())
+    except Exception:
+        return str(id(font))
+
+
+class ColumnAutoSizer:
+    def __init__(self, font, columns, padding: int = 12, sample: int = 5, measure=None):
+        self.columns = tuple(columns)
+        self.padding = int(padding)
+        self.sample = max(1, int(sample))
+        # measure(texto) -> px; por defecto font.measure (inyectable para pruebas/benchmarks)
+        self._measure = measure or font.measure
+        self._glyphs = _GLYPH_CACHE.setdefault(_font_key(font) if measure is None else id(measure), {})
+        self._max_glyph = max(self._glyphs.values(), default=0)
+        self._exact = {}                                  # texto -> px medido
+        self._top = {c: [] for c in self.columns}         # heap (ancho estimado, texto) de los más anchos
+        self._seen = {c: set() for c in self.columns}
+        self._headers = {}
+        self._widths = None
+
+    def add_headers(self, headers):
+        for col, text in zip(self.columns, headers):
+            self._headers[col] = str(text or '')
+        self._widths = None
+
+    def add_rows(self, rows):
+        """rows: secuencias con un texto por columna, en el orden de `columns`."""
+        changed = False
+        for row in rows:
+            for col, text in zip(self.columns, row):
+                text = str(text or '')
+                if not text:
+                    continue
+                heap = self._top[col]
+                full = len(heap) >= self.sample
+                # la cota solo vale si todos sus caracteres ya se midieron (_max_glyph los conoce)
+                if full and len(text) * self._max_glyph <= heap[0][0] and self._glyphs.keys() >= set(text):
+                    continue
+                seen = self._seen[col]
+                if text in seen:
+                    continue
+                est = self._estimate(text)
+                if not full:
+                    heapq.heappush(heap, (est, text))
+                elif est > heap[0][0]:
+                    _w, old = heapq.heapreplace(heap, (est, text))
+                    seen.discard(old)
+                else:
+                    continue
+                seen.add(text)
+                changed = True
+        if changed:
+            self._widths = None
+        return changed
+
+    def _estimate(self, text: str) -> int:
+        glyphs = self._glyphs
+        try:
+            return sum(map(glyphs.__getitem__, text))
+        except KeyError:
+            pass
+        total = 0
+        for ch in text:
+            w = glyphs.get(ch)
+            if w is None:
+                w = glyphs[ch] = self._measure(ch)
+                if w > self._max_glyph:
+                    self._max_glyph = w
+            total += w
+        return total
+
+    def _exact_width(self, text: str) -> int:
+        w = self._exact.get(text)
+        if w is None:
+            w = self._exact[text] = self._measure(text)
+        return w
+
+    def widths(self, minwidths=None) -> dict:
+        """Ancho (px, con padding) por columna; solo recalcula si entraron textos nuevos."""
+        if self._widths is None:
+            out = {}
+            for col in self.columns:
+                candidates = [t for _w, t in self._top[col]]
+                header = self._headers.get(col)
+                if header:
+                    candidates.append(header)
+                w = max((self._exact_width(t) for t in candidates), default=0)
+                out[col] = w + self.padding
+            self._widths = out
+        if not minwidths:
+            return dict(self._widths)
+        return {c: max(w, int(minwidths.get(c) or 0)) for c, w in self._widths.items()}
@@ -1,47 +1,35 @@
 """Gestión del ID de factura: formato YYYYMMDD-N."""
-import os
-import json
 import datetime
 
+import database
 
-def _counter_path(data_dir=None):
-    if data_dir is None:
-        data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    return os.path.join(data_dir, 'invoice_counter.json')
+
+def _today() -> str:
+    return datetime.datetime.now().strftime('%Y%m%d')
 
 
 def get_next_invoice_id(data_dir=None):
-    """Devuelve el próximo ID de factura para hoy (formato 20260226-1). No incrementa."""
-    path = _counter_path(data_dir)
-    today = datetime.datetime.now().strftime('%Y%m%d')
+    """Devuelve el próximo ID de factura para hoy (formato 20260226-1). No incrementa.
+
+    Es solo para mostrarlo: otra ventana puede tomar ese número antes; el definitivo lo da
+    allocate_invoice_id(). `data_dir` se ignora (el contador está en la BD).
+    """
+    today = _today()
     try:
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            if data.get('date') == today:
-                n = int(data.get('next', 1))
-                return f"{today}-{n}"
-    except (OSError, json.JSONDecodeError, TypeError, ValueError):
-        pass
-    return f"{today}-1"
+        return f"{today}-{database.peek_invoice_number(today)}"
+    except Exception:
+        return f"{today}-1"
+
+
+def allocate_invoice_id() -> str:
+    """Reserva y devuelve el siguiente ID de hoy (el contador vuelve a 1 cada día).
+
+    Llamarla dentro de la transacción que guarda la factura: si se revierte, el número no se consume.
+    """
+    today = _today()
+    return f"{today}-{database.next_invoice_number(today)}"
 
 
 def increment_invoice_counter(data_dir=None):
-    """Incrementa el contador del día para la siguiente factura."""
-    path = _counter_path(data_dir)
-    today = datetime.datetime.now().strftime('%Y%m%d')
-    n = 1
-    try:
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            if data.get('date') == today:
-                n = int(data.get('next', 1)) + 1
-    except (OSError, json.JSONDecodeError, TypeError, ValueError):
-        pass
-    try:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump({'date': today, 'next': n}, f, indent=2)
-    except OSError:
-        pass
+    """Compatibilidad: reserva un número del día y devuelve el ID (ver allocate_invoice_id)."""
+    return allocate_invoice_id()
@@ -0,0 +1,326 @@
+"""Cola de impresión en segundo plano sobre la tabla print_jobs, con reintentos y varios destinos."""
+import os
+import tempfile
+import threading
+import time
+
+import database
+
+# secuencias ESC/POS
+ESC_INIT = b'\x1b@'             # reinicia la impresora
+ESC_CODEPAGE_437 = b'\x1bt\x00'  # tabla de caracteres PC437 (tiene ñ, á, ¡, ...)
+ESC_FEED_CUT = b'\n\n\n\n\x1dV\x01'  # avance y corte parcial
+
+
+class PrinterError(Exception):
+    """El destino de impresión no está disponible o rechazó el trabajo."""
+
+
+class _Backend:
+    """Base de los destinos: `encoding` del texto y frame() para lo que el destino agregue alrededor."""
+    kind = ''
+    encoding = 'utf-8'
+
+    def frame(self, body: bytes) -> bytes:
+        return body
+
+    def encode(self, text: str) -> bytes:
+        return self.frame(text.encode(self.encoding, errors='replace'))
+
+    def send(self, data: bytes, job=None):
+        raise NotImplementedError
+
+
+class WindowsBackend(_Backend):
+    """Impresora de Windows por nombre (win32print RAW); sin nombre o sin pywin32, os.startfile."""
+    kind = 'windows'
+
+    def __init__(self, printer_name: str = ''):
+        self.printer_name = printer_name or ''
+
+    def send(self, data: bytes, job=None):
+        if self.printer_name:
+            try:
+                import win32print
+            except ImportError:
+                win32print = None
+            if win32print is not None:
+                handle = win32print.OpenPrinter(self.printer_name)
+                try:
+                    win32print.StartDocPrinter(handle, 1, ('Factura', None, 'RAW'))
+                    try:
+                        win32print.StartPagePrinter(handle)
+                        win32print.WritePrinter(handle, data)
+                        win32print.EndPagePrinter(handle)
+                    finally:
+                        win32print.EndDocPrinter(handle)
+                finally:
+                    win32print.ClosePrinter(handle)
+                return
+        # impresora predeterminada vía el shell: necesita un archivo
+        startfile = getattr(os, 'startfile', None)
+        if startfile is None:
+            raise PrinterError('No hay impresora de Windows disponible')
+        fd, path = tempfile.mkstemp(prefix='factura_', suffix='.txt')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        startfile(path, 'print')
+
+
+class EscPosBackend(_Backend):
+    """Bytes ESC/POS crudos a un dispositivo o archivo (impresoras térmicas)."""
+    kind = 'escpos'
+    encoding = 'cp437'
+
+    def __init__(self, device: str):
+        if not device:
+            raise PrinterError('Falta el dispositivo ESC/POS')
+        self.device = device
+
+    def frame(self, body: bytes) -> bytes:
+        return ESC_INIT + ESC_CODEPAGE_437 + body.replace(b'\r\n', b'\n') + ESC_FEED_CUT
+
+    def send(self, data: bytes, job=None):
+        try:
+            with open(self.device, 'wb', buffering=0) as f:
+                f.write(data)
+        except OSError as e:
+            raise PrinterError(f'{self.device}: {e}') from e
+
+
+class DirectoryBackend(_Backend):
+    """Impresora virtual: guarda cada trabajo como un archivo en `directory`."""
+    kind = 'virtual'
+
+    def __init__(self, directory: str):
+        # por defecto junto a la BD (data/impresora_virtual)
+        self.directory = directory or os.path.join(os.path.dirname(str(database.DB_PATH)), 'impresora_virtual')
+
+    def send(self, data: bytes, job=None):
+        os.makedirs(self.directory, exist_ok=True)
+        job = job or {}
+        numero = ''.join(ch for ch in str(job.get('invoice_numero') or '') if ch.isalnum() or ch in '-_')
+        name = f"{int(job.get('id') or 0):08d}" + (f'_{numero}' if numero else '') + '.txt'
+        path = os.path.join(self.directory, name)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+BACKENDS = {'windows': WindowsBackend, 'escpos': EscPosBackend, 'virtual': DirectoryBackend}
+
+
+def make_backend(printer: str):
+    """Destino a partir de 'tipo:argumento' (sin tipo: impresora de Windows con ese nombre)."""
+    kind, sep, arg = str(printer or '').partition(':')
+    if not sep or kind not in BACKENDS:
+        kind, arg = 'windows', str(printer or '')
+    return BACKENDS[kind](arg)
+
+
+def printer_from_settings() -> str:
+    """Destino configurado: settings 'print_backend' (windows/escpos/virtual) y su argumento."""
+    kind = database.get_setting('print_backend', 'windows') or 'windows'
+    if kind == 'escpos':
+        return 'escpos:' + (database.get_setting('escpos_device', '') or '')
+    if kind == 'virtual':
+        return 'virtual:' + (database.get_setting('virtual_printer_dir', '') or '')
+    return 'windows:' + (database.get_setting('default_printer', '') or '')
+
+
+class PrintSpooler:
+    def __init__(self, retries: int = 5, backoff: float = 2.0, max_backoff: float = 60.0,
+                 backend_factory=make_backend):
+        self.retries = max(0, int(retries))
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+        self._backend_factory = backend_factory
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+        self._listeners_lock = threading.Lock()
+
+    # --- envío de trabajos ---
+    def submit(self, payload: bytes, printer: str = None, invoice_numero: str = '', receipt_sha: str = '') -> int:
+        """Encola bytes ya listos para el destino; devuelve el id del trabajo.
+
+        `receipt_sha`: los bytes ya están en la caché de tickets; el trabajo impreso no
+        guarda su copia.
+
+        Dentro de una transacción abierta (p. ej. la de do_print) el hilo se despierta y se
+        avisa a los suscriptores recién tras el COMMIT; si se revierte, no se avisa nada.
+        """
+        printer = printer if printer is not None else printer_from_settings()
+        job_id = database.enqueue_print_job(payload, printer, invoice_numero, receipt_sha)
+        job = {'id': job_id, 'invoice_numero': invoice_numero, 'status': 'pendiente', 'attempts': 0,
+               'last_error': ''}
+
+        def _queued():
+            self._wake.set()
+            self._notify(job)
+        database.after_commit(_queued)
+        return job_id
+
+    def submit_text(self, text: str, printer: str = None, invoice_numero: str = '') -> int:
+        """Codifica el texto del ticket para el destino (UTF-8, o ESC/POS) y lo encola."""
+        printer = printer if printer is not None else printer_from_settings()
+        return self.submit(self._backend_factory(printer).encode(text), printer, invoice_numero)
+
+    def submit_receipt(self, model: dict, paper_size: str = None, shop_title: str = None, printer: str = None,
+                       invoice_numero: str = '') -> int:
+        """Renderiza el ticket (utils/receipt_renderer.py) en la codificación del destino y lo encola.
+
+        Los bytes quedan en la caché de tickets (utils/receipt_cache.py); su sha se deja en
+        model['receipt_sha'] para guardarlo con la factura.
+        """
+        from utils.receipt_cache import get_receipt_cache
+        from utils.receipt_renderer import get_renderer
+        printer = printer if printer is not None else printer_from_settings()
+        backend = self._backend_factory(printer)
+        payload = backend.frame(get_renderer().render(model, paper_size, shop_title, encoding=backend.encoding))
+        try:
+            model['receipt_sha'] = get_receipt_cache().put(payload, printer)
+        except Exception:
+            model['receipt_sha'] = ''
+        return self.submit(payload, printer, invoice_numero or model.get('numero', ''), model['receipt_sha'])
+
+    def reprint(self, invoice_numero: str, invoice: dict = None):
+        """Vuelve a encolar el ticket de la factura con los mismos bytes que el original.
+
+        Busca el sha de la factura en la caché de tickets; si no está (factura anterior a la
+        caché o ticket desalojado) usa el último trabajo de la cola y, si tampoco hay, arma el
+        ticket de nuevo desde la factura guardada (`invoice` o la de la BD). Devuelve el id
+        del trabajo o None.
+        """
+        from utils.receipt_cache import get_receipt_cache
+        cache = get_receipt_cache()
+        sha = (invoice or {}).get('receipt_sha') or database.get_invoice_receipt_sha(invoice_numero)
+        found = cache.get(sha) if sha else None
+        if found is not None:
+            payload, printer = found
+            return self.submit(payload, printer or None, invoice_numero, sha)
+        job = database.last_print_job(invoice_numero)
+        if job is not None:
+            return self.submit(job['payload'], job['printer'], invoice_numero)
+        stored = database.get_invoice(invoice_numero)
+        invoice = stored or invoice
+        if not invoice:
+            return None
+        from utils.receipt_renderer import model_from_invoice
+        model = model_from_invoice(invoice)
+        job_id = self.submit_receipt(model, invoice.get('paper_size') or None, invoice_numero=invoice_numero)
+        if stored is not None and model.get('receipt_sha') and model['receipt_sha'] != sha:
+            database.set_invoice_receipt_sha(invoice_numero, model['receipt_sha'])
+        return job_id
+
+    def retry(self, job_id: int) -> bool:
+        """Reintenta ya un trabajo en 'error' (o adelanta uno pendiente)."""
+        ok = database.update_print_job(job_id, 'pendiente', attempts=0, next_attempt_at=time.time())
+        self._wake.set()
+        return ok
+
+    # --- suscriptores ---
+    def subscribe(self, callback):
+        """Registra callback(job) para cada cambio de estado; devuelve un token para unsubscribe()."""
+        entry = (callback,)
+        with self._listeners_lock:
+            self._listeners.append(entry)
+        return entry
+
+    def unsubscribe(self, token) -> None:
+        with self._listeners_lock:
+            try:
+                self._listeners.remove(token)
+            except ValueError:
+                pass
+
+    def _notify(self, job):
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for (callback,) in listeners:
+            try:
+                callback(dict(job))
+            except Exception:
+                pass
+
+    # --- hilo de la cola ---
+    def start(self):
+        """Inicia el hilo de la cola (idempotente); retoma lo que quedó pendiente."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        try:
+            database.recover_print_jobs()
+            database.purge_print_jobs()
+        except Exception:
+            pass
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='print-spooler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Detiene el hilo; lo pendiente queda en la cola para el próximo arranque."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Espera a que no queden trabajos pendientes ni en curso (pruebas y benchmarks)."""
+        deadline = None if timeout is None else time.time() + timeout
+        while database.get_print_jobs(status=('pendiente', 'imprimiendo'), limit=1):
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                job = database.claim_print_job(time.time())
+            except Exception:
+                job = None
+            if job is None:
+                try:
+                    due = database.next_print_job_due()
+                except Exception:
+                    due = None
+                self._wake.wait(None if due is None else max(0.0, due - time.time()))
+                continue
+            self._notify({k: v for k, v in job.items() if k != 'payload'})
+            self._send(job)
+
+    def _send(self, job):
+        attempts = int(job.get('attempts') or 0) + 1
+        try:
+            self._backend_factory(job['printer']).send(job['payload'], job)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if attempts > self.retries:
+                status, next_at = 'error', 0.0
+            else:
+                status = 'pendiente'
+                next_at = time.time() + min(self.max_backoff, self.backoff * (2 ** (attempts - 1)))
+            database.update_print_job(job['id'], status, attempts=attempts, next_attempt_at=next_at, last_error=error)
+            self._notify({'id': job['id'], 'invoice_numero': job.get('invoice_numero', ''), 'status': status,
+                          'attempts': attempts, 'next_attempt_at': next_at, 'last_error': error})
+            return
+        database.update_print_job(job['id'], 'impreso', attempts=attempts, last_error='')
+        self._notify({'id': job['id'], 'invoice_numero': job.get('invoice_numero', ''), 'status': 'impreso',
+                      'attempts': attempts, 'last_error': ''})
+
+
+_spooler = None
+_spooler_lock = threading.Lock()
+
+
+def get_spooler() -> PrintSpooler:
+    """Cola compartida por la app (se inicia en main.py)."""
+    global _spooler
+    with _spooler_lock:
+        if _spooler is None:
+            _spooler = PrintSpooler()
+        return _spooler
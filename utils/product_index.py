@@ -0,0 +1,114 @@
+"""Índice en memoria código -> producto para el escaneo/ingreso rápido de códigos."""
+import threading
+
+import database
+
+
+def normalize_code(code) -> str:
+    s = str(code or '').strip().upper()
+    if s.isdigit():
+        s = s.lstrip('0') or '0'
+    return s
+
+
+class ProductIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {}      # pid -> (id, code, name, price_bs, price_usd, quantity)
+        self._by_code = {}    # código normalizado -> pid
+        self._token = None
+
+    def attach(self):
+        """Carga el índice y se suscribe a los cambios de productos."""
+        self.rebuild()
+        if self._token is None:
+            self._token = database.subscribe_products(self._on_products_changed)
+        return self
+
+    def detach(self):
+        if self._token is not None:
+            database.unsubscribe_products(self._token)
+            self._token = None
+
+    def rebuild(self):
+        rows = database.get_products()
+        by_id = {}
+        by_code = {}
+        # orden por id ascendente: ante códigos repetidos gana el producto más antiguo
+        for row in sorted(rows, key=lambda r: r[0]):
+            by_id[row[0]] = row
+            key = normalize_code(row[1])
+            if key and key not in by_code:
+                by_code[key] = row[0]
+        with self._lock:
+            self._by_id = by_id
+            self._by_code = by_code
+
+    def refresh(self, ids):
+        """Relee de la BD solo los productos indicados."""
+        fresh = database.get_products_by_ids(ids)
+        with self._lock:
+            for pid in ids:
+                pid = int(pid)
+                old = self._by_id.pop(pid, None)
+                if old is not None:
+                    key = normalize_code(old[1])
+                    if self._by_code.get(key) == pid:
+                        del self._by_code[key]
+                row = fresh.get(pid)
+                if row is not None:
+                    self._by_id[pid] = row
+                    key = normalize_code(row[1])
+                    if key and key not in self._by_code:
+                        self._by_code[key] = pid
+
+    def _on_products_changed(self, kind, ids):
+        try:
+            if ids is None:
+                self.rebuild()
+            else:
+                self.refresh(ids)
+        except Exception:
+            pass
+
+    def get(self, pid):
+        return self._by_id.get(int(pid))
+
+    def lookup(self, code):
+        """Devuelve la fila del producto con ese código (o id rellenado si no tiene código), o None."""
+        key = normalize_code(code)
+        if not key:
+            return None
+        pid = self._by_code.get(key)
+        if pid is not None:
+            return self._by_id.get(pid)
+        # productos sin código: la tabla muestra su id rellenado a 4 dígitos
+        if key.isdigit():
+            row = self._by_id.get(int(key))
+            if row is not None and not str(row[1] or '').strip():
+                return row
+        return None
+
+    def __len__(self):
+        return len(self._by_id)
+
+
+def parse_scan(text: str):
+    """Interpreta la entrada del escáner: '0042' -> (1, '0042'); '3*0042' -> (3, '0042').
+
+    Devuelve (cantidad, código) o None si el texto no es válido.
+    """
+    s = str(text or '').strip()
+    if not s:
+        return None
+    qty = 1
+    if '*' in s:
+        left, _, s = s.partition('*')
+        try:
+            qty = int(left.strip())
+        except ValueError:
+            return None
+        s = s.strip()
+    if qty <= 0 or not s:
+        return None
+    return qty, s
@@ -0,0 +1,209 @@
+"""Tasa de cambio del BCV refrescada en segundo plano, con TTL, reintentos y una sola Session."""
+import json
+import threading
+import time
+
+import database
+
+DEFAULT_TTL = 3600          # segundos que vale una consulta
+RETRY_AFTER_ERROR = 300     # si fallan todos los reintentos, volver a probar en 5 min
+_CURRENCY_KEYS = {'USD': 'dolar', 'EUR': 'euro'}
+
+
+def rate_for_currency(rates: dict, currency: str = None):
+    """Tasa de `rates` para la moneda (por defecto la de settings 'currency'), o None."""
+    currency = currency or database.get_setting('currency', 'USD')
+    try:
+        val = float((rates or {}).get(_CURRENCY_KEYS.get(currency, 'dolar')) or 0)
+    except (TypeError, ValueError):
+        return None
+    return val if val > 0 else None
+
+
+def apply_rates(rates: dict, currency: str = None):
+    """Guarda la tasa de la moneda como exchange_rate y recalcula los precios en BS si cambió.
+
+    Devuelve la tasa aplicada, o None si `rates` no trae valor para la moneda.
+    """
+    val = rate_for_currency(rates, currency)
+    if val is None:
+        return None
+    try:
+        old = float(database.get_setting('exchange_rate', '0') or 0)
+    except (TypeError, ValueError):
+        old = 0.0
+    if abs(old - val) > 1e-9:
+        database.set_setting('exchange_rate', str(val))
+        try:
+            database.update_prices_by_rate(val)
+        except Exception:
+            pass
+    return val
+
+
+class RateService:
+    def __init__(self, url: str = None, ttl: float = DEFAULT_TTL, timeout=(5, 10), retries: int = 3,
+                 backoff: float = 1.0):
+        from utils.bcv_fetch import BCV_URL
+        self.url = url or BCV_URL
+        self.ttl = float(ttl)
+        self.timeout = timeout
+        self.retries = max(0, int(retries))
+        self.backoff = float(backoff)
+        self._session = None
+        self._rates = None
+        self._fetch_lock = threading.Lock()     # una consulta a la vez
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+        self._listeners_lock = threading.Lock()
+
+    # --- estado ---
+    def cached(self):
+        """Última consulta correcta (dict con 'dolar', 'euro', 'fecha', 'fetched_at') o None."""
+        if self._rates is None:
+            try:
+                rates = json.loads(database.get_setting('bcv_rates', '') or 'null')
+                if isinstance(rates, dict):
+                    self._rates = rates
+            except (TypeError, ValueError):
+                pass
+        return self._rates
+
+    def age(self):
+        """Segundos desde la última consulta correcta (None si nunca hubo)."""
+        rates = self.cached()
+        try:
+            return max(0.0, time.time() - float(rates['fetched_at']))
+        except (TypeError, KeyError, ValueError):
+            return None
+
+    def is_fresh(self) -> bool:
+        age = self.age()
+        return age is not None and age < self.ttl
+
+    @staticmethod
+    def last_rate() -> float:
+        """Tasa vigente en settings: disponible al instante, sin red."""
+        try:
+            return float(database.get_setting('exchange_rate', '1.0') or 1.0)
+        except (TypeError, ValueError):
+            return 1.0
+
+    # --- consulta ---
+    def _get_session(self):
+        if self._session is None:
+            import requests
+            from utils.bcv_fetch import HEADERS
+            self._session = requests.Session()
+            self._session.headers.update(HEADERS)
+        return self._session
+
+    def fetch(self) -> dict:
+        """Una consulta al BCV (sin reintentos ni caché). Lanza excepción si falla o no trae tasas."""
+        from utils.bcv_fetch import parse_bcv_html
+        response = self._get_session().get(self.url, verify=False, timeout=self.timeout)
+        response.raise_for_status()
+        rates = parse_bcv_html(response.content)
+        if not rates.get('dolar') and not rates.get('euro'):
+            raise ValueError('la página del BCV no trae tasas')
+        return rates
+
+    def refresh(self, force: bool = False) -> dict:
+        """Tasas del BCV: las guardadas si siguen vigentes (salvo force), si no consulta con reintentos.
+
+        Devuelve el dict de tasas o {'error': ...}; no lanza excepciones. Bloquea mientras
+        consulta, así que llamarlo desde un hilo de trabajo.
+        """
+        with self._fetch_lock:
+            if not force and self.is_fresh():
+                return dict(self.cached())
+            error = None
+            rates = None
+            for attempt in range(self.retries + 1):
+                if attempt and self._stop.wait(self.backoff * (2 ** (attempt - 1))):
+                    break
+                try:
+                    rates = self.fetch()
+                    break
+                except Exception as e:
+                    error = e
+            if rates is None:
+                return {'error': f'Error de conexión: {error}' if error else 'Consulta cancelada'}
+            rates['fetched_at'] = time.time()
+            self._rates = rates
+            try:
+                database.set_setting('bcv_rates', json.dumps(rates))
+            except Exception:
+                pass
+        self._notify(dict(rates))
+        return dict(rates)
+
+    # --- suscriptores ---
+    def subscribe(self, callback):
+        """Registra callback(rates) para cada consulta nueva (en el hilo del servicio: usar after() para
+        tocar widgets); devuelve un token para unsubscribe()."""
+        entry = (callback,)
+        with self._listeners_lock:
+            self._listeners.append(entry)
+        return entry
+
+    def unsubscribe(self, token) -> None:
+        with self._listeners_lock:
+            try:
+                self._listeners.remove(token)
+            except ValueError:
+                pass
+
+    def _notify(self, rates):
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for (callback,) in listeners:
+            try:
+                callback(rates)
+            except Exception:
+                pass
+
+    # --- hilo de refresco ---
+    def start(self, apply: bool = True):
+        """Inicia el hilo que refresca la tasa mientras el modo sea 'Automático' (idempotente)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(apply,), name='bcv-rate', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self, apply):
+        while not self._stop.is_set():
+            wait = self.ttl
+            try:
+                if database.get_setting('exchange_mode', 'Manual') == 'Automático':
+                    rates = self.refresh()
+                    if 'error' in rates:
+                        wait = RETRY_AFTER_ERROR
+                    else:
+                        if apply:
+                            apply_rates(rates)
+                        wait = max(1.0, self.ttl - (self.age() or 0.0))
+            except Exception:
+                wait = RETRY_AFTER_ERROR
+            self._stop.wait(wait)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> RateService:
+    """Servicio compartido por la app."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RateService()
+        return _service
@@ -0,0 +1,67 @@
+"""Tickets impresos guardados tal cual (comprimidos, por sha256, con tope LRU) para reimprimir."""
+import hashlib
+import threading
+import zlib
+
+import database
+
+DEFAULT_MAX_MB = 20.0
+
+
+def receipt_sha(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ReceiptCache:
+    def __init__(self, max_bytes: int = None, level: int = 6):
+        self._max_bytes = max_bytes
+        self.level = int(level)
+        self._lock = threading.Lock()
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return int(self._max_bytes)
+        try:
+            mb = float(database.get_setting('receipt_cache_max_mb', DEFAULT_MAX_MB) or DEFAULT_MAX_MB)
+        except (TypeError, ValueError):
+            mb = DEFAULT_MAX_MB
+        return int(mb * 1024 * 1024)
+
+    def put(self, payload: bytes, printer: str = '') -> str:
+        """Guarda los bytes (si no estaban) y devuelve su sha; desaloja lo más viejo si se pasa del tope."""
+        payload = bytes(payload)
+        sha = receipt_sha(payload)
+        with self._lock:
+            if database.store_receipt(sha, zlib.compress(payload, self.level), len(payload), printer):
+                limit = self.max_bytes
+                if database.receipts_stored_size() > limit:
+                    database.evict_receipts(limit)
+        return sha
+
+    def get(self, sha: str):
+        """(bytes, impresora) del ticket, o None si no está; comprueba que el contenido sea el del sha."""
+        found = database.load_receipt(sha)
+        if found is None:
+            return None
+        data, printer = found
+        try:
+            payload = zlib.decompress(data)
+        except zlib.error:
+            return None
+        if receipt_sha(payload) != sha:
+            return None
+        return payload, printer
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_receipt_cache() -> ReceiptCache:
+    """Caché compartida por la app."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReceiptCache()
+        return _cache
@@ -0,0 +1,262 @@
+"""Tickets de venta: modelo de la factura y layout compilado por papel y versión de ajustes."""
+import datetime
+import threading
+
+import database
+
+DEFAULT_SHOP_TITLE = 'MI COMERCIO C.A.'
+
+
+def unit_price_usd(item: dict, rate: float) -> float:
+    """Precio unitario en USD de una línea: price_usd si viene; si no, price (convertido si parece BS)."""
+    if 'price_usd' in item:
+        try:
+            return float(item.get('price_usd') or 0.0)
+        except (TypeError, ValueError):
+            pass
+    try:
+        p = float(item.get('price') or item.get('precio') or item.get('unit_price') or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+    # el carrito guarda el precio en BS o en USD según el producto: si es mayor que el 10% de
+    # la tasa se toma como BS
+    if rate and p > rate * 0.1:
+        return p / rate
+    return p
+
+
+def _qty(item: dict) -> int:
+    try:
+        return int(item.get('quantity') or item.get('cantidad') or item.get('qty') or 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def build_model(items, rate: float, vat_enabled: bool, vat_pct: float, client_name: str = '', when=None,
+                numero: str = '') -> dict:
+    """Modelo del ticket: líneas (cant, nombre, total USD, total BS) y totales redondeados."""
+    rate = float(rate or 0.0)
+    lines = []
+    sub_usd = 0.0
+    for it in items or []:
+        qty = _qty(it)
+        total_usd = round(unit_price_usd(it, rate) * qty, 2)
+        lines.append((qty, str(it.get('name') or it.get('nombre') or ''), total_usd, round(total_usd * rate, 2)))
+        sub_usd += total_usd
+    iva_usd = round(sub_usd * (vat_pct / 100.0), 2) if vat_enabled else 0.0
+    total_usd = round(sub_usd + iva_usd, 2)
+    rate_safe = rate or 1.0
+    return {
+        'numero': numero,
+        'when': when or datetime.datetime.now(),
+        'client_name': client_name or '',
+        'rate': rate,
+        'lines': lines,
+        'vat_pct': float(vat_pct),
+        'subtotal_usd': round(sub_usd, 2),
+        'iva_usd': iva_usd,
+        'total_usd': total_usd,
+        'subtotal_bs': round(sub_usd * rate_safe, 2),
+        'iva_bs': round(iva_usd * rate_safe, 2),
+        'total_bs': round(total_usd * rate_safe, 2),
+    }
+
+
+def client_display_name(client) -> str:
+    if not client:
+        return ''
+    if isinstance(client, dict):
+        name = client.get('name') or client.get('nombre') or ''
+        if client.get('apellido') and not client.get('name'):
+            name = f"{name} {client.get('apellido')}".strip()
+        return str(name)
+    return str(client)
+
+
+def model_from_invoice(inv: dict) -> dict:
+    """Modelo del ticket a partir de una factura guardada (JSON del día o tabla invoices)."""
+    def _f(key):
+        try:
+            return float(inv.get(key) or 0.0)
+        except (TypeError, ValueError):
+            return 0.0
+    total_usd, total_bs = _f('total_usd'), _f('total_bs')
+    if _f('exchange_rate'):
+        rate = _f('exchange_rate')
+    elif total_usd and total_bs:
+        rate = total_bs / total_usd
+    else:
+        rate = float(database.get_setting('exchange_rate', '1.0') or 1.0)
+    vat_pct = _f('global_iva_pct')
+    iva_enabled = bool(inv.get('iva_enabled')) if inv.get('iva_enabled') is not None else _f('iva_amount_usd') > 0
+    items = inv.get('productos') or inv.get('productos_display') or []
+    when = None
+    for key, fmt in (('datetime', '%Y-%m-%d %H:%M:%S'), ('timestamp', '%Y%m%d_%H%M%S')):
+        try:
+            when = datetime.datetime.strptime(str(inv.get(key) or ''), fmt)
+            break
+        except ValueError:
+            continue
+    client = inv.get('client') or inv.get('client_name') or ''
+    model = build_model(items, rate, iva_enabled, vat_pct, client_display_name(client), when,
+                        str(inv.get('numero_factura') or inv.get('id') or ''))
+    # totales tal como se guardaron (no recalculados)
+    for key, src in (('subtotal_usd', 'subtotal_usd'), ('iva_usd', 'iva_amount_usd'), ('total_usd', 'total_usd'),
+                     ('subtotal_bs', 'subtotal_bs'), ('iva_bs', 'iva_amount_bs'), ('total_bs', 'total_bs')):
+        if inv.get(src) is not None:
+            model[key] = _f(src)
+    return model
+
+
+class _Layout:
+    """Layout compilado: todo lo que no depende de la factura se arma una sola vez."""
+
+    def __init__(self, shop_title: str, rif: str, encoding: str):
+        self.encoding = encoding
+        self._iva_labels = {}
+
+    def iva_label(self, vat_pct: float) -> str:
+        label = self._iva_labels.get(vat_pct)
+        if label is None:
+            label = self._iva_labels[vat_pct] = self._make_iva_label(int(vat_pct))
+        return label
+
+    def render(self, model: dict) -> bytes:
+        return '\n'.join(self.lines(model)).encode(self.encoding, errors='replace')
+
+
+class _NarrowLayout(_Layout):
+    """58mm: 32 columnas. CN(3) + PRODUCTO(9) + $(7) + Bs(13)."""
+    width = 32
+
+    def __init__(self, shop_title, rif, encoding):
+        super().__init__(shop_title, rif, encoding)
+        W = self.width
+        sep = '-' * W
+        self.sep = sep
+        self.head = [f"{shop_title:^{W}}", f"{'RIF: ' + rif:^{W}}", sep]
+        self.table_head = [sep, f"{'CN':<3}{'PRODUCTO':<9}{'$':>7}{'Bs':>13}", sep]
+        self.row = '%-3d%-9s%7.2f%13.2f'  # %-formato: más rápido que str.format por línea
+        self.subtotal = 'SUBTOTAL: {:>8.2f}$ | {:>9.2f}B'.format
+        self.total_usd = f"{'TOTAL USD:':<15} " + '{:>15.2f} $'
+        self.total_bs = f"{'TOTAL BS:':<15} " + '{:>15.2f} Bs'
+        self.foot = [sep, f"{'¡GRACIAS POR SU COMPRA!':^{W}}"]
+
+    @staticmethod
+    def _make_iva_label(pct):
+        return f'IVA {pct}%:  ' + '{:>8.2f}$ | {:>9.2f}B'
+
+    def lines(self, m):
+        out = list(self.head)
+        out.append(f"CLI: {m['client_name'][:25]}")
+        out.append(f"FECHA: {m['when'].strftime('%d/%m/%y %H:%M')}")
+        out.extend(self.table_head)
+        row = self.row
+        out.extend([row % (qty, name[:8], usd, bs) for qty, name, usd, bs in m['lines']])
+        out.append(self.sep)
+        out.append(self.subtotal(m['subtotal_usd'], m['subtotal_bs']))
+        out.append(self.iva_label(m['vat_pct']).format(m['iva_usd'], m['iva_bs']))
+        out.append(self.sep)
+        out.append(self.total_usd.format(m['total_usd']))
+        out.append(self.total_bs.format(m['total_bs']))
+        out.extend(self.foot)
+        return out
+
+
+class _WideLayout(_Layout):
+    """80mm / ancho: 45 columnas, bimonetario."""
+    width = 45
+
+    def __init__(self, shop_title, rif, encoding):
+        super().__init__(shop_title, rif, encoding)
+        W = self.width
+        sep = '-' * W
+        self.sep = sep
+        self.head = ['\n' + '=' * W, f"{shop_title:^{W}}", f"{'RIF: ' + rif:^{W}}", sep]
+        self.table_head = [sep, f"{'Cant':<5}{'Descripción':<18}{'USD':>10}{'BS':>12}", sep]
+        self.row = '{:<5}{:<18}{:>10,.2f}{:>12,.2f}'.format
+        self.subtotal = f"{'SUBTOTAL:':>23} " + '{:>10,.2f} USD | {:>10,.2f} BS'
+        self.total = f"{'TOTAL A PAGAR:':>23} " + '{:>10,.2f} USD | {:>10,.2f} BS'
+        self.foot = [sep, f"{'GRACIAS POR SU COMPRA':^{W}}", '=' * W + '\n']
+
+    @staticmethod
+    def _make_iva_label(pct):
+        return f"{'IVA (' + str(pct) + '%):':>23} " + '{:>10,.2f} USD | {:>10,.2f} BS'
+
+    def lines(self, m):
+        out = list(self.head)
+        out.append(f"Fecha: {m['when'].strftime('%d/%m/%Y %H:%M')}")
+        if m['client_name']:
+            out.append(f"Cliente: {m['client_name']}")
+        out.append(f"Tasa del día: {m['rate']:,.2f} BS/USD")
+        out.extend(self.table_head)
+        row = self.row
+        out.extend([row(qty, name[:18], usd, bs) for qty, name, usd, bs in m['lines']])
+        out.append(self.sep)
+        out.append(self.subtotal.format(m['subtotal_usd'], m['subtotal_bs']))
+        out.append(self.iva_label(m['vat_pct']).format(m['iva_usd'], m['iva_bs']))
+        out.append(self.total.format(m['total_usd'], m['total_bs']))
+        out.extend(self.foot)
+        return out
+
+
+class ReceiptRenderer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._layouts = {}
+        self._settings = None
+
+    def settings(self) -> dict:
+        """Ajustes que usa el ticket, leídos una vez por versión de ajustes."""
+        version = database.settings_version()
+        snap = self._settings
+        if snap is None or snap['version'] != version:
+            try:
+                vat_pct = float(database.get_setting('vat_percent', '16') or 16.0)
+            except (TypeError, ValueError):
+                vat_pct = 16.0
+            snap = {
+                'version': version,
+                'rif': str(database.get_setting('shop_rif', 'J-12345678-9') or 'J-12345678-9'),
+                'vat_enabled': str(database.get_setting('vat_enabled', '0')) == '1',
+                'vat_pct': vat_pct,
+                'paper_size': str(database.get_setting('receipt_paper_size', '58mm') or '58mm'),
+            }
+            self._settings = snap
+        return snap
+
+    def layout(self, paper_size: str = None, shop_title: str = None, encoding: str = 'utf-8') -> _Layout:
+        snap = self.settings()
+        paper_size = paper_size or snap['paper_size']
+        shop_title = shop_title or DEFAULT_SHOP_TITLE
+        narrow = '58' in paper_size.lower()
+        key = (narrow, shop_title, encoding, snap['version'])
+        layout = self._layouts.get(key)
+        if layout is None:
+            with self._lock:
+                # las versiones viejas ya no se van a pedir
+                self._layouts = {k: v for k, v in self._layouts.items() if k[3] == snap['version']}
+                layout = (_NarrowLayout if narrow else _WideLayout)(shop_title, snap['rif'], encoding)
+                self._layouts[key] = layout
+        return layout
+
+    def model(self, items, rate: float, client_name: str = '', when=None, numero: str = '') -> dict:
+        """build_model con el IVA de settings."""
+        snap = self.settings()
+        return build_model(items, rate, snap['vat_enabled'], snap['vat_pct'], client_name, when, numero)
+
+    def render(self, model: dict, paper_size: str = None, shop_title: str = None, encoding: str = 'utf-8') -> bytes:
+        return self.layout(paper_size, shop_title, encoding).render(model)
+
+    def render_text(self, model: dict, paper_size: str = None, shop_title: str = None) -> str:
+        return '\n'.join(self.layout(paper_size, shop_title).lines(model))
+
+
+_renderer = None
+
+
+def get_renderer() -> ReceiptRenderer:
+    global _renderer
+    if _renderer is None:
+        _renderer = ReceiptRenderer()
+    return _renderer
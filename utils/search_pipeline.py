@@ -0,0 +1,138 @@
+"""Búsqueda mientras se escribe: debounce, consulta fuera del hilo de Tk y descarte de resultados viejos."""
+import queue
+import threading
+
+
+class SearchPipeline:
+    """search_fn(query) corre en un hilo de trabajo; render_fn(query, result), en el hilo de Tk."""
+
+    def __init__(self, widget, search_fn, render_fn, delay_ms: int = 200, poll_ms: int = 25):
+        self.widget = widget
+        self.search_fn = search_fn
+        self.render_fn = render_fn
+        self.delay_ms = int(delay_ms)
+        self.poll_ms = int(poll_ms)
+        self._after_id = None
+        self._poll_id = None
+        self._seq = 0
+        self._inflight = None
+        self._pending_query = ''
+        self._last_query = None
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = None
+        self._closed = False
+
+    # -- hilo de Tk --
+    def submit(self, query: str, force: bool = False):
+        """Programa la búsqueda de `query` tras el debounce (reinicia el temporizador)."""
+        if self._closed:
+            return
+        query = (query or '').strip()
+        if not force and query == self._last_query and self._after_id is None:
+            # p. ej. teclas de flecha/Shift: el texto no cambió
+            return
+        self._cancel_timer()
+        self._pending_query = query
+        try:
+            self._after_id = self.widget.after(self.delay_ms, self._fire)
+        except Exception:
+            self._after_id = None
+            self._fire()
+
+    def refresh(self):
+        """Repite la última búsqueda sin debounce (p. ej. tras 'Mostrar más')."""
+        self._cancel_timer()
+        self._pending_query = self._last_query or ''
+        self._fire()
+
+    def cancel(self):
+        """Descarta el temporizador y cualquier resultado en curso."""
+        self._cancel_timer()
+        self._seq += 1
+
+    def close(self):
+        self.cancel()
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        self._jobs.put(None)
+
+    def _cancel_timer(self):
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _fire(self):
+        self._after_id = None
+        self._seq += 1
+        self._last_query = self._pending_query
+        self._ensure_worker()
+        self._inflight = self._seq
+        self._jobs.put((self._seq, self._pending_query))
+        self._schedule_poll()
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            try:
+                self._poll_id = self.widget.after(self.poll_ms, self._poll)
+            except Exception:
+                self._poll_id = None
+
+    def _poll(self):
+        self._poll_id = None
+        latest = None
+        while True:
+            try:
+                item = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == self._seq:
+                latest = item
+        if latest is not None:
+            _seq, query, result, error = latest
+            if error is None:
+                try:
+                    self.render_fn(query, result)
+                except Exception:
+                    pass
+            return
+        # el resultado vigente aún no llegó (salvo que se haya cancelado)
+        if self._inflight == self._seq:
+            self._schedule_poll()
+
+    # -- hilo de trabajo --
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='search-pipeline', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            # quedarse solo con la consulta más reciente que esté en la cola
+            while True:
+                try:
+                    newer = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                job = newer
+                if job is None:
+                    break
+            if job is None:
+                return
+            seq, query = job
+            if seq != self._seq:
+                continue
+            try:
+                result, error = self.search_fn(query), None
+            except Exception as e:
+                result, error = None, e
+            self._results.put((seq, query, result, error))
@@ -0,0 +1,136 @@
+"""Tareas en segundo plano para ventanas Tk: carga en un hilo, entrega por partes con after()."""
+import queue
+import threading
+
+
+class Task:
+    """Lado del hilo de trabajo de una tarea: progreso, envío de resultados y cancelación."""
+
+    def __init__(self):
+        self._cancel = threading.Event()
+        self._events = queue.Queue()
+        self.done = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def emit(self, items):
+        """Envía elementos al on_chunk (desde el hilo de trabajo)."""
+        if items and not self.cancelled:
+            self._events.put(('chunk', list(items)))
+
+    def progress(self, done, total=None, text: str = ''):
+        if not self.cancelled:
+            self._events.put(('progress', (done, total, text)))
+
+
+class TaskRunner:
+    def __init__(self, widget, chunk_size: int = 200, poll_ms: int = 30):
+        self.widget = widget
+        self.chunk_size = max(1, int(chunk_size))
+        self.poll_ms = int(poll_ms)
+        self._tasks = []
+        try:
+            widget.bind('<Destroy>', self._on_destroy, add='+')
+        except Exception:
+            pass
+
+    def run(self, fn, *args, on_done=None, on_error=None, on_progress=None, on_chunk=None):
+        """Ejecuta fn(task, *args) en un hilo; devuelve el Task (se puede cancelar).
+
+        Los callbacks corren en el hilo de Tk; on_chunk recibe como mucho `chunk_size`
+        elementos por ciclo de after(). Cerrar `widget` cancela lo pendiente.
+        """
+        task = Task()
+        callbacks = (on_done, on_error, on_progress, on_chunk)
+
+        def _work():
+            try:
+                result = fn(task, *args)
+            except Exception as e:
+                task._events.put(('error', e))
+            else:
+                task._events.put(('done', result))
+
+        self._tasks.append(task)
+        threading.Thread(target=_work, name='task-runner', daemon=True).start()
+        self._schedule(task, callbacks, [])
+        return task
+
+    def cancel_all(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def _on_destroy(self, event=None):
+        # <Destroy> llega también por cada hijo del widget
+        if event is None or event.widget is self.widget:
+            self.cancel_all()
+
+    def _schedule(self, task, callbacks, backlog):
+        try:
+            self.widget.after(self.poll_ms, lambda: self._poll(task, callbacks, backlog))
+        except Exception:
+            task.cancel()
+
+    def _poll(self, task, callbacks, backlog):
+        on_done, on_error, on_progress, on_chunk = callbacks
+        if task.cancelled:
+            self._forget(task)
+            return
+        finished = None
+        last_progress = None
+        while True:
+            try:
+                kind, payload = task._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'chunk':
+                backlog.extend(payload)
+            elif kind == 'progress':
+                last_progress = payload
+            else:
+                finished = (kind, payload)
+                break
+        if last_progress is not None and on_progress is not None:
+            try:
+                on_progress(*last_progress)
+            except Exception:
+                pass
+        if backlog and on_chunk is not None:
+            part = backlog[:self.chunk_size]
+            del backlog[:self.chunk_size]
+            try:
+                on_chunk(part)
+            except Exception:
+                pass
+        elif on_chunk is None:
+            backlog.clear()
+        if finished is not None and backlog:
+            # quedan filas por insertar: terminar en el próximo ciclo
+            task._events.put(finished)
+            finished = None
+        if finished is None:
+            self._schedule(task, callbacks, backlog)
+            return
+        task.done = True
+        self._forget(task)
+        kind, payload = finished
+        try:
+            if kind == 'done':
+                if on_done is not None:
+                    on_done(payload)
+            elif on_error is not None:
+                on_error(payload)
+        except Exception:
+            pass
+
+    def _forget(self, task):
+        try:
+            self._tasks.remove(task)
+        except ValueError:
+            pass
@@ -3,6 +3,7 @@ import tkinter as tk
 from tkinter import ttk
 import database
 from styles import apply_styles
+from utils.task_runner import TaskRunner
 try:
     from utils.window_utils import set_native_titlebar_black
 except Exception:
@@ -254,16 +255,17 @@ class ConfigWindow(ctk.CTkToplevel):
             rate_btn = ctk.CTkButton(rate_frame, text='Guardar tasa', command=save_rate)
             rate_btn.grid(row=3, column=0, padx=6, pady=8)
             # Button to fetch BCV and update the rate immediately (manual trigger)
-            def update_bcv_action():
+            # la consulta al BCV va en un hilo (utils/task_runner.py) para no congelar la ventana
+            bcv_runner = TaskRunner(self)
+
+            def apply_bcv_result(res):
                 try:
-                    from utils.bcv_fetch import obtener_bcv
+                    bcv_btn.configure(state='normal')
                 except Exception:
-                    show_temporary(rate_status, 'Módulo BCV no disponible', timeout=5000)
-                    return
+                    pass
                 try:
-                    res = obtener_bcv()
                     if not res or 'error' in res:
-                        show_temporary(rate_status, f"Error BCV: {res.get('error','sin datos')}")
+                        show_temporary(rate_status, f"Error BCV: {(res or {}).get('error','sin datos')}")
                         return
                     curc = currency_var.get()
                     key = 'dolar' if curc == 'USD' else 'euro'
@@ -301,6 +303,30 @@ class ConfigWindow(ctk.CTkToplevel):
                 except Exception as e:
                     show_temporary(rate_status, f'Error BCV: {e}')
 
+            def bcv_failed(e):
+                try:
+                    bcv_btn.configure(state='normal')
+                except Exception:
+                    pass
+                show_temporary(rate_status, f'Error BCV: {e}')
+
+            def update_bcv_action():
+                try:
+                    from utils.rate_service import get_service
+                except Exception:
+                    show_temporary(rate_status, 'Módulo BCV no disponible', timeout=5000)
+                    return
+                try:
+                    bcv_btn.configure(state='disabled')
+                except Exception:
+                    pass
+                try:
+                    rate_status.configure(text='Consultando BCV…')
+                except Exception:
+                    pass
+                # consulta forzada con el servicio compartido (misma sesión HTTP, reintentos)
+                bcv_runner.run(lambda task: get_service().refresh(force=True), on_done=apply_bcv_result, on_error=bcv_failed)
+
             bcv_btn = ctk.CTkButton(rate_frame, text='Actualizar precio BCV', command=update_bcv_action)
             bcv_btn.grid(row=3, column=1, padx=6, pady=8)
             iva_btn = ctk.CTkButton(iva_frame, text='Guardar IVA', command=save_iva)
@@ -410,13 +436,40 @@ class ConfigWindow(ctk.CTkToplevel):
                 except Exception:
                     pass
 
+            # destino de la cola de impresión (utils/print_spooler.py)
+            backend_labels = {'windows': 'Impresora de Windows', 'escpos': 'ESC/POS (dispositivo)',
+                              'virtual': 'Impresora virtual (carpeta)'}
+            ctk.CTkLabel(pf, text='Destino:').grid(row=2, column=0, sticky='w', padx=6, pady=6)
+            backend_var = tk.StringVar(value=backend_labels['windows'])
+            try:
+                backend_menu = ctk.CTkOptionMenu(
+                    pf, values=list(backend_labels.values()), variable=backend_var,
+                    width=220, fg_color=print_dropdown_bg, button_color=print_btn,
+                    dropdown_fg_color=print_dropdown_bg, dropdown_hover_color=print_btn,
+                    button_hover_color=print_border_gray
+                )
+                backend_menu.grid(row=2, column=1, sticky='w', padx=6, pady=6)
+            except Exception:
+                try:
+                    ttk.Combobox(pf, values=list(backend_labels.values()), textvariable=backend_var,
+                                 state='readonly').grid(row=2, column=1, sticky='ew', padx=6, pady=6)
+                except Exception:
+                    pass
+            ctk.CTkLabel(pf, text='Dispositivo / carpeta:').grid(row=3, column=0, sticky='w', padx=6, pady=6)
+            device_var = tk.StringVar(value='')
+            try:
+                ctk.CTkEntry(pf, textvariable=device_var, width=220,
+                             placeholder_text='/dev/usb/lp0, COM3 o carpeta').grid(row=3, column=1, sticky='w', padx=6, pady=6)
+            except Exception:
+                ttk.Entry(pf, textvariable=device_var).grid(row=3, column=1, sticky='ew', padx=6, pady=6)
+
             # status label for saving
             print_status = ctk.CTkLabel(pf, text='')
-            print_status.grid(row=2, column=0, columnspan=2, sticky='w', padx=6, pady=(4,0))
+            print_status.grid(row=4, column=0, columnspan=2, sticky='w', padx=6, pady=(4,0))
 
             # load existing settings
             try:
-                from database import get_setting, set_setting
+                from database import get_setting
                 cur_printer = get_setting('default_printer', '')
                 if cur_printer:
                     try:
@@ -426,6 +479,12 @@ class ConfigWindow(ctk.CTkToplevel):
                 cur_paper = get_setting('receipt_paper_size', '58mm')
                 if cur_paper in ('58mm', '80mm'):
                     paper_var.set(cur_paper)
+                cur_backend = get_setting('print_backend', 'windows')
+                backend_var.set(backend_labels.get(cur_backend, backend_labels['windows']))
+                if cur_backend == 'escpos':
+                    device_var.set(get_setting('escpos_device', '') or '')
+                elif cur_backend == 'virtual':
+                    device_var.set(get_setting('virtual_printer_dir', '') or '')
             except Exception:
                 pass
 
@@ -448,6 +507,15 @@ class ConfigWindow(ctk.CTkToplevel):
                         set_setting('receipt_paper_size', str(s))
                     except Exception:
                         pass
+                    try:
+                        kind = next((k for k, v in backend_labels.items() if v == backend_var.get()), 'windows')
+                        set_setting('print_backend', kind)
+                        if kind == 'escpos':
+                            set_setting('escpos_device', device_var.get().strip())
+                        elif kind == 'virtual':
+                            set_setting('virtual_printer_dir', device_var.get().strip())
+                    except Exception:
+                        pass
                     show_temporary_print(print_status, 'Formato de impresión guardado', timeout=4000)
                 except Exception:
                     show_temporary_print(print_status, 'Error al guardar formato', timeout=4000)
@@ -509,19 +577,19 @@ class ConfigWindow(ctk.CTkToplevel):
 
             try:
                 detect_btn = ctk.CTkButton(pf, text='Detectar impresoras', command=detect_printers_action)
-                detect_btn.grid(row=3, column=1, padx=6, pady=8, sticky='e')
+                detect_btn.grid(row=5, column=1, padx=6, pady=8, sticky='e')
             except Exception:
                 try:
-                    ttk.Button(pf, text='Detectar impresoras', command=detect_printers_action).grid(row=3, column=1, padx=6, pady=8, sticky='e')
+                    ttk.Button(pf, text='Detectar impresoras', command=detect_printers_action).grid(row=5, column=1, padx=6, pady=8, sticky='e')
                 except Exception:
                     pass
 
             try:
                 save_btn = ctk.CTkButton(pf, text='Guardar formato', command=save_print_settings)
-                save_btn.grid(row=3, column=0, padx=6, pady=8)
+                save_btn.grid(row=5, column=0, padx=6, pady=8)
             except Exception:
                 try:
-                    ttk.Button(pf, text='Guardar formato', command=save_print_settings).grid(row=3, column=0, padx=6, pady=8)
+                    ttk.Button(pf, text='Guardar formato', command=save_print_settings).grid(row=5, column=0, padx=6, pady=8)
                 except Exception:
                     pass
 
@@ -815,240 +815,82 @@ def open_print_window(parent):
         if printed[0]:
             messagebox.showinfo('Impresión', 'Ya se imprimió esta factura.')
             return
-        # Build receipt text adapting to the selected paper size.
+        # Ticket: modelo (precios en USD por línea y totales) + layout compilado por papel y
+        # versión de ajustes (utils/receipt_renderer.py)
         try:
             st = getattr(parent, 'shop_title_var', None)
             shop_title = st.get() if hasattr(st, 'get') else (str(st) if st is not None else 'MI COMERCIO C.A.')
         except Exception:
             shop_title = 'MI COMERCIO C.A.'
-
-        try:
-            rif = str(database.get_setting('shop_rif', 'J-12345678-9') or 'J-12345678-9')
-        except Exception:
-            rif = 'J-12345678-9'
-
         try:
-            iva_enabled = True if str(database.get_setting('vat_enabled', '0')) == '1' else False
-            vat_pct = float(database.get_setting('vat_percent', '16') or 16.0)
+            client = getattr(parent, 'current_client', None)
+            cname = (client.get('name') or client.get('nombre') or str(client)) if client else ''
         except Exception:
-            iva_enabled = True
-            vat_pct = 16.0
-
-        fecha_print = datetime.datetime.now().strftime("%d/%m/%y %H:%M")
-
-        # 58mm paper: narrow layout (approx 32 chars)
-        if '58' in (paper_size or '').lower():
-            W = 32
-            lines = []
-            lines.append(f"{shop_title:^{W}}")
-            lines.append(f"{'RIF: ' + rif:^{W}}")
-            lines.append('-' * W)
-            try:
-                client = getattr(parent, 'current_client', None)
-                cname = ''
-                if client:
-                    cname = client.get('name') or client.get('nombre') or str(client)
-                lines.append(f"CLI: {cname[:25]}")
-            except Exception:
-                lines.append(f"CLI: ")
-            lines.append(f"FECHA: {fecha_print}")
-            lines.append('-' * W)
-            # CN(3) + PRODUCTO(9) + $ (7) + Bs (13) = 32
-            lines.append(f"{ 'CN':<3}{'PRODUCTO':<9}{'$':>7}{'Bs':>13}")
-            lines.append('-' * W)
-
-            sub_usd = 0.0
-            for it in selected:
-                qty = int(it.get('quantity') or it.get('cantidad') or 1)
-                name = (it.get('name') or it.get('nombre') or '')[:8]
-                # determine unit price in USD
-                unit = None
-                if 'price_usd' in it:
-                    try:
-                        unit = float(it.get('price_usd') or 0.0)
-                    except Exception:
-                        unit = None
-                if unit is None:
-                    p = it.get('price') or it.get('precio') or it.get('unit_price') or 0.0
-                    try:
-                        p = float(p)
-                        # if p looks like BS, convert to USD
-                        if rate and p > rate * 0.1:
-                            unit = p / rate
-                        else:
-                            unit = p
-                    except Exception:
-                        unit = 0.0
-                total_item_usd = round(unit * qty, 2)
-                total_item_bs = round(total_item_usd * rate, 2)
-                sub_usd += total_item_usd
-                lines.append(f"{qty:<3}{name:<9}{total_item_usd:>7.2f}{total_item_bs:>13.2f}")
-
-            imp_usd = round(sub_usd * (vat_pct / 100.0), 2) if iva_enabled else 0.0
-            total_usd = round(sub_usd + imp_usd, 2)
-
-            lines.append('-' * W)
-            lines.append(f"SUBTOTAL: {sub_usd:>8.2f}$ | {sub_usd*rate:>9.2f}B")
-            lines.append(f"IVA {int(vat_pct)}%:  {imp_usd:>8.2f}$ | {imp_usd*rate:>9.2f}B")
-            lines.append('-' * W)
-            lines.append(f"{'TOTAL USD:':<15} {total_usd:>15.2f} $")
-            lines.append(f"{'TOTAL BS:':<15} {total_usd*rate:>15.2f} Bs")
-            lines.append('-' * W)
-            lines.append(f"{'¡GRACIAS POR SU COMPRA!':^{W}}")
-
-            text = '\n'.join(lines)
-        else:
-            # Wider receipt (default, ~45 chars) — previous bimonetary layout
-            lines = []
-            lines.append('\n' + '=' * 45)
-            lines.append(f"{shop_title:^45}")
-            lines.append(f"{'RIF: ' + rif:^45}")
-            lines.append('-' * 45)
-            lines.append(f"Fecha: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}")
-            try:
-                client = getattr(parent, 'current_client', None)
-                if client:
-                    cname = client.get('name') or client.get('nombre') or str(client)
-                    lines.append(f"Cliente: {cname}")
-            except Exception:
-                pass
-            lines.append(f"Tasa del día: {rate:,.2f} BS/USD")
-            lines.append('-' * 45)
-            lines.append(f"{'Cant':<5}{'Descripción':<18}{'USD':>10}{'BS':>12}")
-            lines.append('-' * 45)
-
-            subtotal_usd = 0.0
-            products_lines = []
-            for it in selected:
-                name = (it.get('name') or it.get('nombre') or '')
-                qty = int(it.get('quantity') or it.get('cantidad') or 1)
-                unit_usd = None
-                if 'price_usd' in it:
-                    try:
-                        unit_usd = float(it.get('price_usd') or 0.0)
-                    except Exception:
-                        unit_usd = None
-                if unit_usd is None:
-                    p = it.get('price') or it.get('precio') or it.get('unit_price') or 0.0
-                    try:
-                        p = float(p)
-                        if rate and p > rate * 0.1:
-                            unit_usd = p / rate
-                        else:
-                            unit_usd = p
-                    except Exception:
-                        unit_usd = 0.0
-                p_usd = round(unit_usd * qty, 2)
-                p_bs = round(p_usd * rate, 2)
-                subtotal_usd += p_usd
-                products_lines.append((qty, name, p_usd, p_bs))
-
-            for qty, name, p_usd, p_bs in products_lines:
-                lines.append(f"{qty:<5}{name[:18]:<18}{p_usd:>10,.2f}{p_bs:>12,.2f}")
-
-            lines.append('-' * 45)
-            impuesto_usd = round(subtotal_usd * (vat_pct / 100.0), 2) if iva_enabled else 0.0
-            total_usd_calc = round(subtotal_usd + impuesto_usd, 2)
-            subtotal_bs = round(subtotal_usd * rate, 2)
-            impuesto_bs = round(impuesto_usd * rate, 2)
-            total_bs_calc = round(total_usd_calc * rate, 2)
-
-            lines.append(f"{'SUBTOTAL:':>23} {subtotal_usd:>10,.2f} USD | {subtotal_bs:>10,.2f} BS")
-            lines.append(f"{'IVA ('+str(int(vat_pct))+'%):':>23} {impuesto_usd:>10,.2f} USD | {impuesto_bs:>10,.2f} BS")
-            lines.append(f"{'TOTAL A PAGAR:':>23} {total_usd_calc:>10,.2f} USD | {total_bs_calc:>10,.2f} BS")
-            lines.append('-' * 45)
-            lines.append(f"{'GRACIAS POR SU COMPRA':^45}")
-            lines.append('=' * 45 + '\n')
+            cname = ''
+        from utils.receipt_renderer import get_renderer
+        renderer = get_renderer()
+        model = renderer.model(selected, rate, client_name=cname)
+        receipt_settings = renderer.settings()
+        iva_enabled = receipt_settings['vat_enabled']
+        vat_pct = receipt_settings['vat_pct']
 
-            text = '\n'.join(lines)
-
-        facturas_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'facturas')
-        if not os.path.exists(facturas_dir):
-            try:
-                os.makedirs(facturas_dir)
-            except Exception:
-                facturas_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-                if not os.path.exists(facturas_dir):
-                    try:
-                        os.makedirs(facturas_dir)
-                    except Exception:
-                        facturas_dir = os.path.dirname(os.path.dirname(__file__))
         fecha = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         fecha_human = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        filename = f'factura_{fecha}.txt'
-        file_path = os.path.join(facturas_dir, filename)
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(text)
+            sel_client = parent.header.get_selected_client()
         except Exception:
-            try:
-                tf = os.path.join(os.path.expanduser('~'), filename)
-                with open(tf, 'w', encoding='utf-8') as f:
-                    f.write(text)
-                file_path = tf
-            except Exception as e:
-                messagebox.showerror('Error', f'No se pudo guardar la factura: {e}')
-                return
+            sel_client = getattr(parent, 'current_client', None)
+        productos_for_listado = [{'name': it.get('name', ''), 'qty': it.get('quantity', 0), 'price': it.get('price', 0)} for it in selected]
 
         try:
-            # Attempt to print to the configured Windows printer if set.
-            printed[0] = False
+            # número, ticket en la cola y factura en una sola transacción (un COMMIT): el número
+            # sale de invoice_sequence (utils/invoice_id.py), sin repetirse entre ventanas ni
+            # procesos, y si algo falla no se consume. El ticket va en memoria a la cola de
+            # impresión (utils/print_spooler.py): se imprime en su hilo, con reintentos, y la
+            # caja queda libre para la siguiente venta
             try:
-                from database import get_setting
-                target_printer = get_setting('default_printer', '') or ''
-            except Exception:
-                target_printer = ''
-
-            def _startfile_print(path):
-                try:
-                    os.startfile(path, 'print')
-                    return True
-                except Exception:
-                    return False
-
-            if target_printer:
-                try:
-                    # If pywin32 is available, send the file directly to the named printer
-                    import win32print
-                    import win32api
-                    try:
-                        # open the printer
-                        hPrinter = win32print.OpenPrinter(target_printer)
-                    except Exception:
-                        hPrinter = None
-                    if hPrinter:
-                        try:
-                            # read file bytes
-                            with open(file_path, 'rb') as f:
-                                data = f.read()
-                            # Start a raw document
-                            doc_info = ("Factura", None, "RAW")
-                            job = win32print.StartDocPrinter(hPrinter, 1, doc_info)
-                            try:
-                                win32print.StartPagePrinter(hPrinter)
-                                win32print.WritePrinter(hPrinter, data)
-                                win32print.EndPagePrinter(hPrinter)
-                            finally:
-                                try:
-                                    win32print.EndDocPrinter(hPrinter)
-                                except Exception:
-                                    pass
-                        except Exception:
-                            # fallback to using os.startfile
-                            _startfile_print(file_path)
-                        finally:
-                            try:
-                                win32print.ClosePrinter(hPrinter)
-                            except Exception:
-                                pass
-                    else:
-                        # could not open named printer, fallback
-                        _startfile_print(file_path)
-                except Exception:
-                    # win32print not available or failed — fallback to default printing
-                    _startfile_print(file_path)
-            else:
-                _startfile_print(file_path)
+                from utils.invoice_id import allocate_invoice_id
+                from utils.print_spooler import get_spooler
+                spooler = get_spooler()
+                spooler.start()
+                with database.transaction(immediate=True):
+                    invoice_id = allocate_invoice_id()
+                    model['numero'] = invoice_id
+                    spooler.submit_receipt(model, paper_size, shop_title, invoice_numero=invoice_id)
+                    invoice = {
+                        'id': invoice_id,
+                        'numero_factura': invoice_id,
+                        'productos': selected,
+                        'productos_display': productos_for_listado,
+                        'subtotal_usd': model['subtotal_usd'],
+                        'iva_amount_usd': model['iva_usd'],
+                        'total_usd': model['total_usd'],
+                        'subtotal_bs': model['subtotal_bs'],
+                        'iva_amount_bs': model['iva_bs'],
+                        'total_bs': model['total_bs'],
+                        'timestamp': fecha,
+                        'datetime': fecha_human,
+                        'state': 'FINALIZADA',
+                        'global_iva_pct': vat_pct,
+                        'iva_enabled': iva_enabled,
+                        'paper_size': paper_size,
+                        'exchange_rate': model['rate'],
+                        'receipt_sha': model.get('receipt_sha', ''),
+                        'client': sel_client,
+                        'user': getattr(parent, 'user', ''),
+                        'payments': {
+                            'punto_bs': parse_amount(pago_pv_var.get()),
+                            'efectivo_bs': parse_amount(pago_ef_var.get()),
+                            'usd': parse_amount(pago_usd_var.get()),
+                            'pago_movil_bs': parse_amount(pago_movil_var.get()),
+                            'pago_movil_ref': pago_ref_var.get().strip()
+                        }
+                    }
+                    # registro consultable (historial, cierre, exportación) en la tabla invoices
+                    database.save_invoice(invoice)
+            except Exception as e:
+                messagebox.showerror('Error', f'No se pudo registrar la factura: {e}')
+                return
             printed[0] = True
             try:
                 items_panel.finalize()
@@ -1061,44 +903,6 @@ def open_print_window(parent):
                 parent.update_totals()
             except Exception:
                 pass
-            # normalize subtotal/iva/total variable names so both 58mm and wide layouts work
-            subtotal_usd = locals().get('subtotal_usd') if 'subtotal_usd' in locals() else locals().get('sub_usd', 0.0)
-            impuesto_usd = locals().get('impuesto_usd') if 'impuesto_usd' in locals() else locals().get('imp_usd', 0.0)
-            # total variable name difference: wide uses total_usd_calc, 58mm used total_usd
-            total_usd_calc = locals().get('total_usd_calc') if 'total_usd_calc' in locals() else locals().get('total_usd', round(subtotal_usd + impuesto_usd, 2))
-            # compute BS equivalents safely using rate_safe
-            subtotal_bs = locals().get('subtotal_bs') if 'subtotal_bs' in locals() else round(subtotal_usd * rate_safe, 2)
-            impuesto_bs = locals().get('impuesto_bs') if 'impuesto_bs' in locals() else round(impuesto_usd * rate_safe, 2)
-            total_bs_calc = locals().get('total_bs_calc') if 'total_bs_calc' in locals() else round(total_usd_calc * rate_safe, 2)
-
-            invoice_id = (getattr(parent, 'get_current_invoice_id', None) and parent.get_current_invoice_id()) or f"{fecha[:8]}-1"
-            productos_for_listado = [{'name': it.get('name', ''), 'qty': it.get('quantity', 0), 'price': it.get('price', 0)} for it in selected]
-            invoice = {
-                'id': invoice_id,
-                'numero_factura': invoice_id,
-                'productos': selected,
-                'productos_display': productos_for_listado,
-                'subtotal_usd': round(subtotal_usd, 2),
-                'iva_amount_usd': round(impuesto_usd, 2),
-                'total_usd': round(total_usd_calc, 2),
-                'subtotal_bs': subtotal_bs,
-                'iva_amount_bs': impuesto_bs,
-                'total_bs': total_bs_calc,
-                'file': file_path,
-                'timestamp': fecha,
-                'datetime': fecha_human,
-                'state': 'FINALIZADA',
-                'global_iva_pct': vat_pct,
-                'iva_enabled': iva_enabled,
-                'paper_size': paper_size,
-                'payments': {
-                    'punto_bs': parse_amount(pago_pv_var.get()),
-                    'efectivo_bs': parse_amount(pago_ef_var.get()),
-                    'usd': parse_amount(pago_usd_var.get()),
-                    'pago_movil_bs': parse_amount(pago_movil_var.get()),
-                    'pago_movil_ref': pago_ref_var.get().strip()
-                }
-            }
             try:
                 if hasattr(parent, 'facturas') and isinstance(parent.facturas, list):
                     parent.facturas.append(invoice)
@@ -1116,11 +920,9 @@ def open_print_window(parent):
                 inv_save = {**invoice, 'productos': productos_for_listado}
                 with open(json_path, 'w', encoding='utf-8') as f:
                     json.dump(inv_save, f, ensure_ascii=False, indent=2)
-            except Exception:
-                pass
-            try:
-                from utils.invoice_id import increment_invoice_counter
-                increment_invoice_counter(getattr(parent, '_data_dir', None))
+                # resumen para el listado del historial (historial/manifest.py)
+                from historial.manifest import append_invoice
+                append_invoice(day_dir, os.path.basename(json_path), inv_save)
             except Exception:
                 pass
             try:
@@ -70,7 +70,7 @@ def open_stock_dialog(parent):
                 except Exception:
                     code = str(pid)
                 try:
-                    parent._log_stock_change(code, name, current_stock, current_stock + amt, 'agregado')
+                    parent._log_stock_change(code, name, current_stock, current_stock + amt, 'agregado', product_id=pid)
                 except Exception:
                     pass
                 parent.show_status('Stock actualizado')
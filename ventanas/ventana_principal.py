@@ -12,6 +12,8 @@ from components.tabla_inventario import TablaInventario
 from components.tabla_factura import TablaFactura
 from components.panel_resumen import PanelResumen
 from components.cliente_header import ClienteHeader
+from utils.search_pipeline import SearchPipeline
+from utils.product_index import ProductIndex, parse_scan
 import database
 
 # Aplicar estilos globales al importar el módulo para asegurar el modo/tema
@@ -59,7 +61,6 @@ class VentanaPrincipal(ctk.CTkToplevel):
             self._backups_dir = os.path.join(self._data_dir, 'backups')
         # lightweight placeholders for lists used by historial
         self.products = getattr(self, 'products', [])
-        self.paused_invoices = getattr(self, 'paused_invoices', [])
         self.facturas = getattr(self, 'facturas', [])
         # id generator for dynamically added invoice items (used by add_to_cart_no_reserve)
         try:
@@ -134,14 +135,38 @@ class VentanaPrincipal(ctk.CTkToplevel):
         title_products = ctk.CTkLabel(left_frame, text='Productos', font=self.fonts.get('heading'), text_color=colors.get('text'))
         title_products.pack(anchor='w', padx=8, pady=(8, 4))
 
+        # Entrada de escaneo: código (o cantidad*código) + Enter agrega directo a la factura
+        scan_frame = ctk.CTkFrame(left_frame, fg_color=colors.get('frame'))
+        scan_frame.pack(fill='x', padx=8, pady=(8, 0))
+        ctk.CTkLabel(scan_frame, text='Código:').pack(side='left', padx=(6,4))
+        self.scan_entry = ctk.CTkEntry(scan_frame, placeholder_text='Escanear o escribir código (ej. 3*0042) y Enter')
+        self.scan_entry.pack(side='left', fill='x', expand=True, padx=6)
+        try:
+            self.scan_entry.bind('<Return>', self._on_scan)
+            self.scan_entry.bind('<KP_Enter>', self._on_scan)
+        except Exception:
+            pass
+        # índice código -> producto en memoria (se actualiza con los avisos de database)
+        try:
+            self.product_index = ProductIndex().attach()
+        except Exception:
+            self.product_index = None
+
         # Barra de búsqueda sobre la tabla
         search_frame = ctk.CTkFrame(left_frame, fg_color=colors.get('frame'))
         search_frame.pack(fill='x', padx=8, pady=(8, 4))
         ctk.CTkLabel(search_frame, text='Buscar:').pack(side='left', padx=(6,4))
         self.search_entry = ctk.CTkEntry(search_frame, placeholder_text='Código o nombre')
         self.search_entry.pack(side='left', fill='x', expand=True, padx=6)
+        # La búsqueda corre en un hilo de trabajo tras un debounce; solo se pinta el último resultado
         try:
-            self.search_entry.bind('<KeyRelease>', lambda e: self.tabla.reload(self.search_entry.get()))
+            delay = int(database.get_setting('search_debounce_ms', 200) or 200)
+        except Exception:
+            delay = 200
+        self._search_pipeline = SearchPipeline(self, lambda q: self.tabla.fetch_rows(q),
+                                               lambda _q, result: self.tabla.show_rows(result), delay_ms=delay)
+        try:
+            self.search_entry.bind('<KeyRelease>', lambda e: self._search_pipeline.submit(self.search_entry.get()))
         except Exception:
             pass
 
@@ -247,7 +272,7 @@ class VentanaPrincipal(ctk.CTkToplevel):
         self.factura_panel = TablaFactura(right_frame, colors=colors, fonts=fonts)
         # set callback
         try:
-            self.factura_panel._on_remove_callback = lambda: (self._reload(), self.show_status('Item eliminado, stock restaurado'))
+            self.factura_panel._on_remove_callback = lambda: (self.update_totals(), self.show_status('Item eliminado, stock restaurado'))
         except Exception:
             # best-effort: keep going
             pass
@@ -287,6 +312,27 @@ class VentanaPrincipal(ctk.CTkToplevel):
 
         self._reload()
 
+        # react to rate/currency/VAT changes from the settings cache instead of re-polling SQLite
+        try:
+            self._settings_token = database.subscribe_settings(
+                self._on_setting_changed, keys=('exchange_rate', 'currency', 'vat_enabled', 'vat_percent'))
+        except Exception:
+            self._settings_token = None
+        # aviso cuando el servicio de tasa BCV trae una consulta nueva (llega desde su hilo)
+        self._rate_token = None
+        try:
+            from utils.rate_service import get_service
+            self._rate_token = get_service().subscribe(self._on_rate_refreshed)
+        except Exception:
+            pass
+        # estado de los tickets en la cola de impresión (llega desde el hilo de la cola)
+        self._print_token = None
+        try:
+            from utils.print_spooler import get_spooler
+            self._print_token = get_spooler().subscribe(self._on_print_job)
+        except Exception:
+            pass
+
         # main window geometry is set during initialization; avoid extra re-centering hacks
 
         # ensure window close restores invoice stock (solo debe restarse stock al imprimir)
@@ -301,11 +347,88 @@ class VentanaPrincipal(ctk.CTkToplevel):
                     self._restore_invoice_stock()
                 except Exception:
                     pass
+                try:
+                    self._search_pipeline.close()
+                except Exception:
+                    pass
+                try:
+                    if self.product_index is not None:
+                        self.product_index.detach()
+                except Exception:
+                    pass
+                try:
+                    if self._settings_token is not None:
+                        database.unsubscribe_settings(self._settings_token)
+                        self._settings_token = None
+                except Exception:
+                    pass
+                try:
+                    if self._rate_token is not None:
+                        from utils.rate_service import get_service
+                        get_service().unsubscribe(self._rate_token)
+                        self._rate_token = None
+                except Exception:
+                    pass
+                try:
+                    if self._print_token is not None:
+                        from utils.print_spooler import get_spooler
+                        get_spooler().unsubscribe(self._print_token)
+                        self._print_token = None
+                except Exception:
+                    pass
         try:
             self.bind('<Destroy>', _on_destroy)
         except Exception:
             pass
 
+    def _on_setting_changed(self, key, value):
+        """Settings listener: refresh only the views that depend on the changed key."""
+        def _apply():
+            try:
+                if key in ('vat_enabled', 'vat_percent'):
+                    self.factura_panel._refresh()
+                elif key == 'currency':
+                    self.tabla.update_currency_heading()
+                self.update_totals()
+            except Exception:
+                pass
+        try:
+            self.after_idle(_apply)
+        except Exception:
+            pass
+
+    def _on_rate_refreshed(self, rates):
+        """Rate service listener (service thread): report the new BCV rate in the status line."""
+        def _show():
+            try:
+                from utils.rate_service import rate_for_currency
+                val = rate_for_currency(rates)
+                if val is not None and database.get_setting('exchange_mode', 'Manual') == 'Automático':
+                    self.show_status(f'Tasa BCV actualizada: {val:.2f}', timeout=6000)
+            except Exception:
+                pass
+        try:
+            self.after(0, _show)
+        except Exception:
+            pass
+
+    def _on_print_job(self, job):
+        """Print spooler listener (spooler thread): report receipt status in the status line."""
+        numero = job.get('invoice_numero') or f"#{job.get('id')}"
+        status = job.get('status')
+        if status == 'impreso':
+            msg = f'Factura {numero} impresa'
+        elif status == 'error':
+            msg = f"No se pudo imprimir la factura {numero}: {job.get('last_error', '')}"
+        elif status == 'pendiente' and job.get('attempts'):
+            msg = f"Impresora sin respuesta (factura {numero}), reintentando…"
+        else:
+            return
+        try:
+            self.after(0, lambda: self.show_status(msg, timeout=0 if status == 'error' else 5000))
+        except Exception:
+            pass
+
     def get_current_invoice_id(self):
         """Devuelve el ID de la factura actual (formato YYYYMMDD-N)."""
         return getattr(self, '_current_invoice_id', '')
@@ -330,11 +453,10 @@ class VentanaPrincipal(ctk.CTkToplevel):
                 pass
             # Fallback: manually restore from internal items dict (robust casting)
             items = getattr(self.factura_panel, '_items', {}) or {}
-            for pid, (_name, _price, qty) in list(items.items()):
-                try:
-                    database.increase_product_quantity(int(pid), int(qty))
-                except Exception:
-                    pass
+            try:
+                database.release_items([(pid, qty) for pid, (_name, _price, qty) in items.items()])
+            except Exception:
+                pass
             try:
                 self.factura_panel._items.clear()
                 self.factura_panel._refresh()
@@ -344,30 +466,6 @@ class VentanaPrincipal(ctk.CTkToplevel):
             pass
 
     # -- Minimal compatibility helpers used by migrated historial modules --
-    def paused_registry_path(self):
-        import os
-        try:
-            d = getattr(self, '_data_dir', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data'))
-        except Exception:
-            d = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-        try:
-            os.makedirs(d, exist_ok=True)
-        except Exception:
-            pass
-        return os.path.join(d, 'paused.json')
-
-    def save_paused_to_disk(self):
-        import json
-        try:
-            path = self.paused_registry_path()
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(self.paused_invoices or [], f, ensure_ascii=False, indent=2)
-        except Exception:
-            try:
-                print('Warning: could not save paused invoices')
-            except Exception:
-                pass
-
     def request_get(self, url, timeout=5, **kwargs):
         try:
             import requests
@@ -425,22 +523,13 @@ class VentanaPrincipal(ctk.CTkToplevel):
 
     def clear_selected_items(self, restore_stock=True):
         try:
-            # prefer factura_panel.clear which restores stock when appropriate
-            try:
-                if hasattr(self.factura_panel, 'clear'):
-                    self.factura_panel.clear()
-                else:
-                    self.factura_panel._items = {}
-                    try:
-                        self.factura_panel._refresh()
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+            # clear() returns the cart's stock in one transaction; finalize() keeps it reserved
+            # (restore_stock=False is used when pausing: the paused invoice keeps the reservation)
             try:
                 if restore_stock:
-                    # attempt to restore stock for cleared items
                     self._restore_invoice_stock()
+                else:
+                    self.factura_panel.finalize()
             except Exception:
                 pass
             try:
@@ -450,57 +539,11 @@ class VentanaPrincipal(ctk.CTkToplevel):
         except Exception:
             pass
 
-    def _log_stock_change(self, codigo, producto, cantidad_anterior, cantidad_nueva, motivo):
-        """Append a simple stock change record to stock_history.json in data dir."""
-        import json, os, datetime
+    def _log_stock_change(self, codigo, producto, cantidad_anterior, cantidad_nueva, motivo, product_id=None):
+        """Record a stock change in the stock_movements ledger (one INSERT, no file rewrite)."""
         try:
-            d = getattr(self, '_data_dir', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data'))
-            os.makedirs(d, exist_ok=True)
-            path = os.path.join(d, 'stock_history.json')
-            try:
-                if os.path.exists(path):
-                    with open(path, 'r', encoding='utf-8') as f:
-                        arr = json.load(f) or []
-                else:
-                    arr = []
-            except Exception:
-                arr = []
-            rec = {
-                'timestamp': datetime.datetime.utcnow().isoformat() + 'Z',
-                'codigo': codigo,
-                'producto': producto,
-                'cantidad_anterior': cantidad_anterior,
-                'cantidad_nueva': cantidad_nueva,
-                'motivo': motivo,
-                'usuario': getattr(self, 'user', '')
-            }
-            arr.append(rec)
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(arr, f, ensure_ascii=False, indent=2)
-            # Additionally, save per-day additions in data/stock_history/<YYYY-MM-DD>.json
-            try:
-                day = datetime.date.today().isoformat()
-                day_dir = os.path.join(d, 'stock_history')
-                os.makedirs(day_dir, exist_ok=True)
-                day_file = os.path.join(day_dir, f"{day}.json")
-                try:
-                    if os.path.exists(day_file):
-                        with open(day_file, 'r', encoding='utf-8') as f:
-                            day_arr = json.load(f) or []
-                    else:
-                        day_arr = []
-                except Exception:
-                    day_arr = []
-                # only record additions (cantidad_nueva > cantidad_anterior)
-                try:
-                    if (cantidad_nueva or 0) > (cantidad_anterior or 0):
-                        day_arr.append({'timestamp': rec['timestamp'], 'codigo': codigo, 'producto': producto, 'added': (cantidad_nueva - cantidad_anterior), 'cantidad_nueva': cantidad_nueva, 'motivo': motivo, 'usuario': rec.get('usuario', '')})
-                        with open(day_file, 'w', encoding='utf-8') as f:
-                            json.dump(day_arr, f, ensure_ascii=False, indent=2)
-                except Exception:
-                    pass
-            except Exception:
-                pass
+            database.log_stock_movement(product_id, None, motivo, getattr(self, 'user', '') or '',
+                                        codigo, producto, cantidad_anterior, cantidad_nueva)
         except Exception:
             pass
 
@@ -720,28 +763,102 @@ class VentanaPrincipal(ctk.CTkToplevel):
         # deprecated: use dialogs instead
         return
 
-    def _add_selected_to_invoice(self, event=None):
-        # tomar la selección de la tabla de inventario y añadir al panel de factura
+    def _require_client(self) -> bool:
+        """True si hay un cliente seleccionado; si no, avisa al usuario."""
         try:
-            # require a selected client before allowing adding products
-            try:
-                client = None
-                if hasattr(self, 'header') and callable(getattr(self.header, 'get_selected_client', None)):
-                    client = self.header.get_selected_client()
-                elif hasattr(self, 'header') and hasattr(self.header, 'selected_client'):
-                    client = getattr(self.header, 'selected_client', None)
-                if not client:
+            client = None
+            if hasattr(self, 'header') and callable(getattr(self.header, 'get_selected_client', None)):
+                client = self.header.get_selected_client()
+            elif hasattr(self, 'header') and hasattr(self.header, 'selected_client'):
+                client = getattr(self.header, 'selected_client', None)
+            if not client:
+                try:
+                    from tkinter import messagebox
+                    messagebox.showwarning('Cliente requerido', 'Seleccione un cliente antes de añadir productos.')
+                except Exception:
                     try:
-                        from tkinter import messagebox
-                        messagebox.showwarning('Cliente requerido', 'Seleccione un cliente antes de añadir productos.')
+                        self.show_status('Seleccione un cliente antes de añadir productos.')
                     except Exception:
-                        try:
-                            self.show_status('Seleccione un cliente antes de añadir productos.')
-                        except Exception:
-                            pass
-                    return
+                        pass
+                return False
+        except Exception:
+            pass
+        return True
+
+    def _lookup_product(self, pid: int):
+        """Fila (id, code, name, price_bs, price_usd, quantity) del producto, desde el índice o la BD."""
+        row = None
+        try:
+            if self.product_index is not None:
+                row = self.product_index.get(pid)
+        except Exception:
+            row = None
+        if row is None:
+            try:
+                row = database.get_products_by_ids([pid]).get(int(pid))
+            except Exception:
+                row = None
+        return row
+
+    def _add_product_to_invoice(self, row, qty: int = 1) -> bool:
+        """Reserva `qty` unidades del producto y lo agrega a la factura. Devuelve True si se agregó."""
+        pid, name, price_bs = row[0], row[2], row[3]
+        # intentar decrementar stock en DB antes de añadir
+        try:
+            shortages = database.reserve_items([(pid, qty)])
+        except Exception:
+            shortages = [(pid, qty, None)]
+        if shortages:
+            # no hay stock suficiente
+            available = shortages[0][2]
+            self.show_status('Stock insuficiente' if available is None else f'Stock insuficiente (disponible: {available})')
+            return False
+        # stock decremented: la fila del inventario se actualiza sola vía database.subscribe_products
+        self.factura_panel.add_item(pid, name, float(price_bs or 0.0), qty)
+        try:
+            # update totals display
+            self.update_totals()
+        except Exception:
+            pass
+        # clear status
+        try:
+            self.clear_status()
+        except Exception:
+            pass
+        return True
+
+    def _on_scan(self, event=None):
+        """Enter en la entrada de código: busca en el índice y agrega a la factura en un paso."""
+        try:
+            text = self.scan_entry.get()
+            parsed = parse_scan(text)
+            if parsed is None:
+                if text.strip():
+                    self.show_status('Código inválido')
+                return 'break'
+            qty, code = parsed
+            row = self.product_index.lookup(code) if self.product_index is not None else None
+            if row is None:
+                self.show_status(f'Código no encontrado: {code}')
+                return 'break'
+            if not self._require_client():
+                return 'break'
+            if self._add_product_to_invoice(row, qty):
+                self.scan_entry.delete(0, 'end')
+        except Exception:
+            try:
+                import traceback
+                traceback.print_exc()
             except Exception:
                 pass
+        return 'break'
+
+    def _add_selected_to_invoice(self, event=None):
+        # tomar la selección de la tabla de inventario y añadir al panel de factura
+        try:
+            # require a selected client before allowing adding products
+            if not self._require_client():
+                return
             # si viene un evento (doble-click), seleccionar la fila bajo el cursor
             if event is not None:
                 try:
@@ -754,55 +871,11 @@ class VentanaPrincipal(ctk.CTkToplevel):
             sel = self.tabla.tree.selection()
             if not sel:
                 return
-            item_id = sel[0]
-            # iid es product id
-            pid = int(item_id)
-            vals = self.tabla.tree.item(item_id, 'values')
-            if not vals:
+            # iid es product id; nombre y precio salen del índice, no del texto formateado del Treeview
+            row = self._lookup_product(int(sel[0]))
+            if row is None:
                 return
-            # vals: code, name, price_bs, price_usd, stock
-            try:
-                code = vals[0]
-                name = vals[1]
-                price = float(vals[2])
-            except Exception:
-                # fallback: try previous layout
-                try:
-                    name = vals[0]
-                    price = float(vals[1])
-                except Exception:
-                    name = vals[0] if vals else ''
-                    price = 0.0
-            # usar la cantidad indicada en entry_qty si es válida, sino 1
-            try:
-                qty = int(self.entry_qty.get()) if self.entry_qty.get().strip() else 1
-            except Exception:
-                qty = 1
-            # intentar decrementar stock en DB antes de añadir
-            try:
-                ok = database.decrease_product_quantity(pid, qty)
-            except Exception:
-                ok = False
-            if not ok:
-                # no hay stock suficiente
-                self.show_status('Stock insuficiente')
-                return
-            # stock decremented, refresh inventory and add to factura
-            try:
-                self._reload()
-            except Exception:
-                pass
-            self.factura_panel.add_item(pid, name, price, qty)
-            try:
-                # update totals display
-                self.update_totals()
-            except Exception:
-                pass
-            # clear status
-            try:
-                self.clear_status()
-            except Exception:
-                pass
+            self._add_product_to_invoice(row, 1)
         except Exception:
             try:
                 import traceback
@@ -810,15 +883,9 @@ class VentanaPrincipal(ctk.CTkToplevel):
             except Exception:
                 pass
 
-    
-
     def _reload(self):
         self.tabla.reload()
-        # refresh totals and inventory
-        try:
-            products = database.get_products()
-        except Exception:
-            products = []
+        # refresh totals
         try:
             self.update_totals()
         except Exception:
@@ -1010,21 +1077,14 @@ class VentanaPrincipal(ctk.CTkToplevel):
 
 
     def update_totals(self):
+        # running totals kept by the invoice panel (no rescan of the cart lines)
         try:
-            items = self.factura_panel.get_items()
+            totals = self.factura_panel.totals()
+            subtotal_bs = float(totals.get('subtotal', 0.0))
+            total_vat = float(totals.get('vat', 0.0))
         except Exception:
-            items = []
-        subtotal_bs = 0.0
-        total_vat = 0.0
-        for it in items:
-            try:
-                subtotal_bs += float(it.get('subtotal', 0.0))
-            except Exception:
-                pass
-            try:
-                total_vat += float(it.get('vat', 0.0))
-            except Exception:
-                pass
+            subtotal_bs = 0.0
+            total_vat = 0.0
         total_with_vat = subtotal_bs + total_vat
         try:
             rate = float(database.get_setting('exchange_rate', '1.0') or 1.0)
@@ -1165,14 +1225,16 @@ class VentanaPrincipal(ctk.CTkToplevel):
                 'payments': {},
             }
             try:
-                self.paused_invoices = getattr(self, 'paused_invoices', []) or []
-                self.paused_invoices.append(inv)
+                # tablas paused_invoices/paused_items: un INSERT por línea, sin reescribir las demás
+                inv['user'] = getattr(self, 'user', '') or ''
+                database.pause_invoice(inv)
+            except Exception as e:
                 try:
-                    self.save_paused_to_disk()
+                    from tkinter import messagebox
+                    messagebox.showerror('Pausar', f'No se pudo pausar la factura: {e}')
                 except Exception:
-                    pass
-            except Exception:
-                pass
+                    self.show_status('No se pudo pausar la factura.')
+                return
             # clear current invoice UI but keep stock reserved
             try:
                 self.clear_selected_items(restore_stock=False)